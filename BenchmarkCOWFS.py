@@ -0,0 +1,95 @@
+"""
+Time walking a bundle of FITS files through three stacked COWFS
+layers, as BuildLabels stacks the primary, browse and label deltas,
+getting each file's system path as the label-making code does.
+"""
+import os.path
+import shutil
+import tempfile
+import time
+from typing import List
+
+import fs.path
+from fs.base import FS
+from fs.osfs import OSFS
+
+from pdart.fs.cowfs.COWFS import COWFS
+
+# four collections of this many products, each with one FITS file
+PRODUCTS: int = 2500
+REPEAT: int = 3
+
+_SUFFIXES: List[str] = ["raw", "flt", "spt", "drz"]
+
+
+def _product_dir(suffix: str, n: int) -> str:
+    return f"/hst_09999$/data_acs_{suffix}$/j{n:07}q$"
+
+
+def _open_stack(dir: str) -> List[COWFS]:
+    """
+    Open the stacked layers: primary deltas over an empty archive,
+    then browse deltas, then label deltas.
+    """
+    stack: List[COWFS] = []
+    base_fs: FS = OSFS(os.path.join(dir, "archive"))
+    for name in ["primary", "browse", "label"]:
+        cowfs = COWFS.create_cowfs(base_fs, OSFS(os.path.join(dir, name)), True)
+        stack.append(cowfs)
+        base_fs = cowfs
+    return stack
+
+
+def _close_stack(stack: List[COWFS]) -> None:
+    for cowfs in reversed(stack):
+        cowfs.close()
+
+
+def _make_bundle(dir: str) -> None:
+    for name in ["archive", "primary", "browse", "label"]:
+        os.mkdir(os.path.join(dir, name))
+    primary, browse, label = stack = _open_stack(dir)
+    for suffix in _SUFFIXES:
+        for n in range(PRODUCTS):
+            product_dir = _product_dir(suffix, n)
+            primary.makedirs(product_dir, recreate=True)
+            primary.writebytes(
+                fs.path.join(product_dir, f"j{n:07}q_{suffix}.fits"), b"FITS"
+            )
+    for n in range(PRODUCTS):
+        browse_dir = f"/hst_09999$/browse_acs_raw$/j{n:07}q$"
+        browse.makedirs(browse_dir, recreate=True)
+        browse.writebytes(fs.path.join(browse_dir, f"j{n:07}q_raw.jpg"), b"JPEG")
+    for suffix in _SUFFIXES:
+        for n in range(PRODUCTS):
+            label.writebytes(
+                fs.path.join(_product_dir(suffix, n), f"j{n:07}q_{suffix}.xml"),
+                b"<?xml?>",
+            )
+    _close_stack(stack)
+
+
+def walk_bundle(dir: str) -> int:
+    stack = _open_stack(dir)
+    label_deltas = stack[-1]
+    count = 0
+    for filepath in label_deltas.walk.files():
+        label_deltas.getsyspath(filepath)
+        count += 1
+    _close_stack(stack)
+    return count
+
+
+if __name__ == "__main__":
+    dir = tempfile.mkdtemp(None, "benchmark_cowfs_")
+    try:
+        _make_bundle(dir)
+        times = []
+        for _ in range(REPEAT):
+            start = time.perf_counter()
+            count = walk_bundle(dir)
+            times.append(time.perf_counter() - start)
+        # the best of several runs, to leave out other processes' noise
+        print(f"walked {count} files in {min(times):.2f} s")
+    finally:
+        shutil.rmtree(dir)
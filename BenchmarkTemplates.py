@@ -0,0 +1,187 @@
+"""
+Time building a FITS product label's XML document from its
+templates, without the database work, to see what the templates cost
+per label; and time making the label's final bytes, both by
+formatting the document and directly without a DOM.
+"""
+import timeit
+from xml.dom.minidom import Document
+
+from pdart.labels.FileContentsXml import (
+    axis_array,
+    data_2d_contents,
+    element_array,
+    header_contents,
+)
+from pdart.labels.FitsProductLabelXml import make_label
+from pdart.labels.HstParametersXml import (
+    detector_id,
+    exposure_parameters,
+    hst_parameters,
+    instrument_parameters,
+    operational_parameters,
+    pointing_parameters,
+    program_parameters,
+    tracking_parameters,
+    wavelength_filter_grating_parameters,
+)
+from pdart.labels.ObservingSystem import observing_system
+from pdart.labels.TargetIdentificationXml import target_identification
+from pdart.labels.TimeCoordinatesXml import time_coordinates
+from pdart.xml.Pretty import pretty_print
+from pdart.xml.Templates import (
+    FragBuilder,
+    NodeBuilder,
+    TemplateDict,
+    combine_nodes_into_fragment,
+)
+
+NUMBER: int = 200
+REPEAT: int = 5
+
+
+def _file_contents() -> FragBuilder:
+    nodes = []
+    offset = 0
+    for hdu_index in range(4):
+        nodes.append(
+            header_contents(
+                {
+                    "local_identifier": f"hdu_{hdu_index}",
+                    "offset": offset,
+                    "object_length": 14400,
+                }
+            )
+        )
+        offset += 14400
+        if hdu_index > 0:
+            axis_arrays = [
+                axis_array(
+                    {"axis_name": name, "elements": 2048, "sequence_number": n + 1}
+                )
+                for n, name in enumerate(["Line", "Sample"])
+            ]
+            nodes.append(
+                data_2d_contents(
+                    {
+                        "offset": offset,
+                        "Element_Array": element_array({"data_type": "SignedMSB2"}),
+                        "Axis_Arrays": combine_nodes_into_fragment(axis_arrays),
+                    }
+                )
+            )
+            offset += 2048 * 2048 * 2
+    return combine_nodes_into_fragment(nodes)
+
+
+def _hst_parameters() -> NodeBuilder:
+    return hst_parameters(
+        {
+            "program_parameters": program_parameters(
+                {
+                    "mast_observation_id": "jbz504eoq",
+                    "hst_proposal_id": 13012,
+                    "hst_pi_name": "Doe, Jane",
+                }
+            ),
+            "instrument_parameters": instrument_parameters(
+                {
+                    "instrument_id": "ACS",
+                    "channel_id": "WFC",
+                    "detector_ids": combine_nodes_into_fragment(
+                        [
+                            detector_id({"detector_id": "WFC1"}),
+                            detector_id({"detector_id": "WFC2"}),
+                        ]
+                    ),
+                    "observation_type": "IMAGING",
+                }
+            ),
+            "pointing_parameters": pointing_parameters(
+                {
+                    "hst_target_name": "JUPITER",
+                    "moving_target_flag": "true",
+                    "moving_target_keywords": combine_nodes_into_fragment([]),
+                    "moving_target_descriptions": combine_nodes_into_fragment([]),
+                    "aperture_name": "WFC",
+                    "proposed_aperture_name": "WFC",
+                    "targeted_detector_ids": combine_nodes_into_fragment([]),
+                }
+            ),
+            "tracking_parameters": tracking_parameters(
+                {"fine_guidance_sensor_lock_type": "FINE", "gyroscope_mode": "3"}
+            ),
+            "exposure_parameters": exposure_parameters(
+                {"exposure_duration": 0.1, "exposure_type": "NORMAL"}
+            ),
+            "wavelength_filter_grating_parameters": wavelength_filter_grating_parameters(
+                {
+                    "filter_name": "F658N",
+                    "center_filter_wavelength": 0.658,
+                    "bandwidth": 0.0075,
+                    "spectral_resolution": 87.7,
+                }
+            ),
+            "operational_parameters": operational_parameters(
+                {
+                    "instrument_mode_id": "ACCUM",
+                    "gain_setting": 2.0,
+                    "coronagraph_flag": "false",
+                    "cosmic_ray_split_count": 1,
+                    "repeat_exposure_count": 1,
+                    "subarray_flag": "false",
+                    "binning_mode": 1,
+                    "plate_scale": 0.05,
+                }
+            ),
+        }
+    )
+
+
+def _label_dictionary() -> TemplateDict:
+    return {
+        "lid": "urn:nasa:pds:hst_13012:data_acs_raw:jbz504eoq",
+        "vid": "1.0",
+        "proposal_id": "13012",
+        "suffix": "raw",
+        "file_name": "jbz504eoq_raw.fits",
+        "file_contents": _file_contents(),
+        "Investigation_Area_name": "HST observing program 13012",
+        "investigation_lidvid": "urn:nasa:pds:context:investigation:"
+        "individual.hst_13012::1.0",
+        "Observing_System": observing_system("acs"),
+        "Time_Coordinates": time_coordinates(
+            {
+                "start_date_time": "2012-09-27T20:23:28Z",
+                "stop_date_time": "2012-09-27T20:27:58Z",
+            }
+        ),
+        "Target_Identification": target_identification(
+            "Jupiter", "Planet", "The planet Jupiter", "urn:nasa:pds:jupiter"
+        ),
+        "HST": _hst_parameters(),
+    }
+
+
+def build_label() -> Document:
+    return make_label(_label_dictionary())
+
+
+def format_label() -> bytes:
+    return pretty_print(make_label(_label_dictionary()).toxml().encode())
+
+
+def label_bytes() -> bytes:
+    return make_label.pretty_bytes(_label_dictionary())
+
+
+if __name__ == "__main__":
+    assert format_label() == label_bytes()
+    for name, func in [
+        ("build the document", build_label),
+        ("build and format the document", format_label),
+        ("make the bytes without a DOM", label_bytes),
+    ]:
+        # the best of several runs, to leave out other processes' noise
+        seconds = min(timeit.repeat(func, number=NUMBER, repeat=REPEAT))
+        print(f"{name}: {1000 * seconds / NUMBER:.3f} ms per label")
@@ -0,0 +1,67 @@
+import argparse
+import sys
+
+from pdart.pipeline.Directories import make_directories
+from pdart.pipeline.Scheduler import (
+    CPU_RESOURCE,
+    DISK_RESOURCE,
+    NETWORK_RESOURCE,
+    default_resource_limits,
+    run_proposals,
+    status_report,
+)
+
+
+def run() -> None:
+    defaults = default_resource_limits()
+    parser = argparse.ArgumentParser(
+        description="Run the pipeline for several proposals in parallel."
+    )
+    parser.add_argument("proposal_ids", metavar="PROPOSAL_ID", type=int, nargs="+")
+    parser.add_argument(
+        "--width", type=int, default=4, help="number of worker processes"
+    )
+    parser.add_argument(
+        "--network",
+        type=int,
+        default=defaults[NETWORK_RESOURCE],
+        help="max network-bound stages at once",
+    )
+    parser.add_argument(
+        "--cpu",
+        type=int,
+        default=defaults[CPU_RESOURCE],
+        help="max CPU-bound stages at once",
+    )
+    parser.add_argument(
+        "--disk",
+        type=int,
+        default=defaults[DISK_RESOURCE],
+        help="max disk-bound stages at once",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="start every proposal from the beginning instead of resuming",
+    )
+    args = parser.parse_args()
+
+    dirs = make_directories()
+    statuses = run_proposals(
+        dirs,
+        args.proposal_ids,
+        args.width,
+        {
+            NETWORK_RESOURCE: args.network,
+            CPU_RESOURCE: args.cpu,
+            DISK_RESOURCE: args.disk,
+        },
+        resume=not args.restart,
+    )
+    print(status_report(statuses), end="")
+    if not all(status.is_complete() for status in statuses):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run()
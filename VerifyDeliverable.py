@@ -0,0 +1,27 @@
+import os.path
+import sys
+
+from pdart.archive.ChecksumManifest import verify_checksum_manifest
+from pdart.pipeline.Directories import make_directories
+
+
+def run() -> None:
+    assert len(sys.argv) == 2, sys.argv
+    proposal_id = int(sys.argv[1])
+    dirs = make_directories()
+    manifest_filepath = os.path.join(
+        dirs.manifest_dir(proposal_id), "checksum.manifest.txt"
+    )
+    with open(manifest_filepath) as f:
+        manifest = f.read()
+    problems = verify_checksum_manifest(
+        manifest, dirs.deliverable_bundle_dir(proposal_id)
+    )
+    for problem in problems:
+        print(problem)
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run()
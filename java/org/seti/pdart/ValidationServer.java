@@ -0,0 +1,170 @@
+package org.seti.pdart;
+
+import java.io.BufferedInputStream;
+import java.io.BufferedOutputStream;
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.DataInputStream;
+import java.io.File;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.OutputStream;
+import java.io.PrintStream;
+import java.io.PrintWriter;
+import java.io.StringWriter;
+import java.net.URL;
+import java.nio.charset.StandardCharsets;
+import java.util.Arrays;
+import java.util.Properties;
+import javax.xml.XMLConstants;
+import javax.xml.transform.Source;
+import javax.xml.transform.stream.StreamSource;
+import javax.xml.validation.Schema;
+import javax.xml.validation.SchemaFactory;
+import org.apache.log4j.PropertyConfigurator;
+import org.probatron.SchematronSchema;
+import org.probatron.Session;
+import org.probatron.ValidationReport;
+import org.xml.sax.SAXParseException;
+
+/**
+ * Validates PDS4 labels against XML Schemas (as XsdValidator.jar
+ * does) and a Schematron schema (as probatron.jar -r0 -n1 does),
+ * loading the schemas once and then validating labels until its
+ * input ends.  See pdart.xml.Schema.ValidationServer for the
+ * protocol.
+ *
+ * Usage: java -cp ValidationServer.jar:probatron.jar
+ *     org.seti.pdart.ValidationServer xsd-file... -- schematron-file
+ */
+public class ValidationServer {
+    private final Schema xmlSchema;
+    private final Session session;
+    private final SchematronSchema schematronSchema;
+
+    public ValidationServer(String[] xsdFilepaths, String schematronFilepath)
+            throws Exception {
+        SchemaFactory factory =
+                SchemaFactory.newInstance(XMLConstants.W3C_XML_SCHEMA_NS_URI);
+        Source[] sources = new Source[xsdFilepaths.length];
+        for (int i = 0; i != sources.length; ++i) {
+            sources[i] = new StreamSource(new File(xsdFilepaths[i]));
+        }
+        xmlSchema = factory.newSchema(sources);
+
+        String schematronUrl = new File(schematronFilepath).toURI().toURL().toString();
+        session = new Session();
+        session.setReportFormat(0); // -r0: terse SVRL
+        session.setUsePhysicalLocators(true); // -n1: line/col numbers
+        session.setSchemaDoc(schematronUrl);
+        schematronSchema = new SchematronSchema(session, new URL(schematronUrl));
+    }
+
+    private static class Response {
+        final String status;
+        final byte[] body;
+
+        Response(String status, byte[] body) {
+            this.status = status;
+            this.body = body;
+        }
+    }
+
+    private Response validate(byte[] label) {
+        File candidate = null;
+        try {
+            try {
+                xmlSchema.newValidator().validate(
+                        new StreamSource(new ByteArrayInputStream(label)));
+            } catch (SAXParseException e) {
+                String message = String.format("\"%s\":%d:%d: %s%n",
+                        e.getSystemId(), e.getLineNumber(), e.getColumnNumber(),
+                        e.getMessage());
+                return new Response("XSD", message.getBytes(StandardCharsets.UTF_8));
+            }
+
+            // Probatron reads the label from a URL.
+            candidate = File.createTempFile("label", ".xml");
+            OutputStream out = new FileOutputStream(candidate);
+            try {
+                out.write(label);
+            } finally {
+                out.close();
+            }
+            URL url = candidate.toURI().toURL();
+            ValidationReport report = schematronSchema.validateCandidate(url);
+            report.annotateWithLocators(session, url);
+            ByteArrayOutputStream svrl = new ByteArrayOutputStream();
+            report.streamOut(svrl);
+            return new Response("SVRL", svrl.toByteArray());
+        } catch (Exception e) {
+            StringWriter trace = new StringWriter();
+            e.printStackTrace(new PrintWriter(trace));
+            return new Response("ERROR", trace.toString().getBytes(StandardCharsets.UTF_8));
+        } finally {
+            if (candidate != null) {
+                candidate.delete();
+            }
+        }
+    }
+
+    /** Reads a line, or returns null at the end of the input. */
+    private static String readLine(InputStream in) throws IOException {
+        StringBuilder line = new StringBuilder();
+        int c;
+        while ((c = in.read()) != '\n') {
+            if (c == -1) {
+                return line.length() == 0 ? null : line.toString();
+            }
+            line.append((char) c);
+        }
+        return line.toString();
+    }
+
+    private static void configureLogging() {
+        // as probatron.jar does
+        Properties properties = new Properties();
+        properties.setProperty("log4j.rootCategory", "WARN,stderr");
+        properties.setProperty("log4j.appender.stderr", "org.apache.log4j.ConsoleAppender");
+        properties.setProperty("log4j.appender.stderr.layout", "org.apache.log4j.PatternLayout");
+        properties.setProperty("log4j.appender.stderr.target", "System.err");
+        properties.setProperty("log4j.appender.stderr.layout.ConversionPattern", "%p %m%n");
+        PropertyConfigurator.configure(properties);
+    }
+
+    public static void main(String[] args) throws Exception {
+        int separator = Arrays.asList(args).indexOf("--");
+        if (separator < 1 || separator != args.length - 2) {
+            System.err.println("Usage: ValidationServer xsd-file... -- schematron-file");
+            System.exit(2);
+        }
+
+        // Only responses go to stdout; anything else printed goes to
+        // stderr.
+        OutputStream out = new BufferedOutputStream(System.out);
+        System.setOut(new PrintStream(System.err, true));
+        configureLogging();
+
+        String[] xsdFilepaths = new String[separator];
+        System.arraycopy(args, 0, xsdFilepaths, 0, separator);
+        ValidationServer server = new ValidationServer(xsdFilepaths, args[separator + 1]);
+        DataInputStream in = new DataInputStream(new BufferedInputStream(System.in));
+        String line;
+        while ((line = readLine(in)) != null && !line.isEmpty()) {
+            int count = Integer.parseInt(line.trim());
+            byte[][] labels = new byte[count][];
+            for (int i = 0; i != count; ++i) {
+                labels[i] = new byte[Integer.parseInt(readLine(in).trim())];
+                in.readFully(labels[i]);
+            }
+            for (byte[] label : labels) {
+                Response response = server.validate(label);
+                String header = response.status + " " + response.body.length + "\n";
+                out.write(header.getBytes(StandardCharsets.US_ASCII));
+                out.write(response.body);
+            }
+            out.flush();
+        }
+    }
+}
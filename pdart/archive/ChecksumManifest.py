@@ -1,15 +1,11 @@
-from typing import Callable, List, Optional, Tuple
+import os
+import os.path
+from typing import Callable, Dict, Iterator, List, Optional
 
 import fs.path
 
 from pdart.db.BundleDB import BundleDB
-from pdart.db.SqlAlchTables import (
-    BundleLabel,
-    CollectionInventory,
-    CollectionLabel,
-    File,
-    ProductLabel,
-)
+from pdart.db.Utils import file_md5s
 from pdart.pds4.LIDVID import LIDVID
 
 _LTD = Callable[[LIDVID], str]
@@ -39,87 +35,69 @@ def plain_lidvid_to_visits_dirpath(lidvid: LIDVID) -> str:
     return fs.path.join("/", *parts)
 
 
+def checksum_manifest_lines(
+    bundle_db: BundleDB, lidvid_to_dirpath: _LTD
+) -> Iterator[str]:
+    """
+    Generate the lines of the checksum manifest of the bundle in the
+    database, in order.  The files and labels are found with a query
+    per table, not per product.
+    """
+    dirpaths: Dict[str, str] = {}
+
+    def to_filepath(lidvid: str, basename: str) -> str:
+        if lidvid not in dirpaths:
+            dirpaths[lidvid] = lidvid_to_dirpath(LIDVID(lidvid))
+        return fs.path.relpath(fs.path.join(dirpaths[lidvid], basename))
+
+    sorted_pairs = sorted(
+        (to_filepath(lidvid, basename), hash)
+        for lidvid, basename, hash in bundle_db.get_file_md5s()
+    )
+    for path, hash in sorted_pairs:
+        yield f"{hash}  {path}\n"
+
+
 def make_checksum_manifest(bundle_db: BundleDB, lidvid_to_dirpath: _LTD) -> str:
-    files: List[File] = []
-
-    bundle = bundle_db.get_bundle()
-    bundle_lidvid = str(bundle.lidvid)
-    label_pairs = [
-        make_bundle_label_pair(
-            bundle_db.get_bundle_label(bundle_lidvid), lidvid_to_dirpath
-        )
-    ]
-
-    for collection in bundle_db.get_bundle_collections(bundle_lidvid):
-        collection_lidvid = str(collection.lidvid)
-        label_pairs.append(
-            make_collection_label_pair(
-                bundle_db.get_collection_label(collection_lidvid), lidvid_to_dirpath
-            )
-        )
-        label_pairs.append(
-            make_collection_inventory_pair(
-                bundle_db.get_collection_inventory(collection_lidvid), lidvid_to_dirpath
-            )
-        )
-        for product in bundle_db.get_collection_products(collection_lidvid):
-            product_lidvid = str(product.lidvid)
-            label_pairs.append(
-                make_product_label_pair(
-                    bundle_db.get_product_label(product_lidvid), lidvid_to_dirpath
-                )
-            )
-            files.extend(bundle_db.get_product_files(product_lidvid))
-
-    file_pairs = [make_checksum_pair(file, lidvid_to_dirpath) for file in files]
-
-    sorted_pairs = sorted(file_pairs + label_pairs)
-    return "".join(f"{hash}  {path}\n" for (path, hash) in sorted_pairs)
-
-
-def make_bundle_label_pair(
-    bundle_label: BundleLabel, lidvid_to_dirpath: _LTD
-) -> Tuple[str, str]:
-    def label_to_filepath(bundle_label: BundleLabel) -> str:
-        dir = lidvid_to_dirpath(LIDVID(bundle_label.bundle_lidvid))
-        return fs.path.relpath(fs.path.join(dir, bundle_label.basename))
-
-    return (label_to_filepath(bundle_label), bundle_label.md5_hash)
-
-
-def make_collection_label_pair(
-    collection_label: CollectionLabel, lidvid_to_dirpath: _LTD
-) -> Tuple[str, str]:
-    def label_to_filepath(collection_label: CollectionLabel) -> str:
-        dir = lidvid_to_dirpath(LIDVID(collection_label.collection_lidvid))
-        return fs.path.relpath(fs.path.join(dir, collection_label.basename))
-
-    return (label_to_filepath(collection_label), collection_label.md5_hash)
-
-
-def make_collection_inventory_pair(
-    collection_inventory: CollectionInventory, lidvid_to_dirpath: _LTD
-) -> Tuple[str, str]:
-    def inventory_to_filepath(collection_inventory: CollectionInventory) -> str:
-        dir = lidvid_to_dirpath(LIDVID(collection_inventory.collection_lidvid))
-        return fs.path.relpath(fs.path.join(dir, collection_inventory.basename))
-
-    return (inventory_to_filepath(collection_inventory), collection_inventory.md5_hash)
-
-
-def make_product_label_pair(
-    product_label: ProductLabel, lidvid_to_dirpath: _LTD
-) -> Tuple[str, str]:
-    def label_to_filepath(product_label: ProductLabel) -> str:
-        dir = lidvid_to_dirpath(LIDVID(product_label.product_lidvid))
-        return fs.path.relpath(fs.path.join(dir, product_label.basename))
-
-    return (label_to_filepath(product_label), product_label.md5_hash)
-
-
-def make_checksum_pair(file: File, lidvid_to_dirpath: _LTD) -> Tuple[str, str]:
-    def file_to_filepath(file: File) -> str:
-        dir = lidvid_to_dirpath(LIDVID(file.product_lidvid))
-        return fs.path.relpath(fs.path.join(dir, file.basename))
-
-    return (file_to_filepath(file), file.md5_hash)
+    return "".join(checksum_manifest_lines(bundle_db, lidvid_to_dirpath))
+
+
+def parse_checksum_manifest(txt: str) -> Dict[str, str]:
+    """
+    Given the contents of a checksum manifest, return a dictionary
+    from the filepaths it lists to their MD5 hashes.
+    """
+    d = {}
+    for n, line in enumerate(txt.split("\n")):
+        if line:
+            fields = line.split("  ", 1)
+            assert len(fields) == 2, f"line #{n} = {line!r}"
+            hash, filepath = fields
+            d[filepath] = hash
+    return d
+
+
+def verify_checksum_manifest(txt: str, bundle_dir: str) -> List[str]:
+    """
+    Check the files in the bundle directory against the contents of
+    a checksum manifest.  Return a description of each file that is
+    missing, has a different hash, or isn't listed in the manifest;
+    if all is well, the list is empty.
+    """
+    manifest = parse_checksum_manifest(txt)
+    found = {
+        os.path.relpath(os.path.join(dirpath, filename), bundle_dir)
+        for dirpath, _, filenames in os.walk(bundle_dir)
+        for filename in filenames
+    }
+    md5s = file_md5s(os.path.join(bundle_dir, filepath) for filepath in sorted(found))
+
+    problems = []
+    for filepath, hash in sorted(manifest.items()):
+        if filepath not in found:
+            problems.append(f"{filepath} is missing")
+        elif md5s[os.path.join(bundle_dir, filepath)] != hash:
+            problems.append(f"{filepath} does not match its hash {hash}")
+    for filepath in sorted(found - manifest.keys()):
+        problems.append(f"{filepath} is not in the manifest")
+    return problems
@@ -1,10 +1,10 @@
-from typing import Callable, Tuple
+from typing import Callable, Iterator, Tuple
 
 import fs.path
 
 from pdart.db.BundleDB import BundleDB
-from pdart.db.SqlAlchTables import Bundle, Collection, Product
-from pdart.labels.CollectionLabel import get_collection_label_name
+from pdart.db.SqlAlchTables import Bundle, Collection
+from pdart.labels.CollectionLabel import collection_label_name
 from pdart.pds4.LIDVID import LIDVID
 
 _LTD = Callable[[LIDVID], str]
@@ -18,36 +18,43 @@ def _make_bundle_pair(bundle: Bundle, lidvid_to_dirpath: _LTD) -> Tuple[str, str
 
 
 def _make_collection_pair(
-    bundle_db: BundleDB, collection: Collection, lidvid_to_dirpath: _LTD
+    collection: Collection, lidvid_to_dirpath: _LTD
 ) -> Tuple[str, str]:
     lidvid = str(collection.lidvid)
     dir = fs.path.relpath(lidvid_to_dirpath(LIDVID(lidvid)))
-    filepath = get_collection_label_name(bundle_db, lidvid)
+    filepath = collection_label_name(collection)
     return (str(collection.lidvid), fs.path.join(dir, filepath))
 
 
-def _make_product_pair(product: Product, lidvid_to_dirpath: _LTD) -> Tuple[str, str]:
-    lidvid = str(product.lidvid)
+def _make_product_pair(lidvid: str, lidvid_to_dirpath: _LTD) -> Tuple[str, str]:
     dir = fs.path.relpath(lidvid_to_dirpath(LIDVID(lidvid)))
     product_id = LIDVID(lidvid).lid().product_id
     filepath = f"{product_id}.xml"
     return (lidvid, fs.path.join(dir, filepath))
 
 
-def make_transfer_manifest(bundle_db: BundleDB, lidvid_to_dirpath: _LTD) -> str:
+def transfer_manifest_lines(
+    bundle_db: BundleDB, lidvid_to_dirpath: _LTD
+) -> Iterator[str]:
+    """
+    Generate the lines of the transfer manifest of the bundle in the
+    database, in order.  The collections and the products are each
+    found with a single query.
+    """
     bundle = bundle_db.get_bundle()
+    bundle_lidvid = str(bundle.lidvid)
     pairs = [_make_bundle_pair(bundle, lidvid_to_dirpath)]
-    for collection in bundle_db.get_bundle_collections(str(bundle.lidvid)):
-        pairs.append(_make_collection_pair(bundle_db, collection, lidvid_to_dirpath))
-        for product in bundle_db.get_collection_products(str(collection.lidvid)):
-            pairs.append(_make_product_pair(product, lidvid_to_dirpath))
+    for collection in bundle_db.get_bundle_collections(bundle_lidvid):
+        pairs.append(_make_collection_pair(collection, lidvid_to_dirpath))
+    for product_lidvid in bundle_db.get_bundle_product_lidvids(bundle_lidvid):
+        pairs.append(_make_product_pair(product_lidvid, lidvid_to_dirpath))
 
     sorted_pairs = sorted(pairs)
     max_width = max(len(lidvid) for (lidvid, _filepath) in sorted_pairs)
-    return "".join(
-        [
-            # TODO rewrite this in f-string notation
-            "%-*s %s\n" % (max_width, lidvid, str(filepath))
-            for (lidvid, filepath) in sorted_pairs
-        ]
-    )
+    for (lidvid, filepath) in sorted_pairs:
+        # TODO rewrite this in f-string notation
+        yield "%-*s %s\n" % (max_width, lidvid, str(filepath))
+
+
+def make_transfer_manifest(bundle_db: BundleDB, lidvid_to_dirpath: _LTD) -> str:
+    return "".join(transfer_manifest_lines(bundle_db, lidvid_to_dirpath))
@@ -1,3 +1,4 @@
+import os
 import shutil
 import tempfile
 import unittest
@@ -7,6 +8,7 @@ import fs.path
 from pdart.archive.ChecksumManifest import (
     make_checksum_manifest,
     plain_lidvid_to_dirpath,
+    verify_checksum_manifest,
 )
 from pdart.db.BundleDB import create_bundle_db_in_memory
 from pdart.fs.primitives.DirUtils import lid_to_dir
@@ -152,3 +154,35 @@ class test_ChecksumManifest(unittest.TestCase):
 
         manifest = make_checksum_manifest(self.bundle_db, plain_lidvid_to_dirpath)
         self.assertEqual(expected, manifest)
+
+    def test_verify_checksum_manifest(self) -> None:
+        os.makedirs(fs.path.join(self.tmpdir, "data_wfpc2_raw/u2no0401t"))
+        with open(fs.path.join(self.tmpdir, "bundle.xml"), "w") as f:
+            f.write("I'm neither XML nor a label, sadly.")
+        with open(
+            fs.path.join(self.tmpdir, "data_wfpc2_raw/u2no0401t", _PRODUCT_BASENAME),
+            "w",
+        ) as f:
+            f.write(_PRODUCT_CONTENTS)
+        manifest = (
+            "e2309513113b550428af0cf476f1fb67  bundle.xml\n"
+            "ba8a714e47d3c7606c0a2d438f9e4811  "
+            "data_wfpc2_raw/u2no0401t/u2no0401t_raw.fits\n"
+        )
+        self.assertEqual([], verify_checksum_manifest(manifest, self.tmpdir))
+
+        with open(fs.path.join(self.tmpdir, "bundle.xml"), "w") as f:
+            f.write("I'm changed.")
+        os.remove(
+            fs.path.join(self.tmpdir, "data_wfpc2_raw/u2no0401t", _PRODUCT_BASENAME)
+        )
+        with open(fs.path.join(self.tmpdir, "extra.txt"), "w") as f:
+            f.write("I'm extra.")
+        self.assertEqual(
+            [
+                "bundle.xml does not match its hash e2309513113b550428af0cf476f1fb67",
+                "data_wfpc2_raw/u2no0401t/u2no0401t_raw.fits is missing",
+                "extra.txt is not in the manifest",
+            ],
+            verify_checksum_manifest(manifest, self.tmpdir),
+        )
@@ -1,9 +1,11 @@
+from collections import OrderedDict
+from contextlib import contextmanager
 import os.path
 import re
-from typing import Any, Dict, List, Optional, Tuple, cast
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, cast
 
-from sqlalchemy import create_engine, exists
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, exists, insert
+from sqlalchemy.orm import sessionmaker, with_polymorphic
 
 from pdart.db.SqlAlchTables import (
     Association,
@@ -21,6 +23,7 @@ from pdart.db.SqlAlchTables import (
     DocumentCollection,
     DocumentFile,
     DocumentProduct,
+    DownloadedFile,
     File,
     FitsFile,
     FitsProduct,
@@ -44,6 +47,9 @@ _BUNDLE_DB_NAME: str = "bundle$database.db"
 _BUNDLE_DIRECTORY_PATTERN: str = r"\Ahst_([0-9]{5})\Z"
 _COLLECTION_DIRECTORY_PATTERN: str = r"\A(([a-z]+)_([a-z0-9]+)_([a-z0-9_]+)|document)\Z"
 
+# The number of FITS files whose card dictionaries are kept in memory.
+_CARD_CACHE_SIZE: int = 512
+
 
 def _get_other_suffixed_basename(filepath: str, suffix: str) -> str:
     # TODO BUFFALO A hack.  Make this private and refactor as necessary.
@@ -122,10 +128,21 @@ def _lidvid_to_suffix(other_collection_lidvid: str) -> str:
 
 
 class BundleDB(object):
-    def __init__(self, url: str) -> None:
+    def __init__(self, url: str, card_cache_size: int = _CARD_CACHE_SIZE) -> None:
         self.url = url
         self.engine = create_engine(url)
         self.session = sessionmaker(bind=self.engine)()
+        self._batch_depth = 0
+        self._card_cache: "OrderedDict[Tuple[str, str], List[Dict[str, Any]]]" = (
+            OrderedDict()
+        )
+        self._card_cache_size = card_cache_size
+        # The FITS files of the last preloaded collection, in product
+        # order, and the position of each in that list.
+        self._preload_files: List[Tuple[str, str, int]] = []
+        self._preload_positions: Dict[Tuple[str, str], int] = {}
+        self.card_cache_hits = 0
+        self.card_cache_misses = 0
 
     def dump(self) -> None:
         for line in self.engine.raw_connection().iterdump():
@@ -136,6 +153,68 @@ class BundleDB(object):
 
     ############################################################
 
+    def commit(self) -> None:
+        """
+        Commit the session, unless we're ingesting in a batch, in which
+        case the commit happens at the end of the batch.
+        """
+        if not self.in_batch_ingestion():
+            self.session.commit()
+
+    def in_batch_ingestion(self) -> bool:
+        return self._batch_depth > 0
+
+    @contextmanager
+    def batch_ingestion(self) -> Iterator[None]:
+        """
+        Defer commits until the end of the context, committing once
+        then, or rolling back if an exception is raised.  Inside the
+        context, the creation methods used to ingest FITS and document
+        files and product labels skip their existence checks and
+        instead insert with
+        "INSERT OR IGNORE", so creating an existing row is still
+        harmless, but it's also not checked for being of the right
+        type.  Batches may be nested; only the outermost commits.
+        """
+        self._batch_depth += 1
+        try:
+            yield
+        except BaseException:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self.session.rollback()
+            raise
+        else:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self.session.commit()
+
+    def _insert_or_ignore(self, table: Any, **values: Any) -> Any:
+        return self.session.execute(
+            insert(table).prefix_with("OR IGNORE").values(**values)
+        )
+
+    def _insert_file_or_ignore(
+        self, type: str, basename: str, md5_hash: str, product_lidvid: str
+    ) -> Optional[int]:
+        """
+        Insert the common part of a file row, returning its id, or None
+        if the file already exists.
+        """
+        result = self._insert_or_ignore(
+            File.__table__,
+            product_lidvid=product_lidvid,
+            basename=basename,
+            type=type,
+            md5_hash=md5_hash,
+        )
+        if result.rowcount == 1:
+            return cast(int, result.lastrowid)
+        else:
+            return None
+
+    ############################################################
+
     def create_bundle(self, bundle_lidvid: str) -> None:
         """
         Create a bundle with this LIDVID if none exists.
@@ -145,7 +224,7 @@ class BundleDB(object):
         if not self.bundle_exists(bundle_lidvid):
             proposal_id = _lidvid_to_proposal_id(bundle_lidvid)
             self.session.add(Bundle(lidvid=bundle_lidvid, proposal_id=proposal_id))
-            self.session.commit()
+            self.commit()
 
     def bundle_exists(self, bundle_lidvid: str) -> bool:
         """
@@ -192,7 +271,7 @@ class BundleDB(object):
             self.session.add(
                 ContextCollection(lidvid=collection_lidvid, bundle_lidvid=bundle_lidvid)
             )
-            self.session.commit()
+            self.commit()
 
     def create_document_collection(
         self, collection_lidvid: str, bundle_lidvid: str
@@ -220,7 +299,7 @@ class BundleDB(object):
                     lidvid=collection_lidvid, bundle_lidvid=bundle_lidvid
                 )
             )
-            self.session.commit()
+            self.commit()
 
     def create_schema_collection(
         self, collection_lidvid: str, bundle_lidvid: str
@@ -246,7 +325,7 @@ class BundleDB(object):
             self.session.add(
                 SchemaCollection(lidvid=collection_lidvid, bundle_lidvid=bundle_lidvid)
             )
-            self.session.commit()
+            self.commit()
 
     def create_other_collection(
         self, collection_lidvid: str, bundle_lidvid: str
@@ -283,7 +362,7 @@ class BundleDB(object):
                     suffix=suffix,
                 )
             )
-            self.session.commit()
+            self.commit()
 
     def collection_exists(self, collection_lidvid: str) -> bool:
         """
@@ -305,6 +384,33 @@ class BundleDB(object):
             .all()
         )
 
+    def get_bundle_products(self, bundle_lidvid: str) -> List[Product]:
+        """
+        Returns the products in all the collections of the bundle,
+        loaded with the columns of their subtypes.
+        """
+        products = with_polymorphic(Product, "*")
+        return (
+            self.session.query(products)
+            .join(Collection, products.collection_lidvid == Collection.lidvid)
+            .filter(Collection.bundle_lidvid == bundle_lidvid)
+            .order_by(products.lidvid)
+            .all()
+        )
+
+    def get_bundle_product_lidvids(self, bundle_lidvid: str) -> List[str]:
+        """
+        Returns the LIDVIDs of the products in all the collections of
+        the bundle.
+        """
+        return [
+            str(lidvid)
+            for (lidvid,) in self.session.query(Product.lidvid)
+            .join(Collection, Product.collection_lidvid == Collection.lidvid)
+            .filter(Collection.bundle_lidvid == bundle_lidvid)
+            .order_by(Product.lidvid)
+        ]
+
     ############################################################
 
     def create_browse_product(
@@ -343,7 +449,7 @@ class BundleDB(object):
                     fits_product_lidvid=fits_product_lidvid,
                 )
             )
-            self.session.commit()
+            self.commit()
 
     def create_document_product(
         self, product_lidvid: str, collection_lidvid: str
@@ -366,7 +472,7 @@ class BundleDB(object):
                     lidvid=product_lidvid, collection_lidvid=collection_lidvid
                 )
             )
-            self.session.commit()
+            self.commit()
 
     def create_fits_product(self, product_lidvid: str, collection_lidvid: str) -> None:
         """
@@ -376,7 +482,17 @@ class BundleDB(object):
         assert product_lidvid2.is_product_lidvid(), product_lidvid
         rootname: str = cast(str, product_lidvid2.lid().product_id)
         LIDVID(collection_lidvid)
-        if self.product_exists(product_lidvid):
+        if self.in_batch_ingestion():
+            self._insert_or_ignore(
+                Product.__table__,
+                lidvid=product_lidvid,
+                collection_lidvid=collection_lidvid,
+                type="fits_product",
+            )
+            self._insert_or_ignore(
+                FitsProduct.__table__, product_lidvid=product_lidvid, rootname=rootname
+            )
+        elif self.product_exists(product_lidvid):
             if self.fits_product_exists(product_lidvid):
                 pass
             else:
@@ -391,7 +507,7 @@ class BundleDB(object):
                     rootname=rootname,
                 )
             )
-            self.session.commit()
+            self.commit()
 
     def product_exists(self, product_lidvid: str) -> bool:
         """
@@ -446,6 +562,21 @@ class BundleDB(object):
             .all()
         )
 
+    def get_bundle_files(self, bundle_lidvid: str) -> List[File]:
+        """
+        Returns the files of all the products in the bundle, loaded
+        with the columns of their subtypes.
+        """
+        files = with_polymorphic(File, "*")
+        return (
+            self.session.query(files)
+            .join(Product, files.product_lidvid == Product.lidvid)
+            .join(Collection, Product.collection_lidvid == Collection.lidvid)
+            .filter(Collection.bundle_lidvid == bundle_lidvid)
+            .order_by(files.basename)
+            .all()
+        )
+
     ############################################################
     def create_context_product(self, id: str) -> None:
         """
@@ -458,7 +589,7 @@ class BundleDB(object):
 
         if not self.context_product_exists(id):
             self.session.add(ContextProduct(lidvid=id))
-            self.session.commit()
+            self.commit()
 
     def context_product_exists(self, lidvid: str) -> bool:
         """
@@ -484,7 +615,7 @@ class BundleDB(object):
 
         if not self.schema_product_exists(id):
             self.session.add(SchemaProduct(lidvid=id))
-            self.session.commit()
+            self.commit()
 
     def schema_product_exists(self, lidvid: str) -> bool:
         """
@@ -506,31 +637,52 @@ class BundleDB(object):
         basename: str,
         product_lidvid: str,
         exception_message: str,
+        md5_hash: Optional[str] = None,
     ) -> None:
         """
         Create a bad FITS file record with this basename belonging to
-        the product if none exists.
+        the product if none exists.  If the MD5 hash of the file is
+        not given, it is calculated.
         """
         assert LIDVID(product_lidvid).is_product_lidvid()
-        if self.fits_file_exists(basename, product_lidvid):
+        if self.in_batch_ingestion():
+            file_id = self._insert_file_or_ignore(
+                "bad_fits_file",
+                basename,
+                md5_hash or file_md5(os_filepath),
+                product_lidvid,
+            )
+            if file_id is not None:
+                self._insert_or_ignore(
+                    BadFitsFile.__table__,
+                    file_id=file_id,
+                    exception_message=exception_message,
+                )
+        elif self.fits_file_exists(basename, product_lidvid):
             pass
         else:
             self.session.add(
                 BadFitsFile(
                     basename=basename,
-                    md5_hash=file_md5(os_filepath),
+                    md5_hash=md5_hash or file_md5(os_filepath),
                     product_lidvid=product_lidvid,
                     exception_message=exception_message,
                 )
             )
-            self.session.commit()
+            self.commit()
 
     def create_browse_file(
-        self, os_filepath: str, basename: str, product_lidvid: str, byte_size: int
+        self,
+        os_filepath: str,
+        basename: str,
+        product_lidvid: str,
+        byte_size: int,
+        md5_hash: Optional[str] = None,
     ) -> None:
         """
         Create a browse file with this basename belonging to the product
-        if none exists.
+        if none exists.  If the MD5 hash of the file is not given, it
+        is calculated.
         """
         assert LIDVID(product_lidvid).is_product_lidvid()
         if self.browse_file_exists(basename, product_lidvid):
@@ -539,56 +691,91 @@ class BundleDB(object):
             self.session.add(
                 BrowseFile(
                     basename=basename,
-                    md5_hash=file_md5(os_filepath),
+                    md5_hash=md5_hash or file_md5(os_filepath),
                     product_lidvid=product_lidvid,
                     byte_size=byte_size,
                 )
             )
-            self.session.commit()
+            self.commit()
             assert self.browse_file_exists(basename, product_lidvid)
 
     def create_document_file(
-        self, os_filepath: str, basename: str, product_lidvid: str
+        self,
+        os_filepath: str,
+        basename: str,
+        product_lidvid: str,
+        md5_hash: Optional[str] = None,
     ) -> None:
         """
         Create a document file with this basename belonging to the product
-        if none exists.
+        if none exists.  If the MD5 hash of the file is not given, it
+        is calculated.
         """
         assert LIDVID(product_lidvid).is_product_lidvid()
-        if self.document_file_exists(basename, product_lidvid):
+        if self.in_batch_ingestion():
+            file_id = self._insert_file_or_ignore(
+                "document_file",
+                basename,
+                md5_hash or file_md5(os_filepath),
+                product_lidvid,
+            )
+            if file_id is not None:
+                self._insert_or_ignore(DocumentFile.__table__, file_id=file_id)
+        elif self.document_file_exists(basename, product_lidvid):
             pass
         else:
             self.session.add(
                 DocumentFile(
                     basename=basename,
-                    md5_hash=file_md5(os_filepath),
+                    md5_hash=md5_hash or file_md5(os_filepath),
                     product_lidvid=product_lidvid,
                 )
             )
-            self.session.commit()
+            self.commit()
             assert self.document_file_exists(basename, product_lidvid)
 
     def create_fits_file(
-        self, os_filepath: str, basename: str, product_lidvid: str, hdu_count: int
+        self,
+        os_filepath: str,
+        basename: str,
+        product_lidvid: str,
+        hdu_count: int,
+        md5_hash: Optional[str] = None,
     ) -> None:
         """
         Create a FITS file with this basename belonging to the product
-        if none exists.
+        if none exists.  If the MD5 hash of the file is not given, it
+        is calculated.
         """
         assert LIDVID(product_lidvid).is_product_lidvid()
-        if self.fits_file_exists(basename, product_lidvid):
+        self._card_cache.pop((product_lidvid, basename), None)
+        if self.in_batch_ingestion():
+            file_id = self._insert_file_or_ignore(
+                "fits_file",
+                basename,
+                md5_hash or file_md5(os_filepath),
+                product_lidvid,
+            )
+            if file_id is not None:
+                self._insert_or_ignore(
+                    FitsFile.__table__,
+                    file_id=file_id,
+                    rootname=HstFilename(os_filepath).rootname(),
+                    hdu_count=hdu_count,
+                )
+        elif self.fits_file_exists(basename, product_lidvid):
             pass
         else:
             self.session.add(
                 FitsFile(
                     basename=basename,
-                    md5_hash=file_md5(os_filepath),
+                    md5_hash=md5_hash or file_md5(os_filepath),
                     product_lidvid=product_lidvid,
                     rootname=HstFilename(os_filepath).rootname(),
                     hdu_count=hdu_count,
                 )
             )
-            self.session.commit()
+            self.commit()
             assert self.fits_file_exists(basename, product_lidvid)
 
     def file_exists(self, basename: str, product_lidvid: str) -> bool:
@@ -729,30 +916,127 @@ class BundleDB(object):
         """
         Return a list of dictionaries mapping FITS keys to their
         values, one per Hdu in the FITS file.
+
+        The most recently used dictionaries are cached; see also
+        preload_card_dictionaries().
         """
+        key = (fits_product_lidvid, basename)
         try:
-
-            def get_card_dictionary(index: int) -> Dict[str, Any]:
-                cards = (
-                    self.session.query(Card)
-                    .filter(Card.product_lidvid == fits_product_lidvid)
-                    .filter(Card.hdu_index == index)
-                )
-                return {card.keyword: card.value for card in cards}
-
-            # TODO The cast is a hack.  How should it properly be done?
-            file = cast(FitsFile, self.get_file(basename, fits_product_lidvid))
-            return [get_card_dictionary(i) for i in range(file.hdu_count)]
-        except Exception as e:
-            print(
-                f"""**** BundleDB.get_card_dictionaries(
+            card_dicts = self._card_cache[key]
+            self._card_cache.move_to_end(key)
+            self.card_cache_hits += 1
+        except KeyError:
+            self.card_cache_misses += 1
+            position = self._preload_positions.get(key)
+            if position is not None:
+                self._preload_card_window(position)
+                return [dict(card_dict) for card_dict in self._card_cache[key]]
+            try:
+                card_dicts = self._load_card_dictionaries(fits_product_lidvid, basename)
+            except Exception as e:
+                print(
+                    f"""**** BundleDB.get_card_dictionaries(
     fits_product_lidvid={fits_product_lidvid},
     basename={basename}
     )
 raised exception = {e} ****
 """
+                )
+                raise
+            self._cache_card_dictionaries(key, card_dicts)
+        # Copy so callers can't change the cached dictionaries.
+        return [dict(card_dict) for card_dict in card_dicts]
+
+    def _load_card_dictionaries(
+        self, fits_product_lidvid: str, basename: str
+    ) -> List[Dict[str, Any]]:
+        # TODO The cast is a hack.  How should it properly be done?
+        file = cast(FitsFile, self.get_file(basename, fits_product_lidvid))
+        card_dicts: List[Dict[str, Any]] = [{} for _ in range(file.hdu_count)]
+        cards = (
+            self.session.query(Card.hdu_index, Card.keyword, Card.value)
+            .filter(Card.product_lidvid == fits_product_lidvid)
+            .order_by(Card.hdu_index, Card.id)
+        )
+        for hdu_index, keyword, value in cards:
+            if hdu_index < file.hdu_count:
+                card_dicts[hdu_index][keyword] = value
+        return card_dicts
+
+    def _cache_card_dictionaries(
+        self, key: Tuple[str, str], card_dicts: List[Dict[str, Any]]
+    ) -> None:
+        self._card_cache[key] = card_dicts
+        self._card_cache.move_to_end(key)
+        while len(self._card_cache) > self._card_cache_size:
+            self._card_cache.popitem(last=False)
+
+    def preload_card_dictionaries(
+        self, collection_lidvid: str, product_lidvids: Optional[Set[str]] = None
+    ) -> None:
+        """
+        Load the card dictionaries of the FITS files in the collection
+        (or only those of the given products) into the cache, a window
+        of files at a time, using one query for the files and one for
+        the cards of each window.  The first window is loaded now;
+        each later one when the first of its files is asked for.
+        Windows are half the size of the cache, so files visited in
+        product order are not evicted before they are used.
+        """
+        files = (
+            self.session.query(
+                FitsFile.product_lidvid, FitsFile.basename, FitsFile.hdu_count
             )
-            raise
+            .join(Product, Product.lidvid == FitsFile.product_lidvid)
+            .filter(Product.collection_lidvid == collection_lidvid)
+            .order_by(FitsFile.product_lidvid)
+            .all()
+        )
+        if product_lidvids is not None:
+            files = [file for file in files if file[0] in product_lidvids]
+        self._preload_files = files
+        self._preload_positions = {
+            (product_lidvid, basename): position
+            for position, (product_lidvid, basename, _) in enumerate(
+                self._preload_files
+            )
+        }
+        if self._preload_files:
+            self._preload_card_window(0)
+
+    def _preload_card_window(self, start: int) -> None:
+        window_size = max(1, self._card_cache_size // 2)
+        files = self._preload_files[start : start + window_size]
+        card_dicts_by_product: Dict[str, List[Dict[str, Any]]] = {
+            product_lidvid: [{} for _ in range(hdu_count)]
+            for product_lidvid, _, hdu_count in files
+        }
+        cards = (
+            self.session.query(
+                Card.product_lidvid, Card.hdu_index, Card.keyword, Card.value
+            )
+            .filter(Card.product_lidvid.in_(list(card_dicts_by_product)))
+            .order_by(Card.product_lidvid, Card.hdu_index, Card.id)
+        )
+        for product_lidvid, hdu_index, keyword, value in cards:
+            card_dicts = card_dicts_by_product.get(product_lidvid)
+            if card_dicts is not None and hdu_index < len(card_dicts):
+                card_dicts[hdu_index][keyword] = value
+        for product_lidvid, basename, _ in files:
+            key = (product_lidvid, basename)
+            self._cache_card_dictionaries(key, card_dicts_by_product[product_lidvid])
+            # Each window is loaded once; a file evicted later is
+            # fetched on its own.
+            self._preload_positions.pop(key, None)
+
+    def clear_card_cache(self) -> None:
+        """
+        Empty the card dictionary cache.  Call this after changing
+        cards other than through BundleDB.
+        """
+        self._card_cache.clear()
+        self._preload_files = []
+        self._preload_positions = {}
 
     def get_other_suffixed_card_dictionaries(
         self, fits_product_lidvid: str, basename: str, suffix: str
@@ -808,8 +1092,16 @@ raised exception = {e} ****
     ############################################################
 
     def create_bundle_label(
-        self, os_filepath: str, basename: str, bundle_lidvid: str
+        self,
+        os_filepath: str,
+        basename: str,
+        bundle_lidvid: str,
+        md5_hash: Optional[str] = None,
     ) -> None:
+        """
+        Create a label record for the bundle if none exists.  If the
+        MD5 hash of the label file is not given, it is calculated.
+        """
         assert LIDVID(bundle_lidvid).is_bundle_lidvid()
         if self.bundle_label_exists(bundle_lidvid):
             pass
@@ -818,10 +1110,10 @@ raised exception = {e} ****
                 BundleLabel(
                     bundle_lidvid=bundle_lidvid,
                     basename=basename,
-                    md5_hash=file_md5(os_filepath),
+                    md5_hash=md5_hash or file_md5(os_filepath),
                 )
             )
-            self.session.commit()
+            self.commit()
             assert self.bundle_label_exists(bundle_lidvid)
 
     def bundle_label_exists(self, bundle_lidvid: str) -> bool:
@@ -849,8 +1141,16 @@ raised exception = {e} ****
     ############################################################
 
     def create_collection_label(
-        self, os_filepath: str, basename: str, collection_lidvid: str
+        self,
+        os_filepath: str,
+        basename: str,
+        collection_lidvid: str,
+        md5_hash: Optional[str] = None,
     ) -> None:
+        """
+        Create a label record for the collection if none exists.  If
+        the MD5 hash of the label file is not given, it is calculated.
+        """
         assert LIDVID(collection_lidvid).is_collection_lidvid()
         if self.collection_label_exists(collection_lidvid):
             pass
@@ -859,10 +1159,10 @@ raised exception = {e} ****
                 CollectionLabel(
                     collection_lidvid=collection_lidvid,
                     basename=basename,
-                    md5_hash=file_md5(os_filepath),
+                    md5_hash=md5_hash or file_md5(os_filepath),
                 )
             )
-            self.session.commit()
+            self.commit()
             assert self.collection_label_exists(collection_lidvid)
 
     def collection_label_exists(self, collection_lidvid: str) -> bool:
@@ -890,8 +1190,17 @@ raised exception = {e} ****
     ############################################################
 
     def create_collection_inventory(
-        self, os_filepath: str, basename: str, collection_lidvid: str
+        self,
+        os_filepath: str,
+        basename: str,
+        collection_lidvid: str,
+        md5_hash: Optional[str] = None,
     ) -> None:
+        """
+        Create an inventory record for the collection if none exists.
+        If the MD5 hash of the inventory file is not given, it is
+        calculated.
+        """
         assert LIDVID(collection_lidvid).is_collection_lidvid()
         if self.collection_inventory_exists(collection_lidvid):
             pass
@@ -900,10 +1209,10 @@ raised exception = {e} ****
                 CollectionInventory(
                     collection_lidvid=collection_lidvid,
                     basename=basename,
-                    md5_hash=file_md5(os_filepath),
+                    md5_hash=md5_hash or file_md5(os_filepath),
                 )
             )
-            self.session.commit()
+            self.commit()
             assert self.collection_inventory_exists(collection_lidvid)
 
     def collection_inventory_exists(self, collection_lidvid: str) -> bool:
@@ -931,20 +1240,35 @@ raised exception = {e} ****
     ############################################################
 
     def create_product_label(
-        self, os_filepath: str, basename: str, product_lidvid: str
+        self,
+        os_filepath: str,
+        basename: str,
+        product_lidvid: str,
+        md5_hash: Optional[str] = None,
     ) -> None:
+        """
+        Create a label record for the product if none exists.  If the
+        MD5 hash of the label file is not given, it is calculated.
+        """
         assert LIDVID(product_lidvid).is_product_lidvid()
-        if self.product_label_exists(product_lidvid):
+        if self.in_batch_ingestion():
+            self._insert_or_ignore(
+                ProductLabel.__table__,
+                product_lidvid=product_lidvid,
+                basename=basename,
+                md5_hash=md5_hash or file_md5(os_filepath),
+            )
+        elif self.product_label_exists(product_lidvid):
             pass
         else:
             self.session.add(
                 ProductLabel(
                     product_lidvid=product_lidvid,
                     basename=basename,
-                    md5_hash=file_md5(os_filepath),
+                    md5_hash=md5_hash or file_md5(os_filepath),
                 )
             )
-            self.session.commit()
+            self.commit()
             assert self.product_label_exists(product_lidvid)
 
     def product_label_exists(self, product_lidvid: str) -> bool:
@@ -971,6 +1295,84 @@ raised exception = {e} ****
 
     ############################################################
 
+    def get_file_md5s(self) -> List[Tuple[str, str, str]]:
+        """
+        Returns the LIDVID of the component each file and label
+        belongs to, with the basename and MD5 hash of the file, for
+        all the files and labels in the database.
+        """
+        queries = [
+            self.session.query(File.product_lidvid, File.basename, File.md5_hash),
+            self.session.query(
+                BundleLabel.bundle_lidvid, BundleLabel.basename, BundleLabel.md5_hash
+            ),
+            self.session.query(
+                CollectionLabel.collection_lidvid,
+                CollectionLabel.basename,
+                CollectionLabel.md5_hash,
+            ),
+            self.session.query(
+                CollectionInventory.collection_lidvid,
+                CollectionInventory.basename,
+                CollectionInventory.md5_hash,
+            ),
+            self.session.query(
+                ProductLabel.product_lidvid,
+                ProductLabel.basename,
+                ProductLabel.md5_hash,
+            ),
+        ]
+        return [
+            (str(lidvid), str(basename), str(md5_hash))
+            for query in queries
+            for lidvid, basename, md5_hash in query
+        ]
+
+    ############################################################
+
+    def create_downloaded_files(self, dirpath: str, basenames: List[str]) -> None:
+        """
+        Record the files downloaded into a directory, given by its
+        path relative to the download directory, if not already
+        recorded.
+        """
+        for basename in basenames:
+            self._insert_or_ignore(
+                DownloadedFile.__table__, dirpath=dirpath, basename=basename
+            )
+        self.commit()
+
+    def downloaded_files_exist(self) -> bool:
+        """
+        Returns True iff any downloaded files have been recorded in the
+        database.
+        """
+        return self.session.query(DownloadedFile.id).first() is not None
+
+    def get_downloaded_siblings(self, basename: str) -> List[str]:
+        """
+        Return the sorted basenames of the files downloaded into the
+        same directory as the given one, including it, or an empty
+        list if the file wasn't recorded.  If it was downloaded into
+        more than one directory, use the first recorded.
+        """
+        first = (
+            self.session.query(DownloadedFile.dirpath)
+            .filter(DownloadedFile.basename == basename)
+            .order_by(DownloadedFile.id)
+            .first()
+        )
+        if first is None:
+            return []
+        return [
+            sibling
+            for (sibling,) in self.session.query(DownloadedFile.basename)
+            .filter(DownloadedFile.dirpath == first.dirpath)
+            .order_by(DownloadedFile.basename)
+        ]
+
+    ############################################################
+
     def proposal_info_exists(self, bundle_lid: str) -> bool:
         assert LID(bundle_lid).is_bundle_lid()
         return self.session.query(
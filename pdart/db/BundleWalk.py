@@ -1,4 +1,4 @@
-from typing import cast
+from typing import Dict, List, cast
 
 from pdart.db.BundleDB import BundleDB
 from pdart.db.SqlAlchTables import (
@@ -12,8 +12,10 @@ from pdart.db.SqlAlchTables import (
     DocumentCollection,
     DocumentFile,
     DocumentProduct,
+    File,
     FitsFile,
     FitsProduct,
+    Product,
     SchemaCollection,
     SchemaProduct,
     OtherCollection,
@@ -41,14 +43,56 @@ class BundleWalk(object):
 
     This class exists because it's error-prone to walk the tree by
     hand and to localize necessary changes in code.
+
+    The bundle's products and files are all loaded, with the columns
+    of their subtypes, before the walk starts, so walking the tree
+    takes a few queries instead of several for each product.  They
+    are detached from the database's session, so the walk sees them
+    as they were when it started, and visitors that commit don't
+    expire (and so reload) them.
     """
 
     def __init__(self, bundle_db: BundleDB) -> None:
         self.db = bundle_db
+        self.__products: Dict[str, List[Product]] = {}
+        self.__files: Dict[str, List[File]] = {}
 
     def walk(self) -> None:
         bundle = self.db.get_bundle()
-        self.__walk_bundle(bundle)
+        self.__load_bundle(str(bundle.lidvid))
+        try:
+            self.__walk_bundle(bundle)
+        finally:
+            self.__products = {}
+            self.__files = {}
+
+    def __load_bundle(self, bundle_lidvid: str) -> None:
+        """
+        Load the products of the bundle's collections, and their
+        files, in sorted order, indexed by the LIDVID of their parent.
+        """
+        self.__products = {}
+        for product in self.db.get_bundle_products(bundle_lidvid):
+            self.db.session.expunge(product)
+            self.__products.setdefault(str(product.collection_lidvid), []).append(
+                product
+            )
+        self.__files = {}
+        for file in self.db.get_bundle_files(bundle_lidvid):
+            self.db.session.expunge(file)
+            self.__files.setdefault(str(file.product_lidvid), []).append(file)
+
+    def __collection_products(self, collection: Collection) -> List[Product]:
+        return self.__products.get(str(collection.lidvid), [])
+
+    def __product_files(self, product: Product) -> List[File]:
+        return self.__files.get(str(product.lidvid), [])
+
+    def __product_file(self, product: Product) -> File:
+        """When you know there's only one, as in browse and FITS products"""
+        files = self.__product_files(product)
+        assert len(files) == 1, f"{len(files)} files in {product.lidvid}"
+        return files[0]
 
     ############################################################
 
@@ -86,8 +130,7 @@ class BundleWalk(object):
     def __walk_context_collection(self, context_collection: ContextCollection) -> None:
         self.visit_context_collection(context_collection, False)
 
-        collection_lidvid = str(context_collection.lidvid)
-        for product in self.db.get_collection_products(collection_lidvid):
+        for product in self.__collection_products(context_collection):
             self.__walk_context_product(cast(ContextProduct, product))
 
         self.visit_context_collection(context_collection, True)
@@ -97,8 +140,7 @@ class BundleWalk(object):
     ) -> None:
         self.visit_document_collection(document_collection, False)
 
-        collection_lidvid = str(document_collection.lidvid)
-        for product in self.db.get_collection_products(collection_lidvid):
+        for product in self.__collection_products(document_collection):
             self.__walk_document_product(cast(DocumentProduct, product))
 
         self.visit_document_collection(document_collection, True)
@@ -106,8 +148,7 @@ class BundleWalk(object):
     def __walk_schema_collection(self, schema_collection: SchemaCollection) -> None:
         self.visit_schema_collection(schema_collection, False)
 
-        collection_lidvid = str(schema_collection.lidvid)
-        for product in self.db.get_collection_products(collection_lidvid):
+        for product in self.__collection_products(schema_collection):
             self.__walk_schema_product(cast(SchemaProduct, product))
 
         self.visit_schema_collection(schema_collection, True)
@@ -115,23 +156,20 @@ class BundleWalk(object):
     def __walk_other_collection(self, other_collection: OtherCollection) -> None:
         self.visit_other_collection(other_collection, False)
 
-        collection_lidvid = str(other_collection.lidvid)
-        for product in self.db.get_collection_products(collection_lidvid):
-            product_lidvid = str(product.lidvid)
-            if self.db.browse_product_exists(product_lidvid):
-                self.__walk_browse_product(cast(BrowseProduct, product))
-            elif self.db.fits_product_exists(product_lidvid):
-                self.__walk_fits_product(cast(FitsProduct, product))
+        for product in self.__collection_products(other_collection):
+            if isinstance(product, BrowseProduct):
+                self.__walk_browse_product(product)
+            elif isinstance(product, FitsProduct):
+                self.__walk_fits_product(product)
             else:
-                assert False, f"Missing product case: {product_lidvid}"
+                assert False, f"Missing product case: {product.lidvid}"
 
         self.visit_other_collection(other_collection, True)
 
     def __walk_browse_product(self, browse_product: BrowseProduct) -> None:
         self.visit_browse_product(browse_product, False)
 
-        product_lidvid = str(browse_product.lidvid)
-        browse_file = self.db.get_product_file(product_lidvid)
+        browse_file = self.__product_file(browse_product)
         self.visit_browse_file(cast(BrowseFile, browse_file))
 
         self.visit_browse_product(browse_product, True)
@@ -147,8 +185,7 @@ class BundleWalk(object):
     def __walk_document_product(self, document_product: DocumentProduct) -> None:
         self.visit_document_product(document_product, False)
 
-        product_lidvid = str(document_product.lidvid)
-        for document_file in self.db.get_product_files(product_lidvid):
+        for document_file in self.__product_files(document_product):
             self.visit_document_file(cast(DocumentFile, document_file))
 
         self.visit_document_product(document_product, True)
@@ -156,15 +193,15 @@ class BundleWalk(object):
     def __walk_fits_product(self, fits_product: FitsProduct) -> None:
         self.visit_fits_product(fits_product, False)
 
-        product_lidvid = str(fits_product.lidvid)
-        fits_file = self.db.get_product_file(product_lidvid)
-        basename = str(fits_file.basename)
-        if self.db.bad_fits_file_exists(basename, product_lidvid):
-            self.visit_bad_fits_file(cast(BadFitsFile, fits_file))
-        elif self.db.fits_file_exists(basename, product_lidvid):
-            self.visit_fits_file(cast(FitsFile, fits_file))
+        fits_file = self.__product_file(fits_product)
+        if isinstance(fits_file, BadFitsFile):
+            self.visit_bad_fits_file(fits_file)
+        elif isinstance(fits_file, FitsFile):
+            self.visit_fits_file(fits_file)
         else:
-            assert False, "Missing FITS product case: {basename} in {product_lidvid}u"
+            basename = fits_file.basename
+            product_lidvid = fits_product.lidvid
+            assert False, f"Missing FITS product case: {basename} in {product_lidvid}"
 
         self.visit_fits_product(fits_product, True)
 
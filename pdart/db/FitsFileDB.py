@@ -1,4 +1,6 @@
-from typing import Any, Dict, List, Optional, Tuple
+import multiprocessing
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import astropy.io.fits
 import astropy.io.fits.card
@@ -6,16 +8,52 @@ from fs.path import basename
 
 from pdart.db.BundleDB import BundleDB
 from pdart.db.SqlAlchTables import Association, Card, Hdu
+from pdart.db.Utils import file_md5
 from pdart.pds4.HstFilename import HstFilename
 
 _PYFITS_CARD = Any
 _PYFITS_HDU = Any
 _PYFITS_OBJ = Any
 
+# Number of worker processes used to read FITS files; None means one
+# per CPU.
+_PROCESSES: Optional[int] = None
 
-def _populate_associations(
-    db: BundleDB, fits_product_lidvid: str, pyfits_obj: _PYFITS_OBJ
-) -> None:
+# The writer inserts the cards of this many files at once.
+_WRITE_BATCH_SIZE: int = 200
+
+
+class FitsFileRecord(object):
+    """
+    Everything the database needs to know about a FITS file, read
+    from the file but not yet written to the database.  It holds only
+    plain Python values, so it can be passed between processes.
+    """
+
+    def __init__(
+        self,
+        os_filepath: str,
+        fits_product_lidvid: str,
+        md5_hash: str,
+        hdu_count: int,
+        hdu_dicts: List[Dict[str, Any]],
+        card_dicts: List[Dict[str, Any]],
+        association_dicts: List[Dict[str, Any]],
+        exception_message: Optional[str] = None,
+    ) -> None:
+        self.os_filepath = os_filepath
+        self.fits_product_lidvid = fits_product_lidvid
+        self.md5_hash = md5_hash
+        self.hdu_count = hdu_count
+        self.hdu_dicts = hdu_dicts
+        self.card_dicts = card_dicts
+        self.association_dicts = association_dicts
+        self.exception_message = exception_message
+
+
+def _association_dicts(
+    fits_product_lidvid: str, pyfits_obj: _PYFITS_OBJ
+) -> List[Dict[str, Any]]:
     # Here we blindly assert that the second HDU is a binary
     # table.
     ASSOC_HDU_INDEX = 1
@@ -34,43 +72,20 @@ def _populate_associations(
             "product_lidvid": fits_product_lidvid,
             "association_index": assoc_indx,
             "hdu_index": ASSOC_HDU_INDEX,
-            "memname": memname,
-            "memtype": memtype,
-            "memprsnt": memprsnt,
+            "memname": str(memname),
+            "memtype": str(memtype),
+            "memprsnt": bool(memprsnt),
         }
 
-    assoc_dicts: List[Dict[str, Any]] = [
+    return [
         create_assoc_dict(assoc_indx, memname, memtype, memprsnt)
         for (assoc_indx, (memname, memtype, memprsnt)) in enumerate(bin_table.data)
     ]
 
-    db.session.bulk_insert_mappings(Association, assoc_dicts)
-
-
-def populate_database_from_fits_file(
-    db: BundleDB, os_filepath: str, fits_product_lidvid: str
-) -> None:
-    file_basename = basename(os_filepath)
-    try:
-        fits = astropy.io.fits.open(os_filepath)
-
-        try:
-            db.create_fits_file(
-                os_filepath, file_basename, fits_product_lidvid, len(fits)
-            )
-            _populate_hdus_associations_and_cards(
-                db, fits, file_basename, fits_product_lidvid
-            )
-        finally:
-            fits.close()
 
-    except OSError as e:
-        db.create_bad_fits_file(os_filepath, file_basename, fits_product_lidvid, str(e))
-
-
-def _populate_hdus_associations_and_cards(
-    db: BundleDB, pyfits_obj: _PYFITS_OBJ, file_basename: str, fits_product_lidvid: str
-) -> None:
+def _hdu_and_card_dicts(
+    pyfits_obj: _PYFITS_OBJ, fits_product_lidvid: str
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
     def create_hdu_dict(index: int, hdu: _PYFITS_HDU) -> Dict[str, Any]:
         fileinfo = hdu.fileinfo()
         return {
@@ -82,7 +97,6 @@ def _populate_hdus_associations_and_cards(
         }
 
     hdu_dicts = [create_hdu_dict(index, hdu) for index, hdu in enumerate(pyfits_obj)]
-    db.session.bulk_insert_mappings(Hdu, hdu_dicts)
 
     def handle_undefined(val: bool) -> Optional[bool]:
         """Convert undefined values to None"""
@@ -91,11 +105,6 @@ def _populate_hdus_associations_and_cards(
         else:
             return val
 
-    def desired_keyword(kw: str) -> bool:
-        """Return True if the keyword is wanted"""
-        # For now we want all of them.
-        return kw is not None
-
     def create_card_dict(
         hdu_index: int, card_index: int, card: _PYFITS_CARD
     ) -> Dict[str, Any]:
@@ -112,12 +121,149 @@ def _populate_hdus_associations_and_cards(
         for hdu_index, hdu in enumerate(pyfits_obj)
         for card_index, card in enumerate(hdu.header.cards)
     ]
-    db.session.bulk_insert_mappings(Card, card_dicts)
+    return hdu_dicts, card_dicts
+
+
+def read_fits_file_record(os_filepath: str, fits_product_lidvid: str) -> FitsFileRecord:
+    """
+    Read the headers of the FITS file into a record.  Only the
+    headers are read (and the association table of an ASN file), not
+    the data units, so memory use doesn't grow with the size of the
+    file.  A file that can't be read gives a record marked bad.
+    """
+    md5_hash = file_md5(os_filepath)
+    try:
+        fits = astropy.io.fits.open(os_filepath, lazy_load_hdus=True)
+        try:
+            hdu_dicts, card_dicts = _hdu_and_card_dicts(fits, fits_product_lidvid)
+            if HstFilename(basename(os_filepath)).suffix() == "asn":
+                association_dicts = _association_dicts(fits_product_lidvid, fits)
+            else:
+                association_dicts = []
+            return FitsFileRecord(
+                os_filepath,
+                fits_product_lidvid,
+                md5_hash,
+                len(hdu_dicts),
+                hdu_dicts,
+                card_dicts,
+                association_dicts,
+            )
+        finally:
+            fits.close()
+    except OSError as e:
+        return FitsFileRecord(
+            os_filepath, fits_product_lidvid, md5_hash, 0, [], [], [], str(e)
+        )
+
+
+def _read_fits_file_record(args: Tuple[str, str]) -> FitsFileRecord:
+    return read_fits_file_record(*args)
+
+
+class _FitsFileRecordWriter(object):
+    """
+    Writes records to the database, saving up the HDUs, cards and
+    associations of many files to insert them together.
+    """
+
+    def __init__(self, db: BundleDB) -> None:
+        self.db = db
+        self.file_count = 0
+        self.hdu_dicts: List[Dict[str, Any]] = []
+        self.card_dicts: List[Dict[str, Any]] = []
+        self.association_dicts: List[Dict[str, Any]] = []
+
+    def write(self, record: FitsFileRecord) -> None:
+        file_basename = basename(record.os_filepath)
+        if record.exception_message is not None:
+            self.db.create_bad_fits_file(
+                record.os_filepath,
+                file_basename,
+                record.fits_product_lidvid,
+                record.exception_message,
+                record.md5_hash,
+            )
+            return
+        self.db.create_fits_file(
+            record.os_filepath,
+            file_basename,
+            record.fits_product_lidvid,
+            record.hdu_count,
+            record.md5_hash,
+        )
+        self.hdu_dicts.extend(record.hdu_dicts)
+        self.card_dicts.extend(record.card_dicts)
+        self.association_dicts.extend(record.association_dicts)
+        self.file_count += 1
+        if self.file_count >= _WRITE_BATCH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        self.db.session.bulk_insert_mappings(Hdu, self.hdu_dicts)
+        self.db.session.bulk_insert_mappings(Card, self.card_dicts)
+        self.db.session.bulk_insert_mappings(Association, self.association_dicts)
+        self.db.clear_card_cache()
+        self.db.commit()
+        self.file_count = 0
+        self.hdu_dicts = []
+        self.card_dicts = []
+        self.association_dicts = []
+
+
+def populate_database_from_fits_file(
+    db: BundleDB, os_filepath: str, fits_product_lidvid: str
+) -> None:
+    writer = _FitsFileRecordWriter(db)
+    writer.write(read_fits_file_record(os_filepath, fits_product_lidvid))
+    writer.flush()
+
+
+def populate_database_from_fits_files(
+    db: BundleDB, files: List[Tuple[str, str]], processes: Optional[int] = None
+) -> None:
+    """
+    Populate the database from the FITS files, given as pairs of OS
+    filepath and FITS product LIDVID.  The headers are read in a pool
+    of worker processes while this process writes them to the
+    database, in the order given.
+    """
+    if processes is None:
+        processes = _PROCESSES
+    writer = _FitsFileRecordWriter(db)
+
+    def read_records() -> Iterator[FitsFileRecord]:
+        # Daemonic processes (like the workers of a multiprocessing
+        # pool running the pipeline) can't start processes of their
+        # own, so they read the files themselves.
+        if (
+            processes == 1
+            or len(files) <= 1
+            or multiprocessing.current_process().daemon
+        ):
+            for file in files:
+                yield _read_fits_file_record(file)
+        else:
+            with multiprocessing.Pool(processes) as pool:
+                yield from pool.imap(_read_fits_file_record, files, chunksize=8)
+
+    for record in read_records():
+        writer.write(record)
+    writer.flush()
 
-    if HstFilename(file_basename).suffix() == "asn":
-        _populate_associations(db, fits_product_lidvid, pyfits_obj)
 
-    db.session.commit()
+def populate_database_from_downloads(db: BundleDB, mast_downloads_dir: str) -> None:
+    """
+    Record which files were downloaded into which directories under
+    mast_downloads_dir, so that a FITS file's siblings can be looked
+    up without walking the directory tree.
+    """
+    with db.batch_ingestion():
+        for dirpath, dirnames, filenames in os.walk(mast_downloads_dir):
+            if filenames:
+                db.create_downloaded_files(
+                    os.path.relpath(dirpath, mast_downloads_dir), filenames
+                )
 
 
 def get_card_dictionaries(
@@ -529,6 +529,34 @@ class ProductLabel(Base):
 ############################################################
 
 
+class DownloadedFile(Base):
+    """
+    A file as downloaded from MAST: files downloaded into the same
+    directory are siblings, and FITS product labels need their
+    siblings' names.
+    """
+
+    __tablename__ = "downloaded_files"
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    """The order in which the files were found"""
+    dirpath = Column(String, nullable=False, index=True)
+    """The directory's path relative to the download directory"""
+    basename = Column(String, nullable=False, index=True)
+
+    __table_args__ = (UniqueConstraint("dirpath", "basename"),)
+
+    def __repr__(self) -> str:
+        return (
+            f"DownloadedFile(id={self.id}, "
+            f"dirpath={self.dirpath!r}, "
+            f"basename={self.basename!r})"
+        )
+
+
+############################################################
+
+
 class ProposalInfo(Base):
     """
     Proposal-related information that should not change over time,
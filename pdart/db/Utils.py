@@ -1,5 +1,17 @@
+import concurrent.futures
+import hashlib
 from hashlib import md5
 from os.path import dirname, join
+from typing import Dict, Iterable, List
+
+from fs.base import FS
+
+# Files are hashed in chunks of this many bytes.
+_CHUNK_SIZE: int = 1024 * 1024
+
+# Number of threads hashing files in file_md5s().  hashlib releases
+# the GIL while it hashes, so the threads do run in parallel.
+_THREADS: int = 8
 
 
 def path_to_testfile(basename: str) -> str:
@@ -9,11 +21,45 @@ def path_to_testfile(basename: str) -> str:
 
 def file_md5(filepath: str) -> str:
     """Find the hexadecimal digest of a file in the filesystem."""
-    CHUNK = 4096
-    hasher = md5()
+    return file_digests(filepath)["md5"]
+
+
+def file_digests(filepath: str, algorithms: Iterable[str] = ("md5",)) -> Dict[str, str]:
+    """
+    Find the hexadecimal digests of a file in the filesystem for each
+    of the hashlib algorithms (for instance, "md5" and "sha256"),
+    reading the file only once.
+    """
+    hashers = [(algorithm, hashlib.new(algorithm)) for algorithm in algorithms]
     with open(filepath, "rb") as f:
         while True:
-            chunk = f.read(CHUNK)
+            chunk = f.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            for _, hasher in hashers:
+                hasher.update(chunk)
+    return {algorithm: hasher.hexdigest() for algorithm, hasher in hashers}
+
+
+def file_md5s(filepaths: Iterable[str]) -> Dict[str, str]:
+    """
+    Find the hexadecimal digests of files in the filesystem, hashing
+    them in a pool of threads.  Return a dictionary from filepaths to
+    their digests.
+    """
+    filepath_list: List[str] = list(filepaths)
+    if len(filepath_list) <= 1 or _THREADS == 1:
+        return {filepath: file_md5(filepath) for filepath in filepath_list}
+    with concurrent.futures.ThreadPoolExecutor(_THREADS) as executor:
+        return dict(zip(filepath_list, executor.map(file_md5, filepath_list)))
+
+
+def fs_file_md5(filesys: FS, filepath: str) -> str:
+    """Find the hexadecimal digest of a file in a pyfilesystem."""
+    hasher = md5()
+    with filesys.openbin(filepath) as f:
+        while True:
+            chunk = f.read(_CHUNK_SIZE)
             if not chunk:
                 break
             hasher.update(chunk)
@@ -25,3 +71,10 @@ def string_md5(string_to_hash: str) -> str:
     hasher = md5()
     hasher.update(string_to_hash.encode("utf-8"))
     return hasher.hexdigest()
+
+
+def bytes_md5(bytes_to_hash: bytes) -> str:
+    """Find the hexadecimal digest of some bytes."""
+    hasher = md5()
+    hasher.update(bytes_to_hash)
+    return hasher.hexdigest()
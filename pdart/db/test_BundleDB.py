@@ -7,6 +7,8 @@ from pdart.db.BundleDB import create_bundle_db_in_memory
 from pdart.db.SqlAlchTables import (
     Base,
     Bundle,
+    FitsFile,
+    FitsProduct,
     OtherCollection,
     switch_on_collection_subtype,
 )
@@ -38,6 +40,7 @@ _TABLES: Set[str] = {
     "collection_labels",
     "collection_inventories",
     "product_labels",
+    "downloaded_files",
     "proposal_info",
 }
 
@@ -288,6 +291,27 @@ class Test_BundleDB(unittest.TestCase):
             {p.lidvid for p in self.db.get_collection_products(collection_lidvid)},
         )
 
+    def test_get_bundle_product_lidvids(self) -> None:
+        bundle_lidvid = "urn:nasa:pds:hst_99999::1.1"
+        c1_lidvid = "urn:nasa:pds:hst_99999:data_acs_raw::1.8"
+        c2_lidvid = "urn:nasa:pds:hst_99999:data_acs_flt::1.8"
+        p1_lidvid = "urn:nasa:pds:hst_99999:data_acs_raw:j6gp01lzq::1.8"
+        p2_lidvid = "urn:nasa:pds:hst_99999:data_acs_raw:j6gp02lzq::1.8"
+        p3_lidvid = "urn:nasa:pds:hst_99999:data_acs_flt:j6gp01lzq::1.8"
+
+        self.db.create_bundle(bundle_lidvid)
+        self.db.create_other_collection(c1_lidvid, bundle_lidvid)
+        self.db.create_other_collection(c2_lidvid, bundle_lidvid)
+        self.assertEqual([], self.db.get_bundle_product_lidvids(bundle_lidvid))
+
+        self.db.create_fits_product(p2_lidvid, c1_lidvid)
+        self.db.create_fits_product(p1_lidvid, c1_lidvid)
+        self.db.create_fits_product(p3_lidvid, c2_lidvid)
+        self.assertEqual(
+            [p3_lidvid, p1_lidvid, p2_lidvid],
+            self.db.get_bundle_product_lidvids(bundle_lidvid),
+        )
+
     ############################################################
 
     def test_create_browse_product(self) -> None:
@@ -529,6 +553,57 @@ class Test_BundleDB(unittest.TestCase):
         self.db.create_fits_file(self.dummy_os_filepath, basename, product_lidvid, 1)
         self.assertTrue(self.db.fits_file_exists(basename, product_lidvid))
 
+    def test_batch_ingestion(self) -> None:
+        bundle_lidvid = "urn:nasa:pds:hst_99999::1.1"
+        self.db.create_bundle(bundle_lidvid)
+        collection_lidvid = "urn:nasa:pds:hst_99999:data_acs_raw::1.8"
+        product_lidvid = "urn:nasa:pds:hst_99999:data_acs_raw:p::8.1"
+        doc_collection_lidvid = "urn:nasa:pds:hst_99999:document::1.8"
+        doc_product_lidvid = "urn:nasa:pds:hst_99999:document:phase2::1.8"
+
+        with self.db.batch_ingestion():
+            self.assertTrue(self.db.in_batch_ingestion())
+            self.db.create_other_collection(collection_lidvid, bundle_lidvid)
+            # Creating rows twice is harmless in a batch, too.
+            for _ in range(2):
+                self.db.create_fits_product(product_lidvid, collection_lidvid)
+                self.db.create_fits_file(
+                    self.dummy_os_filepath, "p_raw.fits", product_lidvid, 3
+                )
+                self.db.create_bad_fits_file(
+                    self.dummy_os_filepath, "q_raw.fits", product_lidvid, "oops"
+                )
+            self.db.create_document_collection(doc_collection_lidvid, bundle_lidvid)
+            self.db.create_document_product(doc_product_lidvid, doc_collection_lidvid)
+            self.db.create_document_file(
+                self.dummy_os_filepath, "phase2.pdf", doc_product_lidvid
+            )
+            # The rows are visible before the batch commits.
+            self.assertTrue(self.db.fits_product_exists(product_lidvid))
+            self.assertTrue(self.db.fits_file_exists("p_raw.fits", product_lidvid))
+        self.assertFalse(self.db.in_batch_ingestion())
+
+        self.assertEqual(
+            [("p_raw.fits", "fits_file"), ("q_raw.fits", "bad_fits_file")],
+            [(f.basename, f.type) for f in self.db.get_product_files(product_lidvid)],
+        )
+        fits_file = cast(FitsFile, self.db.get_file("p_raw.fits", product_lidvid))
+        self.assertEqual(3, fits_file.hdu_count)
+        self.assertEqual(file_md5(self.dummy_os_filepath), fits_file.md5_hash)
+        self.assertTrue(self.db.bad_fits_file_exists("q_raw.fits", product_lidvid))
+        self.assertTrue(self.db.document_file_exists("phase2.pdf", doc_product_lidvid))
+        fits_product = cast(FitsProduct, self.db.get_product(product_lidvid))
+        self.assertEqual("p", fits_product.rootname)
+
+        # A batch that raises is rolled back.
+        other_product_lidvid = "urn:nasa:pds:hst_99999:data_acs_raw:q::8.1"
+        with self.assertRaises(ValueError):
+            with self.db.batch_ingestion():
+                self.db.create_fits_product(other_product_lidvid, collection_lidvid)
+                raise ValueError()
+        self.assertFalse(self.db.product_exists(other_product_lidvid))
+        self.assertTrue(self.db.product_exists(product_lidvid))
+
     def test_file_exists(self) -> None:
         bundle_lidvid = "urn:nasa:pds:hst_99999::1.1"
         self.db.create_bundle(bundle_lidvid)
@@ -870,6 +945,57 @@ class Test_BundleDB(unittest.TestCase):
         self.assertEqual(basename, product_label.basename)
         self.assertEqual(file_md5(self.dummy_os_filepath), product_label.md5_hash)
 
+    def test_create_labels_with_md5s(self) -> None:
+        bundle_lidvid = "urn:nasa:pds:hst_99999::1.1"
+        self.db.create_bundle(bundle_lidvid)
+        collection_lidvid = "urn:nasa:pds:hst_99999:data_acs_raw::1.1"
+        self.db.create_other_collection(collection_lidvid, bundle_lidvid)
+
+        # Given hashes are used without reading the files.
+        missing_os_filepath = self.dummy_os_filepath + ".missing"
+        self.db.create_bundle_label(
+            missing_os_filepath, "bundle.xml", bundle_lidvid, "bundle md5"
+        )
+        self.db.create_collection_label(
+            missing_os_filepath, "collection.xml", collection_lidvid, "label md5"
+        )
+        self.db.create_collection_inventory(
+            missing_os_filepath, "collection.csv", collection_lidvid, "csv md5"
+        )
+        self.assertEqual("bundle md5", self.db.get_bundle_label(bundle_lidvid).md5_hash)
+        self.assertEqual(
+            "label md5", self.db.get_collection_label(collection_lidvid).md5_hash
+        )
+        self.assertEqual(
+            "csv md5", self.db.get_collection_inventory(collection_lidvid).md5_hash
+        )
+
+    def test_get_file_md5s(self) -> None:
+        bundle_lidvid = "urn:nasa:pds:hst_99999::1.1"
+        self.db.create_bundle(bundle_lidvid)
+        collection_lidvid = "urn:nasa:pds:hst_99999:data_acs_raw::1.1"
+        self.db.create_other_collection(collection_lidvid, bundle_lidvid)
+        product_lidvid = "urn:nasa:pds:hst_99999:data_acs_raw:j6gp01lzq::1.8"
+        self.db.create_fits_product(product_lidvid, collection_lidvid)
+        self.assertEqual([], self.db.get_file_md5s())
+
+        md5 = file_md5(self.dummy_os_filepath)
+        self.db.create_browse_file(
+            self.dummy_os_filepath, "j6gp01lzq_raw.jpg", product_lidvid, 1
+        )
+        self.db.create_product_label(
+            self.dummy_os_filepath, "j6gp01lzq_raw.xml", product_lidvid
+        )
+        self.db.create_bundle_label(self.dummy_os_filepath, "bundle.xml", bundle_lidvid)
+        self.assertEqual(
+            {
+                (product_lidvid, "j6gp01lzq_raw.jpg", md5),
+                (product_lidvid, "j6gp01lzq_raw.xml", md5),
+                (bundle_lidvid, "bundle.xml", md5),
+            },
+            set(self.db.get_file_md5s()),
+        )
+
     ############################################################
 
     def test_get_card_dictionaries(self) -> None:
@@ -888,6 +1014,29 @@ class Test_BundleDB(unittest.TestCase):
 
     ############################################################
 
+    def test_get_downloaded_siblings(self) -> None:
+        self.assertFalse(self.db.downloaded_files_exist())
+        self.assertEqual([], self.db.get_downloaded_siblings("foo_raw.fits"))
+
+        self.db.create_downloaded_files("HST/foo", ["foo_spt.fits", "foo_raw.fits"])
+        self.db.create_downloaded_files("HST/bar", ["bar_raw.fits", "foo_raw.fits"])
+        # recording them again is harmless
+        self.db.create_downloaded_files("HST/foo", ["foo_raw.fits"])
+        self.assertTrue(self.db.downloaded_files_exist())
+
+        # a file downloaded twice belongs to the first directory
+        self.assertEqual(
+            ["foo_raw.fits", "foo_spt.fits"],
+            self.db.get_downloaded_siblings("foo_raw.fits"),
+        )
+        self.assertEqual(
+            ["bar_raw.fits", "foo_raw.fits"],
+            self.db.get_downloaded_siblings("bar_raw.fits"),
+        )
+        self.assertEqual([], self.db.get_downloaded_siblings("baz_raw.fits"))
+
+    ############################################################
+
     def test_get_proposal_info(self) -> None:
         bundle_lid = "urn:nasa:pds:hst_99999"
         self.assertFalse(self.db.proposal_info_exists(bundle_lid))
@@ -0,0 +1,134 @@
+import os
+import tempfile
+import unittest
+from typing import List, Tuple
+
+from pdart.db.BundleDB import BundleDB, create_bundle_db_in_memory
+from pdart.db.BundleWalk import BundleWalk
+from pdart.db.SqlAlchTables import (
+    BadFitsFile,
+    BrowseFile,
+    BrowseProduct,
+    DocumentCollection,
+    DocumentFile,
+    DocumentProduct,
+    FitsFile,
+    FitsProduct,
+    OtherCollection,
+)
+
+_BUNDLE_LIDVID: str = "urn:nasa:pds:hst_99999::1.1"
+_DATA_COLLECTION_LIDVID: str = "urn:nasa:pds:hst_99999:data_acs_raw::1.1"
+_BROWSE_COLLECTION_LIDVID: str = "urn:nasa:pds:hst_99999:browse_acs_raw::1.1"
+_DOC_COLLECTION_LIDVID: str = "urn:nasa:pds:hst_99999:document::1.1"
+_FITS_PRODUCT_LIDVID: str = "urn:nasa:pds:hst_99999:data_acs_raw:j6gp01lzq::1.1"
+_BAD_FITS_PRODUCT_LIDVID: str = "urn:nasa:pds:hst_99999:data_acs_raw:j6gp02lzq::1.1"
+_BROWSE_PRODUCT_LIDVID: str = "urn:nasa:pds:hst_99999:browse_acs_raw:j6gp01lzq::1.1"
+_DOC_PRODUCT_LIDVID: str = "urn:nasa:pds:hst_99999:document:phase2::1.1"
+
+
+class _RecordingWalk(BundleWalk):
+    def __init__(self, bundle_db: BundleDB) -> None:
+        BundleWalk.__init__(self, bundle_db)
+        self.visits: List[Tuple[str, str]] = []
+
+    def visit_document_collection(
+        self, document_collection: DocumentCollection, post: bool
+    ) -> None:
+        if not post:
+            self.visits.append(("document_collection", document_collection.lidvid))
+
+    def visit_other_collection(
+        self, other_collection: OtherCollection, post: bool
+    ) -> None:
+        if not post:
+            self.visits.append(("other_collection", other_collection.lidvid))
+
+    def visit_browse_product(self, browse_product: BrowseProduct, post: bool) -> None:
+        if not post:
+            self.visits.append(("browse_product", browse_product.lidvid))
+
+    def visit_document_product(
+        self, document_product: DocumentProduct, post: bool
+    ) -> None:
+        if not post:
+            self.visits.append(("document_product", document_product.lidvid))
+
+    def visit_fits_product(self, fits_product: FitsProduct, post: bool) -> None:
+        if not post:
+            self.visits.append(("fits_product", fits_product.lidvid))
+        else:
+            # Visitors may write to the database as they go.
+            self.db.commit()
+
+    def visit_browse_file(self, browse_file: BrowseFile) -> None:
+        self.visits.append(("browse_file", browse_file.basename))
+
+    def visit_document_file(self, document_file: DocumentFile) -> None:
+        self.visits.append(("document_file", document_file.basename))
+
+    def visit_fits_file(self, fits_file: FitsFile) -> None:
+        self.visits.append(("fits_file", fits_file.basename))
+
+    def visit_bad_fits_file(self, bad_fits_file: BadFitsFile) -> None:
+        self.visits.append(("bad_fits_file", bad_fits_file.basename))
+
+
+class Test_BundleWalk(unittest.TestCase):
+    def setUp(self) -> None:
+        self.db = create_bundle_db_in_memory()
+        self.db.create_tables()
+        (handle, filepath) = tempfile.mkstemp(suffix="_raw.fits", prefix="j")
+        os.write(handle, os.urandom(32))
+        os.close(handle)
+        self.dummy_os_filepath = filepath
+
+    def tearDown(self) -> None:
+        os.remove(self.dummy_os_filepath)
+
+    def test_walk(self) -> None:
+        db = self.db
+        filepath = self.dummy_os_filepath
+        db.create_bundle(_BUNDLE_LIDVID)
+
+        db.create_other_collection(_DATA_COLLECTION_LIDVID, _BUNDLE_LIDVID)
+        db.create_fits_product(_FITS_PRODUCT_LIDVID, _DATA_COLLECTION_LIDVID)
+        db.create_fits_file(filepath, "j6gp01lzq_raw.fits", _FITS_PRODUCT_LIDVID, 1)
+        db.create_fits_product(_BAD_FITS_PRODUCT_LIDVID, _DATA_COLLECTION_LIDVID)
+        db.create_bad_fits_file(
+            filepath, "j6gp02lzq_raw.fits", _BAD_FITS_PRODUCT_LIDVID, "bad"
+        )
+
+        db.create_other_collection(_BROWSE_COLLECTION_LIDVID, _BUNDLE_LIDVID)
+        db.create_browse_product(
+            _BROWSE_PRODUCT_LIDVID, _FITS_PRODUCT_LIDVID, _BROWSE_COLLECTION_LIDVID
+        )
+        db.create_browse_file(filepath, "j6gp01lzq_raw.jpg", _BROWSE_PRODUCT_LIDVID, 1)
+
+        db.create_document_collection(_DOC_COLLECTION_LIDVID, _BUNDLE_LIDVID)
+        db.create_document_product(_DOC_PRODUCT_LIDVID, _DOC_COLLECTION_LIDVID)
+        db.create_document_file(filepath, "phase2.pdf", _DOC_PRODUCT_LIDVID)
+        db.create_document_file(filepath, "phase2.apt", _DOC_PRODUCT_LIDVID)
+
+        expected = [
+            ("other_collection", _BROWSE_COLLECTION_LIDVID),
+            ("browse_product", _BROWSE_PRODUCT_LIDVID),
+            ("browse_file", "j6gp01lzq_raw.jpg"),
+            ("other_collection", _DATA_COLLECTION_LIDVID),
+            ("fits_product", _FITS_PRODUCT_LIDVID),
+            ("fits_file", "j6gp01lzq_raw.fits"),
+            ("fits_product", _BAD_FITS_PRODUCT_LIDVID),
+            ("bad_fits_file", "j6gp02lzq_raw.fits"),
+            ("document_collection", _DOC_COLLECTION_LIDVID),
+            ("document_product", _DOC_PRODUCT_LIDVID),
+            ("document_file", "phase2.apt"),
+            ("document_file", "phase2.pdf"),
+        ]
+        walk = _RecordingWalk(db)
+        walk.walk()
+        self.assertEqual(expected, walk.visits)
+
+        # Walking again gives the same visits.
+        walk = _RecordingWalk(db)
+        walk.walk()
+        self.assertEqual(expected, walk.visits)
@@ -1,12 +1,19 @@
+import os
+import pickle
+import shutil
+import tempfile
 import unittest
 
 from fs.path import basename
 
-from pdart.db.BundleDB import create_bundle_db_in_memory
+from pdart.db.BundleDB import BundleDB, create_bundle_db_in_memory
 from pdart.db.FitsFileDB import (
     get_card_dictionaries,
     get_file_offsets,
+    populate_database_from_downloads,
     populate_database_from_fits_file,
+    populate_database_from_fits_files,
+    read_fits_file_record,
 )
 from pdart.db.Utils import path_to_testfile
 
@@ -72,3 +79,156 @@ class Test_FitsFileDB(unittest.TestCase):
 
         offsets = get_file_offsets(self.db, fits_product_lidvid)
         self.assertEqual(4, len(offsets))
+
+    def test_read_fits_file_record(self) -> None:
+        fits_product_lidvid = "urn:nasa:pds:hst_09059:data_acs_raw:j6gp01lzq_raw::2.0"
+        os_filepath = path_to_testfile("j6gp01lzq_raw.fits")
+
+        record = read_fits_file_record(os_filepath, fits_product_lidvid)
+        self.assertIsNone(record.exception_message)
+        self.assertEqual(4, record.hdu_count)
+        self.assertEqual(4, len(record.hdu_dicts))
+        self.assertEqual(16, record.card_dicts[1]["value"])
+
+        # records must survive the trip between processes
+        record2 = pickle.loads(pickle.dumps(record))
+        self.assertEqual(record.card_dicts, record2.card_dicts)
+
+        bad_record = read_fits_file_record(
+            path_to_testfile("j6gp02lzq_raw.fits"), fits_product_lidvid
+        )
+        self.assertIsNotNone(bad_record.exception_message)
+
+    def test_populate_from_fits_files(self) -> None:
+        good_lidvid = "urn:nasa:pds:hst_09059:data_acs_raw:j6gp01lzq_raw::2.0"
+        good_filepath = path_to_testfile("j6gp01lzq_raw.fits")
+        bad_lidvid = "urn:nasa:pds:hst_09059:data_acs_raw:j6gp02lzq_raw::2.0"
+        bad_filepath = path_to_testfile("j6gp02lzq_raw.fits")
+
+        with self.db.batch_ingestion():
+            populate_database_from_fits_files(
+                self.db, [(good_filepath, good_lidvid), (bad_filepath, bad_lidvid)], 2
+            )
+
+        self.assertTrue(self.db.fits_file_exists(basename(good_filepath), good_lidvid))
+        self.assertTrue(
+            self.db.bad_fits_file_exists(basename(bad_filepath), bad_lidvid)
+        )
+
+        # The result should be the same as populating one at a time.
+        db2 = create_bundle_db_in_memory()
+        db2.create_tables()
+        populate_database_from_fits_file(db2, good_filepath, good_lidvid)
+        self.assertEqual(
+            get_card_dictionaries(db2, good_lidvid, basename(good_filepath)),
+            get_card_dictionaries(self.db, good_lidvid, basename(good_filepath)),
+        )
+        self.assertEqual(
+            get_file_offsets(db2, good_lidvid), get_file_offsets(self.db, good_lidvid)
+        )
+
+    def test_card_dictionary_cache(self) -> None:
+        bundle_lidvid = "urn:nasa:pds:hst_09059::2.0"
+        collection_lidvid = "urn:nasa:pds:hst_09059:data_acs_raw::2.0"
+        fits_product_lidvid = "urn:nasa:pds:hst_09059:data_acs_raw:j6gp01lzq_raw::2.0"
+        os_filepath = path_to_testfile("j6gp01lzq_raw.fits")
+        file_basename = basename(os_filepath)
+
+        self.db.create_bundle(bundle_lidvid)
+        self.db.create_other_collection(collection_lidvid, bundle_lidvid)
+        self.db.create_fits_product(fits_product_lidvid, collection_lidvid)
+        populate_database_from_fits_file(self.db, os_filepath, fits_product_lidvid)
+
+        card_dicts = self.db.get_card_dictionaries(fits_product_lidvid, file_basename)
+        self.assertEqual((0, 1), (self.db.card_cache_hits, self.db.card_cache_misses))
+        card_dicts[0]["BITPIX"] = "changed"
+        self.assertEqual(
+            "16",
+            self.db.get_card_dictionaries(fits_product_lidvid, file_basename)[0][
+                "BITPIX"
+            ],
+        )
+        self.assertEqual((1, 1), (self.db.card_cache_hits, self.db.card_cache_misses))
+
+        # Preloading the collection gives the same dictionaries.
+        self.db.clear_card_cache()
+        self.db.preload_card_dictionaries(collection_lidvid)
+        preloaded = self.db.get_card_dictionaries(fits_product_lidvid, file_basename)
+        self.assertEqual((2, 1), (self.db.card_cache_hits, self.db.card_cache_misses))
+        self.db.clear_card_cache()
+        self.assertEqual(
+            preloaded,
+            self.db.get_card_dictionaries(fits_product_lidvid, file_basename),
+        )
+
+        # Missing files still raise.
+        with self.assertRaises(Exception):
+            self.db.get_card_dictionaries(fits_product_lidvid, "missing.fits")
+
+    def test_preload_card_dictionaries_in_windows(self) -> None:
+        # A cache of two files preloads one file at a time.
+        db = BundleDB("sqlite:///", card_cache_size=2)
+        db.create_tables()
+        bundle_lidvid = "urn:nasa:pds:hst_09059::2.0"
+        collection_lidvid = "urn:nasa:pds:hst_09059:data_acs_raw::2.0"
+        db.create_bundle(bundle_lidvid)
+        db.create_other_collection(collection_lidvid, bundle_lidvid)
+        # The same FITS file serves for both products.
+        os_filepath = path_to_testfile("j6gp01lzq_raw.fits")
+        keys = []
+        for name in ["j6gp01lzq", "j6gp02lzq"]:
+            fits_product_lidvid = f"urn:nasa:pds:hst_09059:data_acs_raw:{name}_raw::2.0"
+            db.create_fits_product(fits_product_lidvid, collection_lidvid)
+            populate_database_from_fits_file(db, os_filepath, fits_product_lidvid)
+            keys.append((fits_product_lidvid, basename(os_filepath)))
+
+        db.preload_card_dictionaries(collection_lidvid)
+        first = db.get_card_dictionaries(*keys[0])
+        self.assertEqual((1, 0), (db.card_cache_hits, db.card_cache_misses))
+        # The second window is loaded when its file is first asked for,
+        # and not again after that.
+        second = db.get_card_dictionaries(*keys[1])
+        self.assertEqual((1, 1), (db.card_cache_hits, db.card_cache_misses))
+        self.assertEqual(second, db.get_card_dictionaries(*keys[1]))
+        self.assertEqual((2, 1), (db.card_cache_hits, db.card_cache_misses))
+
+        # The windows give the same dictionaries as loading each file.
+        db.clear_card_cache()
+        self.assertEqual(first, db.get_card_dictionaries(*keys[0]))
+        self.assertEqual(second, db.get_card_dictionaries(*keys[1]))
+        self.assertEqual((2, 3), (db.card_cache_hits, db.card_cache_misses))
+
+        # Only the files of the given products are preloaded.
+        db.clear_card_cache()
+        db.preload_card_dictionaries(collection_lidvid, {keys[1][0]})
+        self.assertEqual(second, db.get_card_dictionaries(*keys[1]))
+        self.assertEqual((3, 3), (db.card_cache_hits, db.card_cache_misses))
+        self.assertEqual(first, db.get_card_dictionaries(*keys[0]))
+        self.assertEqual((3, 4), (db.card_cache_hits, db.card_cache_misses))
+
+    def test_populate_from_downloads(self) -> None:
+        mast_downloads_dir = tempfile.mkdtemp(None, "test_downloads_")
+        try:
+            for dirname, basenames in [
+                ("j6gp01lzq", ["j6gp01lzq_spt.fits", "j6gp01lzq_raw.fits"]),
+                ("j6gp02lzq", ["j6gp02lzq_raw.fits"]),
+            ]:
+                dirpath = os.path.join(mast_downloads_dir, "HST", dirname)
+                os.makedirs(dirpath)
+                for basename in basenames:
+                    open(os.path.join(dirpath, basename), "w").close()
+
+            self.assertFalse(self.db.downloaded_files_exist())
+            populate_database_from_downloads(self.db, mast_downloads_dir)
+            self.assertTrue(self.db.downloaded_files_exist())
+        finally:
+            shutil.rmtree(mast_downloads_dir)
+
+        self.assertEqual(
+            ["j6gp01lzq_raw.fits", "j6gp01lzq_spt.fits"],
+            self.db.get_downloaded_siblings("j6gp01lzq_spt.fits"),
+        )
+        self.assertEqual(
+            ["j6gp02lzq_raw.fits"],
+            self.db.get_downloaded_siblings("j6gp02lzq_raw.fits"),
+        )
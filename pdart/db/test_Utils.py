@@ -1,9 +1,10 @@
 # coding=utf-8
 import os
+import shutil
 import tempfile
 import unittest
 
-from pdart.db.Utils import file_md5, string_md5
+from pdart.db.Utils import bytes_md5, file_digests, file_md5, file_md5s, string_md5
 
 
 class Test_Utils(unittest.TestCase):
@@ -15,6 +16,35 @@ class Test_Utils(unittest.TestCase):
         finally:
             os.remove(filepath)
 
+    def test_file_digests(self) -> None:
+        (handle, filepath) = tempfile.mkstemp()
+        try:
+            with os.fdopen(handle, "wb") as f:
+                f.write(b"foobar")
+            self.assertEqual(
+                {
+                    "md5": "3858f62230ac3c915f300c664312c63f",
+                    "sha256": "c3ab8ff13720e8ad9047dd39466b3c8974e592c2fa383d4a3960714caef0c4f2",
+                },
+                file_digests(filepath, ["md5", "sha256"]),
+            )
+        finally:
+            os.remove(filepath)
+
+    def test_file_md5s(self) -> None:
+        dirpath = tempfile.mkdtemp()
+        try:
+            expected = {}
+            for n in range(20):
+                filepath = os.path.join(dirpath, f"file{n}")
+                with open(filepath, "w") as f:
+                    f.write(str(n) * n)
+                expected[filepath] = string_md5(str(n) * n)
+            self.assertEqual(expected, file_md5s(expected.keys()))
+            self.assertEqual({}, file_md5s([]))
+        finally:
+            shutil.rmtree(dirpath)
+
     def test_string_md5(self) -> None:
         self.assertEqual("d41d8cd98f00b204e9800998ecf8427e", string_md5(""))
         self.assertEqual("3858f62230ac3c915f300c664312c63f", string_md5("foobar"))
@@ -25,3 +55,10 @@ class Test_Utils(unittest.TestCase):
         self.assertEqual(
             "8277e4c295daf69388600e4d3befe35f", string_md5("पाइथन मन पर््दैना ।")
         )
+
+    def test_bytes_md5(self) -> None:
+        self.assertEqual("d41d8cd98f00b204e9800998ecf8427e", bytes_md5(b""))
+        self.assertEqual(
+            string_md5("¿Cómo está Ud., señor?"),
+            bytes_md5("¿Cómo está Ud., señor?".encode("utf-8")),
+        )
@@ -0,0 +1,54 @@
+"""
+Copying files between filesystems without copying their bytes.
+"""
+import os
+import os.path
+from typing import Optional
+
+import fs.copy
+import fs.errors
+from fs.base import FS
+
+# Hardlink files instead of copying them when both filesystems keep
+# them on the same OS filesystem.
+_LINK_FILES: bool = True
+
+
+def _syspath(filesys: FS, path: str) -> Optional[str]:
+    try:
+        return filesys.getsyspath(path)
+    except fs.errors.NoSysPath:
+        return None
+
+
+def link_or_copy_file(src_fs: FS, src_path: str, dst_fs: FS, dst_path: str) -> None:
+    """
+    Copy the file like fs.copy.copy_file().  If both the source and
+    destination files live on the same OS filesystem, hardlink the
+    destination to the source instead of copying the bytes.
+
+    The two are then the same file, so only use it when the source
+    file won't be changed afterwards: for instance, when it's about to
+    be deleted.
+    """
+    src_syspath = _syspath(src_fs, src_path) if _LINK_FILES else None
+    if src_syspath is not None:
+        if dst_fs.exists(dst_path):
+            dst_syspath = _syspath(dst_fs, dst_path)
+            if dst_syspath is not None and os.path.samefile(src_syspath, dst_syspath):
+                return
+        # Create the destination file through the filesystem, so that
+        # it has a system path even in a COWFS, and then replace it
+        # with the link.
+        dst_fs.writebytes(dst_path, b"")
+        dst_syspath = _syspath(dst_fs, dst_path)
+        if dst_syspath is not None:
+            try:
+                os.link(src_syspath, dst_syspath + ".link")
+            except OSError:
+                # on another device, or links aren't supported
+                pass
+            else:
+                os.replace(dst_syspath + ".link", dst_syspath)
+                return
+    fs.copy.copy_file(src_fs, src_path, dst_fs, dst_path)
@@ -1,11 +1,20 @@
+import itertools
+import os
+import os.path
 from typing import (
     Any,
     BinaryIO,
     Collection,
+    Dict,
     Generator,
+    IO,
+    Iterator,
     List,
     Mapping,
     Optional,
+    Set,
+    Tuple,
+    cast,
 )
 
 import fs.copy
@@ -30,12 +39,31 @@ layer_names = ["NO_LAYER", "BASE_LAYER", "ADD_LAYER", "ROOT_LAYER"]
 
 DEL = "__DELETED__"
 
+# The journal of marked paths, one per line, at the root of the
+# deletions_fs.
+DEL_JOURNAL = "__DELETED__.journal"
+
+# Record new deletion marks in the journal instead of as a directory
+# and a DEL file for each path, which costs several inodes for every
+# file added.  Layers may hold marks of both kinds.
+_USE_DELETIONS_JOURNAL: bool = True
+
+# Check the full invariant when opening a COWFS.  It walks every
+# layer, which is slow on a big bundle, so it's only for debugging;
+# the index checks each change as it's made.
+_CHECK_INVARIANTS: bool = False
+
 
 def _deletions_invariant(filesys: FS) -> None:
     """
-    The only files the given filesystem contains all are named DEL.
+    The only files the given filesystem contains all are named DEL,
+    except for the journal at its root.
     """
-    names = {fs.path.basename(file) for file in filesys.walk.files()}
+    names = {
+        fs.path.basename(file)
+        for file in filesys.walk.files()
+        if file != fs.path.abspath(DEL_JOURNAL)
+    }
     assert not names or names == {DEL}
 
 
@@ -49,6 +77,52 @@ def paths(filesys: FS) -> Generator[str, None, None]:
         yield file
 
 
+def _walk(filesys: FS) -> Generator[Tuple[str, List[str], List[str]], None, None]:
+    """
+    Like os.walk() on the filesystem, with absolute paths in it.  It
+    walks the OS directories directly where it can, which is much
+    faster.
+    """
+    try:
+        os_root = filesys.getsyspath("/")
+    except fs.errors.NoSysPath:
+        for step in filesys.walk():
+            yield (
+                step.path,
+                [info.name for info in step.dirs],
+                [info.name for info in step.files],
+            )
+    else:
+        for os_dirpath, dirnames, filenames in os.walk(os_root):
+            relpath = os.path.relpath(os_dirpath, os_root)
+            if relpath == ".":
+                yield "/", dirnames, filenames
+            else:
+                yield "/" + relpath.replace(os.sep, "/"), dirnames, filenames
+
+
+# Distinguishes the COWFSes sharing a listing cache.
+_COWFS_IDS: Iterator[int] = itertools.count()
+
+
+def _index_key(path: str) -> str:
+    return fs.path.abspath(fs.path.normpath(path))
+
+
+def _marked_paths(deletions_fs: FS) -> Set[str]:
+    """
+    All the paths marked in the deletions filesystem, in either form.
+    """
+    marked_paths = {
+        dirpath
+        for dirpath, dirnames, filenames in _walk(deletions_fs)
+        if DEL in filenames
+    }
+    if deletions_fs.isfile(DEL_JOURNAL):
+        marked_paths.update(deletions_fs.readtext(DEL_JOURNAL).splitlines())
+    return marked_paths
+
+
 def del_path(path: str) -> str:
     """
     Create the filepath for the deletion marker file.
@@ -64,13 +138,16 @@ class COWFS(FS):
         deletions_fs: Optional[FS] = None,
     ) -> None:
         FS.__init__(self)
+        # The open journal of deletion marks, if any; close() closes it.
+        self._journal: Optional[IO[str]] = None
         if additions_fs:
             self.additions_fs = additions_fs
         else:
             self.additions_fs = TempFS()
 
         if deletions_fs:
-            _deletions_invariant(deletions_fs)
+            if _CHECK_INVARIANTS:
+                _deletions_invariant(deletions_fs)
             self.deletions_fs = deletions_fs
         else:
             self.deletions_fs = TempFS()
@@ -78,7 +155,28 @@ class COWFS(FS):
         self.original_base_fs = base_fs
         self.base_fs = fs.wrap.read_only(base_fs)
 
-        self.invariant()
+        # An index of the paths in additions_fs and the paths marked in
+        # deletions_fs, read when first needed and then kept up to
+        # date, so that finding a path's layer doesn't need to probe
+        # them.  Only the base_fs is asked.
+        self._added_paths: Optional[Set[str]] = None
+        self._marked_paths: Optional[Set[str]] = None
+        self._meta_cache: Dict[str, Mapping[str, object]] = {}
+
+        # Merged directory listings, by path and then by COWFS.  A
+        # stack of COWFSes shares them, so a change to a path in any
+        # layer forgets the listings of it and its parent in every
+        # layer above it.  Changes made to the bottom filesystem
+        # except through a COWFS aren't seen.
+        self._id = next(_COWFS_IDS)
+        self._listings: Dict[str, Dict[int, List[str]]]
+        if isinstance(base_fs, COWFS):
+            self._listings = base_fs._listings
+        else:
+            self._listings = {}
+
+        if _CHECK_INVARIANTS:
+            self.invariant()
 
     @staticmethod
     def create_cowfs(
@@ -113,9 +211,7 @@ class COWFS(FS):
         _deletions_invariant(self.deletions_fs)
 
         additions_paths = set(paths(self.additions_fs))
-        deletions_paths = {
-            fs.path.dirname(file) for file in self.deletions_fs.walk.files()
-        }
+        deletions_paths = _marked_paths(self.deletions_fs)
         assert additions_paths <= deletions_paths, (
             f"additions_paths {additions_paths} is not "
             f"a subset of deletions_path {deletions_paths}"
@@ -123,18 +219,76 @@ class COWFS(FS):
 
         return True
 
+    def _load_layer_index(self) -> None:
+        if self._added_paths is None or self._marked_paths is None:
+            self._added_paths = {
+                fs.path.join(dirpath, name)
+                for dirpath, dirnames, filenames in _walk(self.additions_fs)
+                for name in dirnames + filenames
+            }
+            self._marked_paths = _marked_paths(self.deletions_fs)
+
+    def _added(self, path: str) -> None:
+        """
+        Record that the path was created in the additions_fs.  It must
+        already be marked in the deletions_fs, which keeps the
+        invariant.
+        """
+        self._load_layer_index()
+        assert self._added_paths is not None and self._marked_paths is not None
+        key = _index_key(path)
+        assert key in self._marked_paths, f"{path} is added but not marked"
+        self._added_paths.add(key)
+        self._forget_listings(key)
+
+    def _removed(self, path: str) -> None:
+        """
+        Record that the path was removed from the additions_fs.
+        """
+        self._load_layer_index()
+        assert self._added_paths is not None
+        key = _index_key(path)
+        self._added_paths.discard(key)
+        self._forget_listings(key)
+
     def is_deletion(self, path: str) -> bool:
         """
         Is the path marked in the deletions_fs"
         """
-        return self.deletions_fs.exists(del_path(path))
+        self._load_layer_index()
+        assert self._marked_paths is not None
+        return _index_key(path) in self._marked_paths
 
     def mark_deletion(self, path: str) -> None:
         """
         Mark the path in the deletions_fs.
         """
-        self.deletions_fs.makedirs(path, None, True)
-        self.deletions_fs.touch(del_path(path))
+        self._load_layer_index()
+        assert self._marked_paths is not None
+        key = _index_key(path)
+        if _USE_DELETIONS_JOURNAL:
+            if key not in self._marked_paths:
+                assert "\n" not in key, key
+                if self._journal is None:
+                    self._journal = self.deletions_fs.open(
+                        DEL_JOURNAL, "a", encoding="utf-8", newline="\n"
+                    )
+                self._journal.write(key + "\n")
+                # Flush it so that other COWFSes on the layer see it.
+                self._journal.flush()
+        else:
+            self.deletions_fs.makedirs(path, None, True)
+            self.deletions_fs.touch(del_path(path))
+        self._marked_paths.add(key)
+        self._forget_listings(key)
+
+    def _forget_listings(self, key: str) -> None:
+        """
+        Forget the cached listings that a change to the path could
+        change.
+        """
+        self._listings.pop(key, None)
+        self._listings.pop(fs.path.dirname(key), None)
 
     def makedirs_mark_deletion(
         self,
@@ -143,10 +297,12 @@ class COWFS(FS):
         recreate: bool = False,
     ) -> None:
         for p in fs.path.recursepath(path)[:-1]:
-            self.additions_fs.makedirs(p, permissions=permissions, recreate=True)
             self.mark_deletion(p)
-        self.additions_fs.makedir(path, permissions=permissions, recreate=recreate)
+            self.additions_fs.makedirs(p, permissions=permissions, recreate=True)
+            self._added(p)
         self.mark_deletion(path)
+        self.additions_fs.makedir(path, permissions=permissions, recreate=recreate)
+        self._added(path)
 
     def layer(self, path: str) -> int:
         """
@@ -156,9 +312,12 @@ class COWFS(FS):
 
         if path == "/":
             return ROOT_LAYER
-        if self.additions_fs.exists(path):
+        self._load_layer_index()
+        assert self._added_paths is not None and self._marked_paths is not None
+        key = _index_key(path)
+        if key in self._added_paths:
             return ADD_LAYER
-        elif self.is_deletion(path):
+        elif key in self._marked_paths:
             return NO_LAYER
         elif self.base_fs.exists(path):
             return BASE_LAYER
@@ -172,6 +331,7 @@ class COWFS(FS):
         self.makedirs_mark_deletion(fs.path.dirname(path))
         self.mark_deletion(path)
         fs.copy.copy_file(self.base_fs, path, self.additions_fs, path)
+        self._added(path)
 
     def triple_tree(self) -> None:
         print("base_fs ------------------------------")
@@ -182,8 +342,27 @@ class COWFS(FS):
         self.deletions_fs.tree()
 
     ############################################################
+    def exists(self, path: str) -> bool:
+        # The layer is enough; no need to get the info.
+        self.check()
+        return self.layer(path) != NO_LAYER
+
     def getmeta(self, namespace: str = "standard") -> Mapping[str, object]:
-        return self.base_fs.getmeta(namespace)
+        # validatepath() gets the meta on every call, and otherwise it
+        # would be fetched all the way down a stack of COWFSes.
+        if namespace not in self._meta_cache:
+            self._meta_cache[namespace] = self.base_fs.getmeta(namespace)
+        return self._meta_cache[namespace]
+
+    def validatepath(self, path: str) -> str:
+        # FS.validatepath() also checks the length of the system path,
+        # which means finding the path's layer a second time.  The
+        # layer's filesystem checks that itself when it's used.
+        self.check()
+        invalid_chars = cast(str, self.getmeta().get("invalid_path_chars"))
+        if invalid_chars and set(path).intersection(invalid_chars):
+            raise fs.errors.InvalidCharsInPath(path)
+        return fs.path.abspath(fs.path.normpath(path))
 
     def getinfo(self, path: str, namespaces: Optional[Collection[str]] = None) -> Info:
         self.check()
@@ -222,11 +401,31 @@ class COWFS(FS):
     def listdir(self, path: str) -> List[str]:
         self.check()
         self.validatepath(path)
+        key = _index_key(path)
+        listings = self._listings.get(key)
+        if listings is None or self._id not in listings:
+            listing = self._merged_listdir(path)
+            self._listings.setdefault(key, {})[self._id] = listing
+        else:
+            listing = listings[self._id]
+        return list(listing)
+
+    def _merged_listdir(self, path: str) -> List[str]:
+        """
+        List the directory, merging the layers.
+        """
         layer = self.layer(path)
         if layer == NO_LAYER:
             raise fs.errors.ResourceNotFound(path)
         elif layer == BASE_LAYER:
-            return self.base_fs.listdir(path)
+            # Nothing below it has been added, so leave out only the
+            # entries that have been deleted.
+            assert self._marked_paths is not None
+            return [
+                name
+                for name in self.base_fs.listdir(path)
+                if fs.path.join(_index_key(path), name) not in self._marked_paths
+            ]
         elif layer == ADD_LAYER:
             # Get the listing on the additions layer
             names = set(self.additions_fs.listdir(path))
@@ -301,10 +500,13 @@ class COWFS(FS):
         if layer == NO_LAYER:
             if mode_obj.create:
                 for p in fs.path.recursepath(path)[:-1]:
-                    self.additions_fs.makedirs(p, recreate=True)
                     self.mark_deletion(p)
+                    self.additions_fs.makedirs(p, recreate=True)
+                    self._added(p)
                 self.mark_deletion(path)
-                return self.additions_fs.openbin(path, mode, buffering, **options)
+                file = self.additions_fs.openbin(path, mode, buffering, **options)
+                self._added(path)
+                return file
             else:
                 raise fs.errors.ResourceNotFound(path)
         elif layer == ADD_LAYER:
@@ -334,6 +536,7 @@ class COWFS(FS):
                 raise fs.errors.FileExpected(path)
         elif layer == ADD_LAYER:
             self.additions_fs.remove(path)
+            self._removed(path)
             self.mark_deletion(path)
         elif layer == ROOT_LAYER:
             raise fs.errors.FileExpected(path)
@@ -353,6 +556,7 @@ class COWFS(FS):
         elif layer == ADD_LAYER:
             if self.additions_fs.isdir(path):
                 self.additions_fs.removedir(path)
+                self._removed(path)
                 self.mark_deletion(path)
             else:
                 raise fs.errors.DirectoryExpected(path)
@@ -379,6 +583,25 @@ class COWFS(FS):
 
     ############################################################
 
+    def close(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        FS.close(self)
+
+    def move(self, src_path: str, dst_path: str, overwrite: bool = False) -> None:
+        # FS.move() renames the files getsyspath() finds, which could
+        # change the base_fs, and would change the additions_fs
+        # without updating the layer index.  Copy and remove instead.
+        if not overwrite and self.exists(dst_path):
+            raise fs.errors.DestinationExists(dst_path)
+        if self.getinfo(src_path).is_dir:
+            raise fs.errors.FileExpected(src_path)
+        with self._lock:
+            with self.openbin(src_path) as read_file:
+                self.upload(dst_path, read_file)
+            self.remove(src_path)
+
     def makedirs(
         self,
         path: str,
@@ -5,7 +5,8 @@ from fs.memoryfs import MemoryFS
 from fs.tempfs import TempFS
 from fs.test import FSTestCases
 
-from pdart.fs.cowfs.COWFS import COWFS
+import pdart.fs.cowfs.COWFS
+from pdart.fs.cowfs.COWFS import ADD_LAYER, COWFS, NO_LAYER
 
 
 class TestCOWFS(FSTestCases, unittest.TestCase):
@@ -73,3 +74,113 @@ class TestCOWFS(FSTestCases, unittest.TestCase):
         # root raises an exception
         with self.assertRaises(fs.errors.NoSysPath):
             self.fs.getsyspath("/")
+
+    def test_layer_index(self) -> None:
+        # The layers found by a COWFS as it changes are the ones a new
+        # COWFS over the same filesystems finds.
+        self.tempfs.makedirs("/b$/dir1")
+        self.tempfs.writetext("/b$/dir1/base.txt", "base")
+        self.tempfs.writetext("/b$/dir1/gone.txt", "gone")
+        rw_fs = MemoryFS()
+        c = COWFS.create_cowfs(self.tempfs, rw_fs)
+        c.writetext("/b$/dir1/base.txt", "changed")
+        c.remove("/b$/dir1/gone.txt")
+        c.makedirs("/b$/dir2/dir3")
+        c.writetext("/b$/dir2/dir3/new.txt", "new")
+        c.writetext("/b$/dir2/temp.txt", "temp")
+        c.remove("/b$/dir2/temp.txt")
+        c.move("/b$/dir2/dir3/new.txt", "/b$/dir2/moved.txt")
+
+        paths = [
+            "/b$",
+            "/b$/dir1",
+            "/b$/dir1/base.txt",
+            "/b$/dir1/gone.txt",
+            "/b$/dir2",
+            "/b$/dir2/dir3",
+            "/b$/dir2/dir3/new.txt",
+            "/b$/dir2/temp.txt",
+            "/b$/dir2/moved.txt",
+            "/b$/nowhere.txt",
+        ]
+        c2 = COWFS.create_cowfs(self.tempfs, rw_fs, True)
+        self.assertEqual(
+            [c2.layer(path) for path in paths], [c.layer(path) for path in paths]
+        )
+        self.assertEqual(
+            [ADD_LAYER, ADD_LAYER, ADD_LAYER, NO_LAYER, ADD_LAYER, ADD_LAYER]
+            + [NO_LAYER, NO_LAYER, ADD_LAYER, NO_LAYER],
+            [c.layer(path) for path in paths],
+        )
+        # the base is untouched
+        self.assertEqual("base", self.tempfs.readtext("/b$/dir1/base.txt"))
+        self.assertTrue(self.tempfs.exists("/b$/dir1/gone.txt"))
+
+    def test_check_invariants(self) -> None:
+        rw_fs = MemoryFS()
+        rw_fs.makedirs("/deletions/b$")
+        rw_fs.writetext("/deletions/b$/stray.txt", "not a deletion marker")
+        # Opening it doesn't walk the layers...
+        COWFS.create_cowfs(self.tempfs, rw_fs, True)
+        # ...unless asked to.
+        pdart.fs.cowfs.COWFS._CHECK_INVARIANTS = True
+        try:
+            with self.assertRaises(AssertionError):
+                COWFS.create_cowfs(self.tempfs, rw_fs, True)
+        finally:
+            pdart.fs.cowfs.COWFS._CHECK_INVARIANTS = False
+
+    def test_deletions_journal(self) -> None:
+        self.tempfs.makedirs("/b$/dir1")
+        self.tempfs.writetext("/b$/dir1/gone.txt", "gone")
+        rw_fs = MemoryFS()
+
+        # Marks made the old way, as directories and DEL files...
+        pdart.fs.cowfs.COWFS._USE_DELETIONS_JOURNAL = False
+        try:
+            c = COWFS.create_cowfs(self.tempfs, rw_fs)
+            c.remove("/b$/dir1/gone.txt")
+            c.close()
+        finally:
+            pdart.fs.cowfs.COWFS._USE_DELETIONS_JOURNAL = True
+        self.assertTrue(rw_fs.isfile("/deletions/b$/dir1/gone.txt/__DELETED__"))
+
+        # ...are still read, and new marks go into the journal.
+        c = COWFS.create_cowfs(self.tempfs, rw_fs, True)
+        self.assertFalse(c.exists("/b$/dir1/gone.txt"))
+        c.makedirs("/b$/dir2/dir3")
+        c.writetext("/b$/dir2/dir3/new.txt", "new")
+        c.close()
+        self.assertEqual(
+            ["/", "/b$", "/b$/dir2", "/b$/dir2/dir3", "/b$/dir2/dir3/new.txt"],
+            rw_fs.readtext("/deletions/__DELETED__.journal").splitlines(),
+        )
+        self.assertFalse(rw_fs.exists("/deletions/b$/dir2"))
+
+        c = COWFS.create_cowfs(self.tempfs, rw_fs, True)
+        self.assertTrue(c.invariant())
+        self.assertFalse(c.exists("/b$/dir1/gone.txt"))
+        self.assertEqual("new", c.readtext("/b$/dir2/dir3/new.txt"))
+        self.assertEqual(ADD_LAYER, c.layer("/b$/dir2/dir3"))
+
+    def test_stacked_listings(self) -> None:
+        self.tempfs.makedirs("/b$/dir1")
+        self.tempfs.writetext("/b$/file1.txt", "file1")
+        lower = COWFS(self.tempfs)
+        upper = COWFS(lower)
+        self.assertEqual({"dir1", "file1.txt"}, set(upper.listdir("/b$")))
+
+        # Changes to a lower layer show in the upper layer's listings...
+        lower.writetext("/b$/file2.txt", "file2")
+        lower.remove("/b$/file1.txt")
+        lower.makedir("/b$/dir1/dir2")
+        self.assertEqual({"dir1", "file2.txt"}, set(upper.listdir("/b$")))
+        self.assertEqual(["dir2"], upper.listdir("/b$/dir1"))
+
+        # ...but changes to the upper layer don't show in the lower.
+        upper.writetext("/b$/file3.txt", "file3")
+        upper.removedir("/b$/dir1/dir2")
+        self.assertEqual({"dir1", "file2.txt", "file3.txt"}, set(upper.listdir("/b$")))
+        self.assertEqual([], upper.listdir("/b$/dir1"))
+        self.assertEqual({"dir1", "file2.txt"}, set(lower.listdir("/b$")))
+        self.assertEqual(["dir2"], lower.listdir("/b$/dir1"))
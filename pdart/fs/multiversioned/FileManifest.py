@@ -0,0 +1,67 @@
+"""
+Functionality to read and write file manifests.  A file manifest is a
+dictionary with keys corresponding to the filepaths of a version's
+files, and values corresponding to their MD5 hashes.
+"""
+import re
+from typing import Dict, Pattern
+
+from fs.base import FS
+from fs.errors import ResourceNotFound
+from fs.path import isabs, join
+
+FILE_MANIFEST_FILENAME: str = "file$manifest.txt"
+
+_md5RE: Pattern[str] = re.compile("^[0-9a-f]{32}$")
+
+
+def parse_file_manifest(txt: str) -> Dict[str, str]:
+    """
+    Given the (Unicode) contents of a file manifest, parse it and
+    return a file manifest dictionary.
+    """
+    d = {}
+    for n, line in enumerate(txt.split("\n")):
+        if line:
+            fields = line.split(" ", 1)
+            assert len(fields) == 2, f"line #{n} = {line!r}"
+            md5, filepath = fields
+            assert _md5RE.match(md5), f"line #{n} = {line!r}"
+            assert isabs(filepath), f"line #{n} = {line!r}"
+            d[filepath] = md5
+    return d
+
+
+def unparse_file_manifest(d: Dict[str, str]) -> str:
+    """
+    Given a file manifest dictionary, unparse it into a (Unicode)
+    string to be stored in a file manifest.
+    """
+    for k, v in d.items():
+        assert isabs(k) and "\n" not in k, k
+        assert _md5RE.match(v), v
+    return "".join([f"{v} {k}\n" for k, v in sorted(d.items())])
+
+
+def read_file_manifest_from_directory(fs: FS, dir: str) -> Dict[str, str]:
+    """
+    Given the path to a directory, return the file manifest
+    dictionary that lives in it, or an empty one if there is none.
+    """
+    FILE_MANIFEST_FILEPATH = join(dir, FILE_MANIFEST_FILENAME)
+    try:
+        return parse_file_manifest(
+            fs.readtext(FILE_MANIFEST_FILEPATH, encoding="utf-8")
+        )
+    except ResourceNotFound:
+        return dict()
+
+
+def write_file_manifest_to_directory(fs: FS, dir: str, d: Dict[str, str]) -> None:
+    """
+    Given the path to a directory, un-parse and write the contents of
+    the given file manifest dictionary into a file manifest in the
+    directory.
+    """
+    FILE_MANIFEST_FILEPATH = join(dir, FILE_MANIFEST_FILENAME)
+    fs.writetext(FILE_MANIFEST_FILEPATH, unparse_file_manifest(d), encoding="utf-8")
@@ -1,11 +1,19 @@
+import bisect
+import concurrent.futures
 from collections.abc import MutableMapping
-from typing import Any, Callable, Iterator, List, Optional, Set, cast
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, cast
 
 import fs.path
 from fs.base import FS
 from fs.subfs import SubFS
 from fs.tempfs import TempFS
 
+from pdart.fs.LinkFile import link_or_copy_file
+from pdart.fs.multiversioned.FileManifest import (
+    FILE_MANIFEST_FILENAME,
+    read_file_manifest_from_directory,
+    write_file_manifest_to_directory,
+)
 from pdart.fs.multiversioned.SubdirVersions import (
     SUBDIR_VERSIONS_FILENAME,
     read_subdir_versions_from_directory,
@@ -101,23 +109,46 @@ class Multiversioned(MutableMapping):
     Provides functionality to store multiple bundles into a single
     pyfilesystem.  Represents the wrapped filesystem as a mapping from
     LIDVIDs to VersionContents.
+
+    If link_files is set, files set into it are hardlinked to the
+    contents' files where possible instead of copied, so the contents'
+    files must not change afterwards.
     """
 
-    def __init__(self, fs: FS) -> None:
+    def __init__(self, fs: FS, link_files: bool = False) -> None:
         self.fs = fs
+        self.link_files = link_files
+        # The sorted VIDs of each LID in the filesystem, found with a
+        # single walk when first needed, and then kept up to date.
+        self._vids: Optional[Dict[LID, List[VID]]] = None
+
+    def _vid_index(self) -> Dict[LID, List[VID]]:
+        if self._vids is None:
+            self._vids = {}
+            for dir in self.fs.walk.dirs():
+                parts = fs.path.parts(dir)
+                if parts[-1].startswith("v$"):
+                    lid = LID.create_from_parts([str(p) for p in parts[1:-1]])
+                    bisect.insort(self._vids.setdefault(lid, []), VID(parts[-1][2:]))
+        return self._vids
 
     def make_lidvid_dir(self, lidvid: LIDVID) -> str:
         dir_path = lidvid_path(lidvid)
         self.fs.makedirs(dir_path, None, True)
+        vids = self._vid_index().setdefault(lidvid.lid(), [])
+        vid = lidvid.vid()
+        i = bisect.bisect_left(vids, vid)
+        if i == len(vids) or vids[i] != vid:
+            vids.insert(i, vid)
         return dir_path
 
     def lidvids(self) -> Set[LIDVID]:
         return set(self.__iter__())
 
     def latest_lidvid(self, lid: LID) -> Optional[LIDVID]:
-        matching = [lidvid for lidvid in self.lidvids() if lidvid.lid() == lid]
-        if matching:
-            return max(matching)
+        vids = self._vid_index().get(lid)
+        if vids:
+            return LIDVID.create_from_lid_and_vid(lid, vids[-1])
         else:
             return None
 
@@ -167,8 +198,22 @@ class Multiversioned(MutableMapping):
     ############################################################
 
     def update_from_single_version(
-        self, is_new: IS_NEW_TEST, single_version_fs: FS
+        self,
+        is_new: IS_NEW_TEST,
+        single_version_fs: FS,
+        md5s: Optional[Dict[str, str]] = None,
+        threads: int = 1,
     ) -> bool:
+        """
+        Add the versions in the single-version filesystem that is_new
+        says are new.  The MD5 hashes of its files, by filepath, may be
+        given so that they needn't be calculated.
+
+        If threads is more than one, the products of each collection
+        are added concurrently by that many threads, and the
+        collection once they all are.  Each product's new version
+        depends only on its own contents, so the result is the same.
+        """
         # TODO This import is circular; that's why I have it here
         # inside the function.  But there must be a better way to
         # structure.
@@ -183,16 +228,34 @@ class Multiversioned(MutableMapping):
 
         def update_from_lid(lid: LID) -> LIDVID:
             path = vv_lid_path(lid)
-            child_lidvids = {
-                update_from_lid(lid.extend_lid(strip_segment(name)))
+            child_lids = [
+                lid.extend_lid(strip_segment(name))
                 for name in single_version_fs.listdir(path)
                 if is_segment(name)
-            }
+            ]
+            if executor is not None and lid.is_collection_lid():
+                # Products have no children, so the workers never wait
+                # on the pool themselves.
+                child_lidvids = set(executor.map(update_from_lid, child_lids))
+            else:
+                child_lidvids = {update_from_lid(child_lid) for child_lid in child_lids}
             sfs = SubFS(single_version_fs, path)
             filepaths = {
                 filepath for filepath in sfs.walk.files() if "$" not in filepath
             }
-            contents = VersionContents.createFromLIDVIDs(child_lidvids, sfs, filepaths)
+            sub_md5s = {}
+            if md5s:
+                # The filepaths are absolute within the SubFS; the
+                # hashes are keyed by absolute paths in the whole
+                # single-version filesystem.
+                dirpath = fs.path.abspath(path)
+                for filepath in filepaths:
+                    md5 = md5s.get(fs.path.join(dirpath, fs.path.relpath(filepath)))
+                    if md5:
+                        sub_md5s[filepath] = md5
+            contents = VersionContents.createFromLIDVIDs(
+                child_lidvids, sfs, filepaths, sub_md5s
+            )
             return self.add_contents_if(is_new, lid, contents, False)
 
         bundle_segs = [
@@ -208,11 +271,20 @@ class Multiversioned(MutableMapping):
 
         changed = False
 
-        for bundle_seg in bundle_segs:
-            lid = LID.create_from_parts([str(bundle_seg)])
-            orig_lidvid: Optional[LIDVID] = self.latest_lidvid(lid)
-            new_lidvid: LIDVID = update_from_lid(lid)
-            changed = changed or new_lidvid != orig_lidvid
+        executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        if threads > 1:
+            # Find the versions before the threads start changing them.
+            self._vid_index()
+            executor = concurrent.futures.ThreadPoolExecutor(threads)
+        try:
+            for bundle_seg in bundle_segs:
+                lid = LID.create_from_parts([str(bundle_seg)])
+                orig_lidvid: Optional[LIDVID] = self.latest_lidvid(lid)
+                new_lidvid: LIDVID = update_from_lid(lid)
+                changed = changed or new_lidvid != orig_lidvid
+        finally:
+            if executor is not None:
+                executor.shutdown()
 
         return changed
 
@@ -220,7 +292,10 @@ class Multiversioned(MutableMapping):
 
     def __contains__(self, lidvid: Any) -> bool:
         if isinstance(lidvid, LIDVID):
-            return self.fs.isdir(lidvid_path(lidvid))
+            vids = self._vid_index().get(lidvid.lid(), [])
+            vid = lidvid.vid()
+            i = bisect.bisect_left(vids, vid)
+            return i < len(vids) and vids[i] == vid
         else:
             return False
 
@@ -242,26 +317,23 @@ class Multiversioned(MutableMapping):
 
         lidvids = {make_sub_lidvid(segment, vid) for segment, vid in list(d.items())}
         sub_fs = SubFS(self.fs, dirpath)
-        filepaths = set(sub_fs.walk.files(exclude=[SUBDIR_VERSIONS_FILENAME]))
-        return VersionContents.createFromLIDVIDs(lidvids, sub_fs, filepaths)
+        filepaths = set(
+            sub_fs.walk.files(
+                exclude=[SUBDIR_VERSIONS_FILENAME, FILE_MANIFEST_FILENAME]
+            )
+        )
+        # Archives written before there were manifests don't have
+        # them; then the hashes are calculated if needed.
+        md5s = read_file_manifest_from_directory(self.fs, dirpath)
+        return VersionContents.createFromLIDVIDs(lidvids, sub_fs, filepaths, md5s)
 
     def __iter__(self) -> Iterator[LIDVID]:
-        for dir in self.fs.walk.dirs():
-            parts = fs.path.parts(dir)
-            if parts[-1].startswith("v$"):
-                vid_part = str(parts[-1][2:])
-                lid_parts = [str(p) for p in parts[1:-1]]
-                yield LIDVID.create_from_lid_and_vid(
-                    LID.create_from_parts(lid_parts), VID(vid_part)
-                )
+        for lid, vids in list(self._vid_index().items()):
+            for vid in list(vids):
+                yield LIDVID.create_from_lid_and_vid(lid, vid)
 
     def __len__(self) -> int:
-        res = 0
-        for dir in self.fs.walk.dirs():
-            parts = fs.path.parts(dir)
-            if parts[-1].startswith("v$"):
-                res += 1
-        return res
+        return sum(len(vids) for vids in self._vid_index().values())
 
     def __setitem__(self, lidvid: LIDVID, contents: VersionContents) -> None:
         if lidvid in self:
@@ -282,10 +354,15 @@ class Multiversioned(MutableMapping):
         lidvid_dir = self.make_lidvid_dir(lidvid)
         if d:
             write_subdir_versions_to_directory(self.fs, lidvid_dir, d)
+        if contents.filepaths:
+            write_file_manifest_to_directory(self.fs, lidvid_dir, contents.file_md5s())
 
         for src_filepath in contents.filepaths:
             dst_filepath = fs.path.join(lidvid_dir, fs.path.relpath(src_filepath))
             self.fs.makedirs(fs.path.dirname(dst_filepath), None, True)
-            fs.copy.copy_file(contents.fs, src_filepath, self.fs, dst_filepath)
+            if self.link_files:
+                link_or_copy_file(contents.fs, src_filepath, self.fs, dst_filepath)
+            else:
+                fs.copy.copy_file(contents.fs, src_filepath, self.fs, dst_filepath)
         assert self.fs.isdir(lidvid_path(lidvid))
         assert lidvid in self
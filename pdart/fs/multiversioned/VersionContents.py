@@ -1,8 +1,20 @@
-from typing import Any, Callable, Generic, List, Set, TypeVar, Union, cast
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    List,
+    Optional,
+    Set,
+    TypeVar,
+    Union,
+    cast,
+)
 
 from fs.base import FS
 from fs.path import isabs
 
+from pdart.db.Utils import fs_file_md5
 from pdart.pds4.LID import LID
 from pdart.pds4.LIDVID import LIDVID
 
@@ -28,6 +40,10 @@ class VersionContents(Generic[S]):
     multiversion systems or single-version views, this data structure
     does double duty.  There is a flag to show that it contains
     LIDVIDs or not; this lets us distinguish the separate usages.
+
+    It may also know the MD5 hashes of its files.  Those it doesn't
+    know are calculated when needed, and two VersionContents are
+    compared by their files' hashes.
     """
 
     def __init__(
@@ -36,6 +52,7 @@ class VersionContents(Generic[S]):
         subcomponents: Set[S],
         fs: FS,
         filepaths: Set[str],
+        md5s: Optional[Dict[str, str]] = None,
     ) -> None:
         """
         Create a 'VersionContents' object.  DO NOT USE this
@@ -51,18 +68,39 @@ class VersionContents(Generic[S]):
             assert fs.isfile(filepath)
         self.fs = fs
         self.filepaths = filepaths
+        self.md5s: Dict[str, str] = {}
+        if md5s:
+            self.md5s = {
+                filepath: md5s[filepath] for filepath in filepaths if filepath in md5s
+            }
 
     @staticmethod
     def createFromLIDs(
-        subcomponents: Set[LID], fs: FS, filepaths: Set[str]
+        subcomponents: Set[LID],
+        fs: FS,
+        filepaths: Set[str],
+        md5s: Optional[Dict[str, str]] = None,
     ) -> "VersionContents[LID]":
-        return VersionContents[LID](False, subcomponents, fs, filepaths)
+        return VersionContents[LID](False, subcomponents, fs, filepaths, md5s)
 
     @staticmethod
     def createFromLIDVIDs(
-        subcomponents: Set[LIDVID], fs: FS, filepaths: Set[str]
+        subcomponents: Set[LIDVID],
+        fs: FS,
+        filepaths: Set[str],
+        md5s: Optional[Dict[str, str]] = None,
     ) -> "VersionContents[LIDVID]":
-        return VersionContents[LIDVID](True, subcomponents, fs, filepaths)
+        return VersionContents[LIDVID](True, subcomponents, fs, filepaths, md5s)
+
+    def file_md5s(self) -> Dict[str, str]:
+        """
+        Return the MD5 hash of each file by its filepath, calculating
+        those not yet known.
+        """
+        for filepath in self.filepaths:
+            if filepath not in self.md5s:
+                self.md5s[filepath] = fs_file_md5(self.fs, filepath)
+        return self.md5s
 
     def lidvids(self) -> List[LIDVID]:
         if self.contains_lidvids:
@@ -79,7 +117,9 @@ class VersionContents(Generic[S]):
     def to_lid_version_contents(self) -> "VersionContents[LID]":
         if self.contains_lidvids:
             lids = {lidvid.lid() for lidvid in self.lidvids()}
-            return VersionContents.createFromLIDs(lids, self.fs, self.filepaths)
+            return VersionContents.createFromLIDs(
+                lids, self.fs, self.filepaths, self.md5s
+            )
         else:
             raise TypeError(f"{self} does not contain LIDVIDs")
 
@@ -89,6 +129,7 @@ class VersionContents(Generic[S]):
             self.subcomponents,
             self.fs,
             set(filter(filt, self.filepaths)),
+            self.md5s,
         )
 
     ############################################################
@@ -107,11 +148,8 @@ class VersionContents(Generic[S]):
             return False
         if self.fs == other.fs:
             return True
-        for filepath in self.filepaths:
-            # check each file
-            if self.fs.readbytes(filepath) != other.fs.readbytes(filepath):
-                return False
-        return True
+        # check each file by its hash
+        return self.file_md5s() == other.file_md5s()
 
     def __str__(self) -> str:
         return (
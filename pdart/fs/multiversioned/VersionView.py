@@ -1,5 +1,4 @@
-from functools import reduce
-from typing import Any, BinaryIO, Collection, List, Mapping, Optional
+from typing import Any, BinaryIO, Collection, Dict, List, Mapping, Optional
 
 import fs.mode
 import fs.path
@@ -9,6 +8,7 @@ from fs.info import Info
 from fs.permissions import Permissions
 from fs.subfs import SubFS
 
+from pdart.fs.multiversioned.FileManifest import FILE_MANIFEST_FILENAME
 from pdart.fs.multiversioned.SubdirVersions import (
     SUBDIR_VERSIONS_FILENAME,
     read_subdir_versions_from_directory,
@@ -46,6 +46,13 @@ class VersionView(FS):
         self.multiversioned = mv
         self.lidvid = lidvid
 
+        # The versions in the multiversioned filesystem don't change,
+        # so what we find in them is kept for the life of the view:
+        # the paths they resolve to, and their subdir-version
+        # dictionaries.
+        self._mv_paths: Dict[str, str] = {}
+        self._subdir_versions: Dict[str, Dict[str, str]] = {}
+
     def lid_to_lidvid(self, lid: LID) -> LIDVID:
         vv_path = vv_lid_path(lid)
         mv_path = self.transform_vv_path(vv_path)
@@ -62,37 +69,44 @@ class VersionView(FS):
         # Since this is a read-only view, we never create anything, so
         # we have no use for nonexistent filepaths and can raise an
         # exception whenever they're sought.  Right?  TODO Check this.
-        vv_parts = fs.path.parts(fs.path.abspath(vv_path))[1:]
-
-        first = [True]
-
-        def add_vv_part_to_mv_path(mv_path: str, vv_part: str) -> str:
-            if first[0]:
-                first[0] = False
-                if is_segment(vv_part):
-                    if vv_part[:-1] == self.lidvid.lid().bundle_id:
-                        # TODO this is a hack; fix it.
-                        from pdart.fs.multiversioned.Multiversioned import lidvid_path
-
-                        return lidvid_path(self.lidvid)
-                    else:
-                        raise ResourceNotFound(vv_path)
-                else:
-                    raise ResourceNotFound(vv_path)
+        vv_path = fs.path.abspath(fs.path.normpath(vv_path))
+        if vv_path in self._mv_paths:
+            return self._mv_paths[vv_path]
+
+        vv_dir, vv_part = fs.path.split(vv_path)
+        if not vv_part:
+            mv_path = "/"
+        elif vv_dir == "/":
+            if is_segment(vv_part) and vv_part[:-1] == self.lidvid.lid().bundle_id:
+                # TODO this is a hack; fix it.
+                from pdart.fs.multiversioned.Multiversioned import lidvid_path
+
+                mv_path = lidvid_path(self.lidvid)
+            else:
+                raise ResourceNotFound(vv_path)
+        else:
+            mv_dir = self.transform_vv_path(vv_dir)
+            if is_segment(vv_part):
+                d = self._read_subdir_versions(mv_dir)
+                next_vid = d[str(vv_part[:-1])]
+                mv_path = fs.path.join(
+                    fs.path.dirname(mv_dir), vv_part[:-1], "v$" + next_vid
+                )
             else:
-                if is_segment(vv_part):
-                    d = read_subdir_versions_from_directory(
-                        self.multiversioned.fs, mv_path
-                    )
-                    next_vid = d[str(vv_part[:-1])]
-                    return fs.path.join(
-                        fs.path.dirname(mv_path), vv_part[:-1], "v$" + next_vid
-                    )
+                mv_path = fs.path.join(mv_dir, vv_part)
 
-                else:
-                    return fs.path.join(mv_path, vv_part)
+        self._mv_paths[vv_path] = mv_path
+        return mv_path
 
-        return reduce(add_vv_part_to_mv_path, vv_parts, "/")
+    def _read_subdir_versions(self, mv_path: str) -> Dict[str, str]:
+        """
+        The subdir-version dictionary in the multiversioned directory.
+        """
+        if mv_path not in self._subdir_versions:
+            self._subdir_versions[mv_path] = read_subdir_versions_from_directory(
+                self.multiversioned.fs, mv_path
+            )
+        return self._subdir_versions[mv_path]
 
     ############################################################
 
@@ -114,7 +128,9 @@ class VersionView(FS):
         vv_res = self.multiversioned.fs.listdir(mv_path)
         if SUBDIR_VERSIONS_FILENAME in vv_res:
             vv_res.remove(SUBDIR_VERSIONS_FILENAME)
-        d = read_subdir_versions_from_directory(self.multiversioned.fs, mv_path)
+        if FILE_MANIFEST_FILENAME in vv_res:
+            vv_res.remove(FILE_MANIFEST_FILENAME)
+        d = self._read_subdir_versions(mv_path)
         vv_res.extend([k + "$" for k in d])
 
         return sorted(vv_res)
@@ -0,0 +1,45 @@
+import unittest
+
+from fs.memoryfs import MemoryFS
+
+from pdart.fs.multiversioned.FileManifest import (
+    FILE_MANIFEST_FILENAME,
+    parse_file_manifest,
+    read_file_manifest_from_directory,
+    unparse_file_manifest,
+    write_file_manifest_to_directory,
+)
+
+
+class Test_FileManifest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.d = {
+            "/foo.txt": "5eb63bbbe01eeed093cb22bb8f5acdc3",
+            "/bar/baz qux.txt": "d41d8cd98f00b204e9800998ecf8427e",
+        }
+        self.txt = """d41d8cd98f00b204e9800998ecf8427e /bar/baz qux.txt
+5eb63bbbe01eeed093cb22bb8f5acdc3 /foo.txt
+"""
+
+    def test_parse_file_manifest(self) -> None:
+        self.assertEqual(self.d, parse_file_manifest(self.txt))
+        self.assertEqual({}, parse_file_manifest(""))
+
+    def test_unparse_file_manifest(self) -> None:
+        self.assertEqual(self.txt, unparse_file_manifest(self.d))
+        self.assertEqual("", unparse_file_manifest({}))
+
+    def test_write_file_manifest(self) -> None:
+        fs = MemoryFS()
+        write_file_manifest_to_directory(fs, "/", self.d)
+        self.assertEqual(self.txt, fs.readtext(FILE_MANIFEST_FILENAME))
+        fs.close()
+
+    def test_read_file_manifest(self) -> None:
+        fs = MemoryFS()
+        d = read_file_manifest_from_directory(fs, "/")
+        self.assertEqual({}, d)
+        fs.writetext(FILE_MANIFEST_FILENAME, self.txt)
+        d = read_file_manifest_from_directory(fs, "/")
+        self.assertEqual(self.d, d)
+        fs.close()
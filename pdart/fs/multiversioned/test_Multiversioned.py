@@ -1,7 +1,11 @@
+import os.path
 import unittest
 
 from fs.memoryfs import MemoryFS
+from fs.tempfs import TempFS
 
+import pdart.fs.multiversioned.VersionContents
+from pdart.db.Utils import fs_file_md5
 from pdart.fs.cowfs.COWFS import COWFS
 from pdart.fs.multiversioned.Multiversioned import *
 from pdart.fs.multiversioned.Utils import dictionary_to_contents
@@ -99,6 +103,81 @@ class Test_Multiversioned(unittest.TestCase):
         self.assertEqual(3, len(hierarchic))
         self.assertEqual({p_lidvid, c_lidvid, b_lidvid}, hierarchic.lidvids())
 
+    def test_lidvid_index(self) -> None:
+        mv = Multiversioned(MemoryFS())
+        lid = LID("urn:nasa:pds:b:c")
+        self.assertIsNone(mv.latest_lidvid(lid))
+        for vid in ["1.0", "2.0", "1.1", "10.0", "2.1"]:
+            mv[LIDVID.create_from_lid_and_vid(lid, VID(vid))] = dictionary_to_contents(
+                set(), {}
+            )
+        mv[LIDVID("urn:nasa:pds:b::1.0")] = dictionary_to_contents(
+            {LIDVID("urn:nasa:pds:b:c::2.1")}, {}
+        )
+        self.assertEqual(LIDVID("urn:nasa:pds:b:c::10.0"), mv.latest_lidvid(lid))
+        self.assertEqual(
+            LIDVID("urn:nasa:pds:b::1.0"), mv.latest_lidvid(LID("urn:nasa:pds:b"))
+        )
+        self.assertEqual(6, len(mv))
+        self.assertTrue(LIDVID("urn:nasa:pds:b:c::1.1") in mv)
+        self.assertFalse(LIDVID("urn:nasa:pds:b:c::1.2") in mv)
+
+        # A new Multiversioned on the filesystem finds the same.
+        mv2 = Multiversioned(mv.fs)
+        self.assertEqual(mv.lidvids(), mv2.lidvids())
+        self.assertEqual(LIDVID("urn:nasa:pds:b:c::10.0"), mv2.latest_lidvid(lid))
+        self.assertEqual(6, len(mv2))
+
+    def test_file_manifest(self) -> None:
+        mv = Multiversioned(MemoryFS())
+        lidvid = LIDVID("urn:nasa:pds:b::1.0")
+        contents = dictionary_to_contents(
+            set(), {"foo.txt": "Hello, world!", "subdir": {"bar.txt": "xxx"}}
+        )
+        mv[lidvid] = contents
+        self.assertEqual(
+            "6cd3556deb0da54bca060b4c39479839 /foo.txt\n"
+            "f561aaf6ef0bf14d4208bb46a4ccb3ad /subdir/bar.txt\n",
+            mv.fs.readtext("/b/v$1.0/file$manifest.txt"),
+        )
+        self.assertEqual(contents, mv[lidvid])
+        self.assertEqual({"/foo.txt", "/subdir/bar.txt"}, mv[lidvid].filepaths)
+
+        # Versions are compared by the hashes in their manifests, not
+        # by reading their files.
+        mv.fs.writetext("/b/v$1.0/foo.txt", "Goodbye, world!")
+        self.assertEqual(contents, mv[lidvid])
+        mv.fs.writetext(
+            "/b/v$1.0/file$manifest.txt",
+            "00000000000000000000000000000000 /foo.txt\n"
+            "f561aaf6ef0bf14d4208bb46a4ccb3ad /subdir/bar.txt\n",
+        )
+        self.assertNotEqual(contents, mv[lidvid])
+
+    def test_link_files(self) -> None:
+        src_fs = TempFS()
+        src_fs.writetext("/text.txt", "Hello, there!")
+        contents = VersionContents.createFromLIDVIDs(set(), src_fs, {"/text.txt"})
+        lidvid = LIDVID("urn:nasa:pds:b::1.0")
+
+        mv = Multiversioned(TempFS(), link_files=True)
+        mv[lidvid] = contents
+        self.assertEqual(contents, mv[lidvid])
+        self.assertTrue(
+            os.path.samefile(
+                src_fs.getsyspath("/text.txt"), mv.fs.getsyspath("/b/v$1.0/text.txt")
+            )
+        )
+
+        # by default it copies
+        mv = Multiversioned(TempFS())
+        mv[lidvid] = contents
+        self.assertFalse(
+            os.path.samefile(
+                src_fs.getsyspath("/text.txt"), mv.fs.getsyspath("/b/v$1.0/text.txt")
+            )
+        )
+
     def test_update_from_single_version(self) -> None:
         fs = MemoryFS()
         mv = Multiversioned(fs)
@@ -179,3 +258,51 @@ class Test_Multiversioned(unittest.TestCase):
         # Now try updating again.  Nothing should change.
         mv.update_from_single_version(is_new, c)
         self.assertEqual(latest_lidvid, mv.latest_lidvid(LID("urn:nasa:pds:b")))
+
+    def test_update_from_single_version_threaded(self) -> None:
+        sv_fs = MemoryFS()
+        for c in ["c1", "c2"]:
+            for p in range(20):
+                sv_fs.makedirs(f"/b$/{c}$/p{p}$/dir")
+                sv_fs.writetext(f"/b$/{c}$/p{p}$/p{p}.txt", f"{c} {p}")
+                sv_fs.writetext(f"/b$/{c}$/p{p}$/dir/file.txt", "file")
+            sv_fs.writetext(f"/b$/{c}$/{c}.txt", c)
+
+        def update(threads: int) -> Dict[str, bytes]:
+            mv = Multiversioned(MemoryFS())
+            self.assertTrue(mv.update_from_single_version(is_new, sv_fs, None, threads))
+            sv_fs.writetext("/b$/c2$/p3$/p3.txt", "changed")
+            self.assertTrue(mv.update_from_single_version(is_new, sv_fs, None, threads))
+            sv_fs.writetext("/b$/c2$/p3$/p3.txt", "c2 3")
+            return {path: mv.fs.readbytes(path) for path in mv.fs.walk.files()}
+
+        serial = update(1)
+        self.assertEqual(b"changed", serial["/b/c2/p3/v$2.0/p3.txt"])
+        self.assertEqual(serial, update(4))
+
+    def test_update_from_single_version_with_md5s(self) -> None:
+        sv_fs = MemoryFS()
+        sv_fs.makedirs("/b$/c$/p$")
+        sv_fs.writetext("/b$/b.txt", "bundle")
+        sv_fs.writetext("/b$/c$/p$/p.txt", "product")
+        md5s = {path: fs_file_md5(sv_fs, path) for path in sv_fs.walk.files()}
+
+        # Count the files that are hashed by reading them.
+        hashed: List[str] = []
+        real_fs_file_md5 = pdart.fs.multiversioned.VersionContents.fs_file_md5
+
+        def counting_fs_file_md5(filesys: FS, filepath: str) -> str:
+            hashed.append(filepath)
+            return real_fs_file_md5(filesys, filepath)
+
+        pdart.fs.multiversioned.VersionContents.fs_file_md5 = counting_fs_file_md5
+        try:
+            mv = Multiversioned(MemoryFS())
+            self.assertTrue(mv.update_from_single_version(is_new, sv_fs, md5s))
+        finally:
+            pdart.fs.multiversioned.VersionContents.fs_file_md5 = real_fs_file_md5
+        self.assertEqual([], hashed)
+        self.assertEqual(
+            f"{md5s['/b$/c$/p$/p.txt']} /p.txt\n",
+            mv.fs.readtext("/b/c/p/v$1.0/file$manifest.txt"),
+        )
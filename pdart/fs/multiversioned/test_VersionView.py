@@ -52,6 +52,23 @@ class Test_VersionView(unittest.TestCase):
         self.assertEqual("/b/v$1.2", self.vv.transform_vv_path("/b$"))
         self.assertEqual("/b/c/v$1.1", self.vv.transform_vv_path("/b$/c$"))
 
+    def test_transform_vv_path_is_cached(self) -> None:
+        self.assertEqual(
+            "/b/c/v$1.1/deeper", self.vv.transform_vv_path("/b$/c$/deeper")
+        )
+        self.assertEqual(
+            {"c$", "counter.txt", "foo.txt", "subdir"}, set(self.vv.listdir("/b$"))
+        )
+        # The versions are read once, and not again.
+        self.tempfs.remove("/b/v$1.2/subdir$versions.txt")
+        self.assertEqual("/b/c/v$1.1", self.vv.transform_vv_path("/b$/c$/"))
+        self.assertEqual(
+            "/b/c/v$1.1/undersea.txt", self.vv.transform_vv_path("/b$/c$/undersea.txt")
+        )
+        self.assertEqual(
+            {"c$", "counter.txt", "foo.txt", "subdir"}, set(self.vv.listdir("/b$"))
+        )
+
     def test_getinfo(self) -> None:
         triples = [
             ("", True, "/"),
@@ -0,0 +1,46 @@
+import os
+import unittest
+
+from fs.memoryfs import MemoryFS
+from fs.tempfs import TempFS
+
+from pdart.fs.cowfs.COWFS import COWFS
+from pdart.fs.LinkFile import link_or_copy_file
+
+
+class Test_LinkFile(unittest.TestCase):
+    def test_link_or_copy_file(self) -> None:
+        src_fs = TempFS()
+        src_fs.makedir("/dir")
+        src_fs.writebytes("/dir/file.fits", b"FITS")
+        src_syspath = src_fs.getsyspath("/dir/file.fits")
+
+        # linked into an OSFS
+        dst_fs = TempFS()
+        link_or_copy_file(src_fs, "/dir/file.fits", dst_fs, "/file.fits")
+        self.assertEqual(b"FITS", dst_fs.readbytes("/file.fits"))
+        self.assertTrue(os.path.samefile(src_syspath, dst_fs.getsyspath("/file.fits")))
+
+        # linked into a COWFS's additions, over a file in its base
+        dst_fs.makedir("/b$")
+        dst_fs.writebytes("/b$/old.fits", b"OLD")
+        cowfs = COWFS(dst_fs, TempFS())
+        link_or_copy_file(src_fs, "/dir/file.fits", cowfs, "/b$/old.fits")
+        self.assertEqual(b"FITS", cowfs.readbytes("/b$/old.fits"))
+        self.assertTrue(os.path.samefile(src_syspath, cowfs.getsyspath("/b$/old.fits")))
+        self.assertEqual(
+            cowfs.additions_fs.getsyspath("/b$/old.fits"),
+            cowfs.getsyspath("/b$/old.fits"),
+        )
+        self.assertEqual(b"OLD", dst_fs.readbytes("/b$/old.fits"))
+
+        # linking it to itself leaves it alone
+        link_or_copy_file(src_fs, "/dir/file.fits", src_fs, "/dir/file.fits")
+        self.assertEqual(b"FITS", src_fs.readbytes("/dir/file.fits"))
+
+        # copied where there are no system paths
+        mem_fs = MemoryFS()
+        link_or_copy_file(src_fs, "/dir/file.fits", mem_fs, "/file.fits")
+        self.assertEqual(b"FITS", mem_fs.readbytes("/file.fits"))
+        link_or_copy_file(mem_fs, "/file.fits", dst_fs, "/copy.fits")
+        self.assertEqual(b"FITS", dst_fs.readbytes("/copy.fits"))
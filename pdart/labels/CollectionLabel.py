@@ -31,6 +31,11 @@ from pdart.xml.Templates import NodeBuilder
 
 
 def get_collection_label_name(bundle_db: BundleDB, collection_lidvid: str) -> str:
+    collection: Collection = bundle_db.get_collection(collection_lidvid)
+    return collection_label_name(collection)
+
+
+def collection_label_name(collection: Collection) -> str:
     # We have to jump through some hoops to apply
     # switch_on_collection_type().
     def get_context_collection_label_name(collection: Collection) -> str:
@@ -46,7 +51,6 @@ def get_collection_label_name(bundle_db: BundleDB, collection_lidvid: str) -> st
         prefix = cast(OtherCollection, collection).prefix
         return f"collection_{prefix}.xml"
 
-    collection: Collection = bundle_db.get_collection(collection_lidvid)
     return switch_on_collection_subtype(
         collection,
         get_context_collection_label_name,
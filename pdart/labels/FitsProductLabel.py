@@ -38,19 +38,24 @@ from pdart.labels.Utils import lidvid_to_lid, lidvid_to_vid
 from pdart.pds4.LID import LID
 from pdart.pds4.LIDVID import LIDVID
 from pdart.pds4.VID import VID
-from pdart.xml.Pretty import pretty_and_verify
+from pdart.xml.Schema import verify_label_or_raise
 
 
 def _directory_siblings(
     working_dir: str, bundle_db: BundleDB, product_lidvid: str
 ) -> List[str]:
-    # Look in the mastDownload directory and search for the file with
-    # the product_lidvid's basename.  Then return all its siblings'
-    # basenames.
+    # Return the basenames of all the files downloaded into the same
+    # directory as the product's file, as recorded in the database.
+    basename = bundle_db.get_product_file(product_lidvid).basename
+    siblings = bundle_db.get_downloaded_siblings(basename)
+    if siblings:
+        return siblings
+
+    # If they weren't recorded, look in the mastDownload directory and
+    # search for the file.
     for dirpath, dirnames, filenames in os.walk(
         os.path.join(working_dir, "mastDownload")
     ):
-        basename = bundle_db.get_product_file(product_lidvid).basename
         if basename in filenames:
             return sorted(filenames)
     return []
@@ -157,6 +162,27 @@ def make_fits_product_label(
     file_basename: str,
     verify: bool,
 ) -> bytes:
+    label, context_lidvids = make_fits_product_label_and_context_lidvids(
+        working_dir, bundle_db, product_lidvid, file_basename, verify
+    )
+    for context_lidvid in context_lidvids:
+        bundle_db.create_context_product(context_lidvid)
+    return label
+
+
+def make_fits_product_label_and_context_lidvids(
+    working_dir: str,
+    bundle_db: BundleDB,
+    product_lidvid: str,
+    file_basename: str,
+    verify: bool,
+) -> Tuple[bytes, List[str]]:
+    """
+    Make the label without writing to the database: return it along
+    with the LIDs or LIDVIDs of the context products it refers to,
+    which the caller must create.  This lets labels be made in other
+    processes.
+    """
     try:
         product = bundle_db.get_product(product_lidvid)
         collection_lidvid = product.collection_lidvid
@@ -194,37 +220,38 @@ def make_fits_product_label(
         proposal_id = bundle.proposal_id
 
         investigation_area_lidvid = mk_Investigation_Area_lidvid(proposal_id)
-        bundle_db.create_context_product(investigation_area_lidvid)
-        bundle_db.create_context_product(instrument_host_lid())
-        bundle_db.create_context_product(observing_system_lid(instrument))
         target_info = get_target_info(shm_lookup)
-        bundle_db.create_context_product(target_info["lid"])
-
-        label = (
-            make_label(
-                {
-                    "lid": lidvid_to_lid(product_lidvid),
-                    "vid": lidvid_to_vid(product_lidvid),
-                    "proposal_id": str(proposal_id),
-                    "suffix": suffix,
-                    "file_name": file_basename,
-                    "file_contents": get_file_contents(
-                        bundle_db, card_dicts, instrument, product_lidvid
-                    ),
-                    "Investigation_Area_name": mk_Investigation_Area_name(proposal_id),
-                    "investigation_lidvid": investigation_area_lidvid,
-                    "Observing_System": observing_system(instrument),
-                    "Time_Coordinates": get_time_coordinates(start_stop_times),
-                    "Target_Identification": get_target(target_info),
-                    "HST": hst_parameters,
-                }
-            )
-            .toxml()
-            .encode()
+        context_lidvids = [
+            investigation_area_lidvid,
+            instrument_host_lid(),
+            observing_system_lid(instrument),
+            target_info["lid"],
+        ]
+
+        # Written straight to formatted bytes, without building a DOM.
+        label = make_label.pretty_bytes(
+            {
+                "lid": lidvid_to_lid(product_lidvid),
+                "vid": lidvid_to_vid(product_lidvid),
+                "proposal_id": str(proposal_id),
+                "suffix": suffix,
+                "file_name": file_basename,
+                "file_contents": get_file_contents(
+                    bundle_db, card_dicts, instrument, product_lidvid
+                ),
+                "Investigation_Area_name": mk_Investigation_Area_name(proposal_id),
+                "investigation_lidvid": investigation_area_lidvid,
+                "Observing_System": observing_system(instrument),
+                "Time_Coordinates": get_time_coordinates(start_stop_times),
+                "Target_Identification": get_target(target_info),
+                "HST": hst_parameters,
+            }
         )
     except Exception as e:
         raise LabelError(
             product_lidvid, file_basename, (lookup, hdu_lookups[0], shm_lookup)
         ) from e
 
-    return pretty_and_verify(label, verify)
+    if verify:
+        verify_label_or_raise(label)
+    return label, context_lidvids
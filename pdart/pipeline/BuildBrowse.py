@@ -1,6 +1,6 @@
 import os
 import traceback
-from typing import List, Set
+from typing import List, Set, Tuple
 
 import fs.path
 import picmaker
@@ -11,6 +11,7 @@ from pdart.db.BundleDB import (
     _BUNDLE_DB_NAME,
     create_bundle_db_from_os_filepath,
 )
+from pdart.db.Utils import file_md5s
 from pdart.fs.cowfs.COWFS import COWFS
 from pdart.pds4.LID import LID
 from pdart.pds4.LIDVID import LIDVID
@@ -64,6 +65,9 @@ def _build_browse_collection(
     product_segments = [
         str(prod[:-1]) for prod in browse_deltas.listdir(collection_path) if "$" in prod
     ]
+    # (OS filepath, basename, product LIDVID, size) of each browse file,
+    # to hash them all together.
+    browse_files: List[Tuple[str, str, str, int]] = []
     for product_segment in product_segments:
         product_path = f"{collection_path}{product_segment}$/"
         browse_product_path = f"{browse_collection_path}{product_segment}$/"
@@ -113,10 +117,20 @@ def _build_browse_collection(
 
             browse_os_filepath = fs.path.join(browse_product_os_dirpath, browse_file)
             size = os.stat(browse_os_filepath).st_size
-            db.create_browse_file(
-                browse_os_filepath, browse_file, browse_product_lidvid, size
+            browse_files.append(
+                (browse_os_filepath, browse_file, browse_product_lidvid, size)
             )
 
+    md5s = file_md5s(browse_os_filepath for browse_os_filepath, _, _, _ in browse_files)
+    for browse_os_filepath, browse_file, browse_product_lidvid, size in browse_files:
+        db.create_browse_file(
+            browse_os_filepath,
+            browse_file,
+            browse_product_lidvid,
+            size,
+            md5s[browse_os_filepath],
+        )
+
 
 class BuildBrowse(MarkedStage):
     def _run(self) -> None:
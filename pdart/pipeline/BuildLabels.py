@@ -1,4 +1,7 @@
-from typing import Set
+import multiprocessing
+import os.path
+import traceback
+from typing import Dict, List, Optional, Set, Tuple, Union
 
 import fs.path
 
@@ -8,6 +11,8 @@ from pdart.db.BundleDB import (
     create_bundle_db_from_os_filepath,
 )
 from pdart.db.BundleWalk import BundleWalk
+from pdart.db.FitsFileDB import populate_database_from_downloads
+from pdart.db.Utils import bytes_md5
 from pdart.db.SqlAlchTables import (
     BadFitsFile,
     BrowseFile,
@@ -31,15 +36,28 @@ from pdart.labels.CollectionLabel import (
     make_collection_label,
 )
 from pdart.labels.DocumentProductLabel import make_document_product_label
-from pdart.labels.FitsProductLabel import make_fits_product_label
+from pdart.labels.FitsProductLabel import (
+    make_fits_product_label,
+    make_fits_product_label_and_context_lidvids,
+)
 from pdart.pds4.LID import LID
 from pdart.pds4.LIDVID import LIDVID
 from pdart.pds4.VID import VID
 from pdart.pipeline.Stage import MarkedStage
 from pdart.pipeline.Utils import make_osfs, make_sv_deltas, make_version_view
+from pdart.xml.Schema import label_failures, validation_server
 
+# If True, validate each label as it's made, using one validation
+# server for the whole stage.
 _VERIFY = False
 
+# Number of FITS product labels made in the pool to validate at a time.
+_VERIFY_BATCH_SIZE = 32
+
+# Number of worker processes used to make FITS product labels; None
+# means one per CPU.
+_PROCESSES: Optional[int] = None
+
 
 def _create_citation_info(
     sv_deltas: COWFS, document_dir: str, document_files: Set[str]
@@ -85,12 +103,208 @@ def _extend_initial_lidvid(lidvid: str, segment: str) -> str:
 # END TODO
 
 
+# A FITS file whose label is to be made: (product LIDVID, basename).
+_FITS_LABEL_JOB = Tuple[str, str]
+
+# The jobs of the bundle's FITS files, by the LIDVID of their
+# collection, in product order.
+_FITS_LABEL_JOBS = Dict[str, List[_FITS_LABEL_JOB]]
+
+# The number of jobs in each task given to a worker.  A worker
+# preloads the card dictionaries of a task's FITS files together.
+_FITS_LABEL_TASK_SIZE = 64
+
+# A label made in the pool: (label, MD5 hash, context LIDVIDs).
+_FITS_LABEL_RESULT = Tuple[bytes, str, List[str]]
+
+# Set in each worker process by _init_label_worker().
+_WORKER_DB: Optional[BundleDB] = None
+_WORKER_DIR: str = ""
+
+
+def _init_label_worker(db_url: str, working_dir: str) -> None:
+    global _WORKER_DB, _WORKER_DIR
+    _WORKER_DB = BundleDB(db_url)
+    _WORKER_DIR = working_dir
+
+
+def _make_fits_product_label_in_worker(
+    job: _FITS_LABEL_JOB,
+) -> Tuple[_FITS_LABEL_JOB, Union[_FITS_LABEL_RESULT, str]]:
+    product_lidvid, basename = job
+    assert _WORKER_DB is not None
+    try:
+        # The parent validates the labels, in batches.
+        label, context_lidvids = make_fits_product_label_and_context_lidvids(
+            _WORKER_DIR, _WORKER_DB, product_lidvid, basename, False
+        )
+        return job, (label, bytes_md5(label), context_lidvids)
+    except Exception:
+        # Exceptions don't reliably survive pickling, so return the
+        # traceback instead.  The serial walk remakes the label and
+        # raises.
+        return job, traceback.format_exc()
+    finally:
+        # Don't hold on to a read transaction while the parent writes.
+        _WORKER_DB.session.rollback()
+
+
+def _make_fits_product_labels_in_worker(
+    task: Tuple[str, List[_FITS_LABEL_JOB]]
+) -> List[Tuple[_FITS_LABEL_JOB, Union[_FITS_LABEL_RESULT, str]]]:
+    collection_lidvid, jobs = task
+    assert _WORKER_DB is not None
+    try:
+        _WORKER_DB.preload_card_dictionaries(
+            collection_lidvid, {product_lidvid for product_lidvid, _ in jobs}
+        )
+    except Exception:
+        tb = traceback.format_exc()
+        return [(job, tb) for job in jobs]
+    finally:
+        _WORKER_DB.session.rollback()
+    return [_make_fits_product_label_in_worker(job) for job in jobs]
+
+
+class _FitsFilesWalk(BundleWalk):
+    def __init__(self, bundle_db: BundleDB) -> None:
+        BundleWalk.__init__(self, bundle_db)
+        self.jobs: _FITS_LABEL_JOBS = {}
+        self._collection_jobs: List[_FITS_LABEL_JOB] = []
+
+    def visit_other_collection(
+        self, other_collection: OtherCollection, post: bool
+    ) -> None:
+        if not post:
+            self._collection_jobs = []
+            self.jobs[str(other_collection.lidvid)] = self._collection_jobs
+
+    def visit_fits_file(self, fits_file: FitsFile) -> None:
+        self._collection_jobs.append(
+            (str(fits_file.product_lidvid), str(fits_file.basename))
+        )
+
+
+def _fits_product_label_jobs(bundle_db: BundleDB) -> _FITS_LABEL_JOBS:
+    """
+    Return the FITS files of the bundle whose labels are to be made,
+    by collection.
+    """
+    walk = _FitsFilesWalk(bundle_db)
+    walk.walk()
+    return {
+        collection_lidvid: jobs for collection_lidvid, jobs in walk.jobs.items() if jobs
+    }
+
+
+def _fits_product_label_filepath(product_lidvid: str, basename: str) -> str:
+    label_base = fs.path.splitext(basename)[0]
+    return fs.path.join(_lidvid_to_dir(product_lidvid), label_base + ".xml")
+
+
+def _create_fits_product_labels(
+    working_dir: str, bundle_db: BundleDB, label_deltas: COWFS, jobs: _FITS_LABEL_JOBS
+) -> Set[_FITS_LABEL_JOB]:
+    """
+    Make the labels of the bundle's FITS products in a pool of
+    processes and write them, returning the jobs whose labels were
+    written.  Each worker's task is some of the FITS files of one
+    collection, in product order, whose cards it preloads.  FITS product labels depend only on the database, not on
+    each other, so they can be made in any order before the
+    collection and bundle labels that depend on them.  Labels that
+    fail, or fail validation, are left for the walk to remake
+    serially and report.
+    """
+    done: Set[_FITS_LABEL_JOB] = set()
+    # Workers can't share an in-memory database, and daemonic
+    # processes (like the workers of a multiprocessing pool running
+    # the pipeline) can't start processes of their own.
+    if (
+        _PROCESSES == 1
+        or bundle_db.url in ["sqlite://", "sqlite:///"]
+        or multiprocessing.current_process().daemon
+    ):
+        return done
+
+    job_count = sum(len(collection_jobs) for collection_jobs in jobs.values())
+    if job_count <= 1:
+        return done
+    tasks = [
+        (collection_lidvid, collection_jobs[i : i + _FITS_LABEL_TASK_SIZE])
+        for collection_lidvid, collection_jobs in jobs.items()
+        for i in range(0, len(collection_jobs), _FITS_LABEL_TASK_SIZE)
+    ]
+
+    def write_labels(batch: List[Tuple[_FITS_LABEL_JOB, _FITS_LABEL_RESULT]]) -> None:
+        failures: List[Optional[str]] = [None] * len(batch)
+        if _VERIFY:
+            failures = label_failures([label for _, (label, _, _) in batch])
+        for (job, result), failure in zip(batch, failures):
+            if failure is not None:
+                continue
+            product_lidvid, basename = job
+            label, md5_hash, context_lidvids = result
+            for context_lidvid in context_lidvids:
+                bundle_db.create_context_product(context_lidvid)
+            label_filepath = _fits_product_label_filepath(product_lidvid, basename)
+            label_deltas.setbytes(label_filepath, label)
+            bundle_db.create_product_label(
+                label_deltas.getsyspath(label_filepath),
+                fs.path.basename(label_filepath),
+                product_lidvid,
+                md5_hash,
+            )
+            done.add(job)
+
+    worker_failures: List[Tuple[_FITS_LABEL_JOB, str]] = []
+    with bundle_db.batch_ingestion():
+        with multiprocessing.Pool(
+            _PROCESSES, _init_label_worker, (bundle_db.url, working_dir)
+        ) as pool:
+            batch: List[Tuple[_FITS_LABEL_JOB, _FITS_LABEL_RESULT]] = []
+            for results in pool.imap_unordered(
+                _make_fits_product_labels_in_worker, tasks
+            ):
+                for job, result in results:
+                    if isinstance(result, str):
+                        worker_failures.append((job, result))
+                        continue
+                    batch.append((job, result))
+                    if len(batch) == _VERIFY_BATCH_SIZE:
+                        write_labels(batch)
+                        batch = []
+            write_labels(batch)
+
+    if worker_failures:
+        # They'll be remade serially, but report them: if, for
+        # instance, the workers couldn't read the database, the pool
+        # has done nothing.
+        (product_lidvid, basename), tb = worker_failures[0]
+        print(
+            f"**** {len(worker_failures)} of {job_count} FITS product "
+            "labels failed in the pool and will be made serially; the first, "
+            f"{basename} in {product_lidvid}, failed with:\n{tb}"
+        )
+    return done
+
+
 def create_pds4_labels(
     working_dir: str,
     bundle_db: BundleDB,
     label_deltas: COWFS,
     info: Citation_Information,
 ) -> None:
+    if not bundle_db.downloaded_files_exist():
+        # The database was populated before downloaded files were
+        # recorded in it.
+        populate_database_from_downloads(
+            bundle_db, os.path.join(working_dir, "mastDownload")
+        )
+    fits_label_jobs = _fits_product_label_jobs(bundle_db)
+    fits_labels_done = _create_fits_product_labels(
+        working_dir, bundle_db, label_deltas, fits_label_jobs
+    )
+
     class _CreateLabelsWalk(BundleWalk):
         def visit_bundle(self, bundle: Bundle, post: bool) -> None:
             if post:
@@ -138,7 +352,10 @@ def create_pds4_labels(
             label_filepath = fs.path.join(bundle_dir_path, label_filename)
             label_deltas.setbytes(label_filepath, label)
             bundle_db.create_bundle_label(
-                label_deltas.getsyspath(label_filepath), label_filename, bundle_lidvid
+                label_deltas.getsyspath(label_filepath),
+                label_filename,
+                bundle_lidvid,
+                bytes_md5(label),
             )
 
         def _post_visit_collection(self, collection: Collection) -> None:
@@ -156,6 +373,7 @@ def create_pds4_labels(
                 label_deltas.getsyspath(inventory_filepath),
                 inventory_filename,
                 collection_lidvid,
+                bytes_md5(inventory),
             )
 
             label = make_collection_label(self.db, info, collection_lidvid, _VERIFY)
@@ -166,6 +384,7 @@ def create_pds4_labels(
                 label_deltas.getsyspath(label_filepath),
                 label_filename,
                 collection_lidvid,
+                bytes_md5(label),
             )
 
         def visit_document_collection(
@@ -179,6 +398,19 @@ def create_pds4_labels(
         ) -> None:
             if post:
                 self._post_visit_collection(other_collection)
+                return
+            # Preload the cards of the FITS files whose labels weren't
+            # made in the pool.
+            collection_lidvid = str(other_collection.lidvid)
+            product_lidvids = {
+                product_lidvid
+                for product_lidvid, basename in fits_label_jobs.get(
+                    collection_lidvid, []
+                )
+                if (product_lidvid, basename) not in fits_labels_done
+            }
+            if product_lidvids:
+                bundle_db.preload_card_dictionaries(collection_lidvid, product_lidvids)
 
         def visit_document_product(
             self, document_product: DocumentProduct, post: bool
@@ -200,7 +432,10 @@ def create_pds4_labels(
             label_filepath = fs.path.join(product_dir_path, label_filename)
             label_deltas.setbytes(label_filepath, label)
             bundle_db.create_product_label(
-                label_deltas.getsyspath(label_filepath), label_filename, product_lidvid
+                label_deltas.getsyspath(label_filepath),
+                label_filename,
+                product_lidvid,
+                bytes_md5(label),
             )
 
         def visit_browse_file(self, browse_file: BrowseFile) -> None:
@@ -217,7 +452,10 @@ def create_pds4_labels(
             label_filepath = fs.path.join(product_dir_path, label_filename)
             label_deltas.setbytes(label_filepath, label)
             bundle_db.create_product_label(
-                label_deltas.getsyspath(label_filepath), label_filename, product_lidvid
+                label_deltas.getsyspath(label_filepath),
+                label_filename,
+                product_lidvid,
+                bytes_md5(label),
             )
 
         def visit_bad_fits_file(self, bad_fits_file: BadFitsFile) -> None:
@@ -229,21 +467,20 @@ def create_pds4_labels(
             )
 
         def visit_fits_file(self, fits_file: FitsFile) -> None:
+            product_lidvid = str(fits_file.product_lidvid)
+            basename = str(fits_file.basename)
+            if (product_lidvid, basename) in fits_labels_done:
+                return
             label = make_fits_product_label(
-                working_dir,
-                self.db,
-                str(fits_file.product_lidvid),
-                str(fits_file.basename),
-                _VERIFY,
+                working_dir, self.db, product_lidvid, basename, _VERIFY
             )
-            label_base = fs.path.splitext(fits_file.basename)[0]
-            label_filename = label_base + ".xml"
-            product_lidvid = str(fits_file.product_lidvid)
-            product_dir_path = _lidvid_to_dir(product_lidvid)
-            label_filepath = fs.path.join(product_dir_path, label_filename)
+            label_filepath = _fits_product_label_filepath(product_lidvid, basename)
             label_deltas.setbytes(label_filepath, label)
             bundle_db.create_product_label(
-                label_deltas.getsyspath(label_filepath), label_filename, product_lidvid
+                label_deltas.getsyspath(label_filepath),
+                fs.path.basename(label_filepath),
+                product_lidvid,
+                bytes_md5(label),
             )
 
     _CreateLabelsWalk(bundle_db).walk()
@@ -279,4 +516,8 @@ class BuildLabels(MarkedStage):
 
             info = _create_citation_info(sv_deltas, documents_dir, docs)
 
-            create_pds4_labels(working_dir, db, label_deltas, info)
+            if _VERIFY:
+                with validation_server():
+                    create_pds4_labels(working_dir, db, label_deltas, info)
+            else:
+                create_pds4_labels(working_dir, db, label_deltas, info)
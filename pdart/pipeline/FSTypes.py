@@ -1,13 +1,19 @@
 import re
 
+from typing import List
+
 from fs.base import FS
-from fs.path import parts
+from fs.path import join, parts
 
 EMPTY_FS_TYPE: str = "empty"
 SINGLE_VERSIONED_FS_TYPE: str = "single-versioned"
 MULTIVERSIONED_FS_TYPE: str = "multiversioned"
 UNKNOWN_FS_TYPE: str = "unknown"
 
+# Version directories lie below at most the bundle, collection and
+# product directories.
+_MAX_VERSION_DIR_DEPTH: int = 4
+
 
 def is_version_dir(dirpath: str) -> bool:
     PAT = r"^v\$[0-9]+\.[0-9]+$"
@@ -16,13 +22,33 @@ def is_version_dir(dirpath: str) -> bool:
     return res is not None
 
 
+def _has_version_dir(fs: FS) -> bool:
+    """
+    Look for a version directory, level by level, no deeper than one
+    can be.  In an archive, the bundle's versions are found on the
+    second level.
+    """
+    dirpaths: List[str] = ["/"]
+    for _ in range(_MAX_VERSION_DIR_DEPTH):
+        next_dirpaths: List[str] = []
+        for dirpath in dirpaths:
+            for info in fs.scandir(dirpath):
+                if info.is_dir:
+                    path = join(dirpath, info.name)
+                    if is_version_dir(path):
+                        return True
+                    next_dirpaths.append(path)
+        dirpaths = next_dirpaths
+    return False
+
+
 def categorize_filesystem(fs: FS) -> str:
     top_level_listing = fs.listdir("/")
     if not top_level_listing:
         return EMPTY_FS_TYPE
     elif any(name[-1] == "$" for name in top_level_listing):
         return SINGLE_VERSIONED_FS_TYPE
-    elif any(is_version_dir(dir) for dir in fs.walk.dirs()):
+    elif _has_version_dir(fs):
         return MULTIVERSIONED_FS_TYPE
     else:
         return UNKNOWN_FS_TYPE
@@ -3,8 +3,8 @@ import os.path
 import shutil
 from typing import Dict
 
-import fs.copy
 
+from pdart.fs.LinkFile import link_or_copy_file
 from pdart.pds4.LIDVID import LIDVID
 from pdart.pipeline.RecordChanges import CHANGES_DICT
 from pdart.pipeline.Stage import MarkedStage
@@ -50,11 +50,13 @@ class InsertChanges(MarkedStage):
                 # TODO write a merge algorithm
                 assert False, "need an algorithm to merge changes into archive"
             else:
-                # the archive is empty and we can just copy into it
+                # the archive is empty and we can just copy into it.
+                # The primary files are deleted below, so link them
+                # instead where we can.
                 for dirpath in primary_files_osfs.walk.dirs():
                     sv_deltas.makedirs(dirpath)
                 for filepath in primary_files_osfs.walk.files():
-                    fs.copy.copy_file(primary_files_osfs, filepath, sv_deltas, filepath)
+                    link_or_copy_file(primary_files_osfs, filepath, sv_deltas, filepath)
 
         shutil.rmtree(primary_files_dir + "-sv")
 
@@ -1,61 +1,160 @@
+import concurrent.futures
 import os
 import os.path
-import shutil
 import tarfile
+import time
+import zipfile
+from typing import BinaryIO, Dict, List, Optional, Tuple
 
 import fs.path
+import fs.tools
 from fs.base import FS
 from fs.osfs import OSFS
 import fs.walk
 
 from pdart.archive.ChecksumManifest import (
-    make_checksum_manifest,
+    checksum_manifest_lines,
     plain_lidvid_to_visits_dirpath,
 )
-from pdart.archive.TransferManifest import make_transfer_manifest
+from pdart.archive.TransferManifest import transfer_manifest_lines
 from pdart.db.BundleDB import _BUNDLE_DB_NAME, create_bundle_db_from_os_filepath
+from pdart.fs.LinkFile import link_or_copy_file
 from pdart.fs.deliverablefs.DeliverableFS import DeliverableFS, lidvid_to_dirpath
 from pdart.pds4.LIDVID import LIDVID
 from pdart.pipeline.Stage import MarkedStage
 from pdart.pipeline.Utils import make_osfs, make_version_view
 
-_TAR_NEEDED: bool = False
-
-
-def _fix_up_deliverable(dir: str) -> None:
-    # TODO DeliverableFS was written with an older directory
-    # structure.  When used with the new, we get trailing dollar signs
-    # on directories representing bundles, collections, and products.
-    # No time to fix it right now, so we just patch up the resulting
-    # directory tree.  TODO But *do* fix it.
-    for path, _, _ in os.walk(dir, topdown=False):
-        if path[-1] == "$":
-            os.rename(path, path[:-1])
+# If set to "tar" or "zip", the deliverable is written straight into
+# a single archive file of that format in the deliverable directory,
+# instead of into a directory tree.  ValidateBundle needs the tree,
+# so this is only for bundles that have already been validated.
+_ARCHIVE_FORMAT: Optional[str] = None
+
+# Every entry in a deliverable archive gets this modification time
+# (1980-01-01T00:00:00Z, the earliest a zipfile can hold), so that
+# archives of the same bundle are byte-for-byte the same.
+_ARCHIVE_MTIME: int = 315532800
+
+# Number of threads linking or copying files into the deliverable.
+_THREADS: int = 8
+
+
+def _deliverable_dirpath(path: str) -> str:
+    """
+    Return the path in the deliverable for a directory in the version
+    view: a product's directory is replaced by its visit's, and the
+    trailing dollar signs of bundles, collections and products are
+    dropped.
+    """
+    # TODO It bothers me that this visits hack parallels a visits
+    # hack in plain_lidvid_to_visits_dirpath().  I should figure this
+    # out and make it clean.  For now, though, this works.
+    parts = fs.path.parts(path)
+    if len(parts) == 4:
+        if len(parts[3]) == 10:
+            visit = "visit_" + parts[3][4:6].lower() + "$"
+            parts[3] = visit
+    return fs.path.join(*[part[:-1] if part[-1] == "$" else part for part in parts])
+
+
+def _deliverable_entries(version_view: FS) -> List[Tuple[str, Optional[str]]]:
+    """
+    Return the paths in the deliverable, sorted, each paired with the
+    path of its file in the version view, or with None if it's a
+    directory.
+    """
+    entries: Dict[str, Optional[str]] = {}
+    for path, dirs, files in version_view.walk():
+        new_path = _deliverable_dirpath(path)
+        if new_path != "/":
+            entries[new_path] = None
+        for file in files:
+            old_filepath = fs.path.join(path, file.name)
+            entries[fs.path.join(new_path, file.name)] = old_filepath
+    return sorted(entries.items())
 
 
-def copy_fs(version_view: FS, deliverable: FS) -> None:
+def build_deliverable(version_view: FS, deliverable_dir: str) -> None:
+    """
+    Copy the bundle in the version view into the deliverable
+    directory.  All the directories are made first, and then the files
+    are linked (or, where they can't be, copied) by a pool of threads.
+    """
     # TODO I could (and used to) just do a fs.copy.copy_fs() from the
     # version_view to a DeliverableFS.  I removed it to debug issues
-    # with the validation tool.  Now I find this hack is just as easy
-    # (though I wonder about efficiency).  It bothers me that this
-    # visits hack parallels a visits hack in
-    # plain_lidvid_to_visits_dirpath().  I should figure this out and
-    # make it clean.  For now, though, this works.
-
-    # Uses dollar-terminated paths
-    for path, dirs, files in version_view.walk():
-        parts = fs.path.parts(path)
-        if len(parts) == 4:
-            if len(parts[3]) == 10:
-                visit = "visit_" + parts[3][4:6].lower() + "$"
-                parts[3] = visit
-        new_path = fs.path.join(*parts)
-        if not deliverable.isdir(new_path):
-            deliverable.makedir(new_path)
-        for file in files:
-            old_filepath = fs.path.join(path, file.name)
-            new_filepath = fs.path.join(new_path, file.name)
-            fs.copy.copy_file(version_view, old_filepath, deliverable, new_filepath)
+    # with the validation tool.
+
+    deliverable = OSFS(deliverable_dir)
+    jobs: List[Tuple[str, str]] = []
+    for new_path, old_filepath in _deliverable_entries(version_view):
+        if old_filepath is None:
+            deliverable.makedirs(new_path, recreate=True)
+        else:
+            jobs.append((old_filepath, new_path))
+
+    def copy_file(job: Tuple[str, str]) -> None:
+        old_filepath, new_filepath = job
+        link_or_copy_file(version_view, old_filepath, deliverable, new_filepath)
+
+    with concurrent.futures.ThreadPoolExecutor(_THREADS) as executor:
+        # list() to raise any exception here
+        list(executor.map(copy_file, jobs))
+    deliverable.close()
+
+
+def _file_size(file: BinaryIO) -> int:
+    size = file.seek(0, os.SEEK_END)
+    file.seek(0)
+    return size
+
+
+def write_deliverable_archive(version_view: FS, archive_filepath: str) -> None:
+    """
+    Write the bundle in the version view into a tar or zip archive,
+    depending on the extension of the archive's filepath.  The files
+    are streamed from the version view straight into the archive, and
+    the entries are written in sorted order with fixed modification
+    times, owners and permissions, so the archive only depends on the
+    bundle's contents.
+    """
+    ext = os.path.splitext(archive_filepath)[1]
+    entries = _deliverable_entries(version_view)
+    if ext == ".tar":
+        with tarfile.open(archive_filepath, "w", format=tarfile.PAX_FORMAT) as tar:
+            for new_path, old_filepath in entries:
+                tar_info = tarfile.TarInfo(fs.path.relpath(new_path))
+                tar_info.mtime = _ARCHIVE_MTIME
+                if old_filepath is None:
+                    tar_info.type = tarfile.DIRTYPE
+                    tar_info.mode = 0o755
+                    tar.addfile(tar_info)
+                else:
+                    tar_info.mode = 0o644
+                    with version_view.openbin(old_filepath) as f:
+                        tar_info.size = _file_size(f)
+                        tar.addfile(tar_info, f)
+    elif ext == ".zip":
+        date_time = time.gmtime(_ARCHIVE_MTIME)[:6]
+        with zipfile.ZipFile(archive_filepath, "w", zipfile.ZIP_DEFLATED) as zip_file:
+            for new_path, old_filepath in entries:
+                if old_filepath is None:
+                    zip_info = zipfile.ZipInfo(
+                        fs.path.relpath(new_path) + "/", date_time
+                    )
+                    zip_info.external_attr = (0o40755 << 16) | 0x10
+                    zip_file.writestr(zip_info, b"")
+                else:
+                    zip_info = zipfile.ZipInfo(fs.path.relpath(new_path), date_time)
+                    zip_info.external_attr = 0o100644 << 16
+                    zip_info.compress_type = zipfile.ZIP_DEFLATED
+                    with version_view.openbin(old_filepath) as src:
+                        # Without the size, zipfile can't tell that the
+                        # entry needs ZIP64 and fails on files over 2 GiB.
+                        zip_info.file_size = _file_size(src)
+                        with zip_file.open(zip_info, "w") as dst:
+                            fs.tools.copy_file_data(src, dst)
+    else:
+        raise Exception(f"unknown deliverable archive format: {archive_filepath}")
 
 
 class MakeDeliverable(MarkedStage):
@@ -71,9 +170,13 @@ class MakeDeliverable(MarkedStage):
             bundle_segment = self._bundle_segment
 
             os.mkdir(deliverable_dir)
-            deliverable_osfs = OSFS(deliverable_dir)
-            copy_fs(version_view, deliverable_osfs)
-            _fix_up_deliverable(deliverable_dir)
+            if _ARCHIVE_FORMAT:
+                archive_filepath = os.path.join(
+                    deliverable_dir, f"{bundle_segment}.{_ARCHIVE_FORMAT}"
+                )
+                write_deliverable_archive(version_view, archive_filepath)
+            else:
+                build_deliverable(version_view, deliverable_dir)
 
             # open the database
             db_filepath = fs.path.join(working_dir, _BUNDLE_DB_NAME)
@@ -82,17 +185,12 @@ class MakeDeliverable(MarkedStage):
             # add manifests
             checksum_manifest_path = fs.path.join(manifest_dir, "checksum.manifest.txt")
             with open(checksum_manifest_path, "w") as f:
-                f.write(make_checksum_manifest(db, plain_lidvid_to_visits_dirpath))
+                f.writelines(
+                    checksum_manifest_lines(db, plain_lidvid_to_visits_dirpath)
+                )
 
             transfer_manifest_path = fs.path.join(manifest_dir, "transfer.manifest.txt")
             with open(transfer_manifest_path, "w") as f:
-                f.write(make_transfer_manifest(db, plain_lidvid_to_visits_dirpath))
-
-            # Tar it up.
-            if _TAR_NEEDED:
-                bundle_dir = str(fs.path.join(deliverable_dir, self._bundle_segment))
-
-                with tarfile.open(f"{bundle_dir}.tar", "w") as tar:
-                    tar.add(bundle_dir, arcname=os.path.basename(bundle_dir))
-
-                shutil.rmtree(bundle_dir)
+                f.writelines(
+                    transfer_manifest_lines(db, plain_lidvid_to_visits_dirpath)
+                )
@@ -1,5 +1,5 @@
 import os.path
-from typing import List
+from typing import List, Tuple
 
 import fs.path
 
@@ -8,7 +8,11 @@ from pdart.db.BundleDB import (
     _BUNDLE_DB_NAME,
     create_bundle_db_from_os_filepath,
 )
-from pdart.db.FitsFileDB import populate_database_from_fits_file
+from pdart.db.FitsFileDB import (
+    populate_database_from_downloads,
+    populate_database_from_fits_files,
+)
+from pdart.db.Utils import file_md5s
 from pdart.fs.cowfs.COWFS import COWFS
 from pdart.pds4.LID import LID
 from pdart.pds4.LIDVID import LIDVID
@@ -51,9 +55,15 @@ def _populate_from_document_collection(
     db.create_document_collection(collection_lidvid, bundle_lidvid)
     product_lidvid = _extend_initial_lidvid(collection_lidvid, "phase2")
     db.create_document_product(product_lidvid, collection_lidvid)
-    for basename in sv_deltas.listdir(product_path):
-        sys_filepath = sv_deltas.getsyspath(fs.path.join(product_path, basename))
-        db.create_document_file(sys_filepath, basename, product_lidvid)
+    sys_filepaths = {
+        basename: sv_deltas.getsyspath(fs.path.join(product_path, basename))
+        for basename in sv_deltas.listdir(product_path)
+    }
+    md5s = file_md5s(sys_filepaths.values())
+    for basename, sys_filepath in sys_filepaths.items():
+        db.create_document_file(
+            sys_filepath, basename, product_lidvid, md5s[sys_filepath]
+        )
 
 
 def _populate_from_other_collection(
@@ -68,6 +78,7 @@ def _populate_from_other_collection(
     product_segments = [
         str(prod[:-1]) for prod in sv_deltas.listdir(collection_path) if "$" in prod
     ]
+    files: List[Tuple[str, str]] = []
     for product_segment in product_segments:
         product_path = f"{collection_path}{product_segment}$/"
         product_lidvid = _extend_initial_lidvid(collection_lidvid, product_segment)
@@ -80,8 +91,9 @@ def _populate_from_other_collection(
             fits_file_path = fs.path.join(product_path, fits_file)
             db.create_fits_product(product_lidvid, collection_lidvid)
             fits_os_path = sv_deltas.getsyspath(fits_file_path)
+            files.append((fits_os_path, product_lidvid))
 
-            populate_database_from_fits_file(db, fits_os_path, product_lidvid)
+    populate_database_from_fits_files(db, files)
 
 
 class PopulateDatabase(MarkedStage):
@@ -116,17 +128,29 @@ class PopulateDatabase(MarkedStage):
                 collection_lidvid = _extend_initial_lidvid(
                     bundle_lidvid, collection_segment
                 )
-                if is_document_collection:
-                    product_path = f"{collection_path}phase2$/"
-                    _populate_from_document_collection(
-                        db, sv_deltas, bundle_lidvid, collection_lidvid, product_path
-                    )
-                else:
-                    _populate_from_other_collection(
-                        db, sv_deltas, bundle_lidvid, collection_lidvid, collection_path
-                    )
+                # Commit once per collection instead of once per row.
+                with db.batch_ingestion():
+                    if is_document_collection:
+                        product_path = f"{collection_path}phase2$/"
+                        _populate_from_document_collection(
+                            db,
+                            sv_deltas,
+                            bundle_lidvid,
+                            collection_lidvid,
+                            product_path,
+                        )
+                    else:
+                        _populate_from_other_collection(
+                            db,
+                            sv_deltas,
+                            bundle_lidvid,
+                            collection_lidvid,
+                            collection_path,
+                        )
             _populate_schema_collection(db, bundle_lidvid)
 
+        populate_database_from_downloads(db, self.mast_downloads_dir())
+
         assert db
 
         assert os.path.isfile(db_filepath), db_filepath
@@ -0,0 +1,153 @@
+"""
+Run the pipeline for many proposals at once.
+
+Proposals share nothing but the root of the working directories, so
+each gets its own StateMachine in a worker process.  Stages are
+grouped into resource classes, and a bounded semaphore per class
+(shared across the workers) limits how many stages of that class run
+at once: we don't want seventy proposals hitting MAST at the same
+moment, or every worker writing to the same disk.
+"""
+from contextlib import contextmanager
+import multiprocessing
+import os
+import traceback
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pdart.pipeline.Directories import Directories
+from pdart.pipeline.MarkerFile import BasicMarkerFile, MarkerInfo
+from pdart.pipeline.StateMachine import StateMachine
+
+NETWORK_RESOURCE = "network"
+CPU_RESOURCE = "cpu"
+DISK_RESOURCE = "disk"
+
+STAGE_RESOURCES: Dict[str, str] = {
+    "RESETPIPELINE": DISK_RESOURCE,
+    "DOWNLOADDOCS": NETWORK_RESOURCE,
+    "CHECKDOWNLOADS": NETWORK_RESOURCE,
+    "COPYPRIMARYFILES": DISK_RESOURCE,
+    "RECORDCHANGES": DISK_RESOURCE,
+    "INSERTCHANGES": DISK_RESOURCE,
+    "POPULATEDATABASE": CPU_RESOURCE,
+    "BUILDBROWSE": CPU_RESOURCE,
+    "BUILDLABELS": CPU_RESOURCE,
+    "UPDATEARCHIVE": DISK_RESOURCE,
+    "MAKEDELIVERABLE": DISK_RESOURCE,
+    "VALIDATEBUNDLE": CPU_RESOURCE,
+}
+
+
+def default_resource_limits() -> Dict[str, int]:
+    return {
+        NETWORK_RESOURCE: 2,
+        CPU_RESOURCE: os.cpu_count() or 1,
+        DISK_RESOURCE: 2,
+    }
+
+
+# Set in each worker process by _init_worker().
+_SEMAPHORES: Dict[str, Any] = {}
+
+
+def _init_worker(semaphores: Dict[str, Any]) -> None:
+    global _SEMAPHORES
+    _SEMAPHORES = semaphores
+
+
+@contextmanager
+def _resource_guard(phase: str) -> Iterator[None]:
+    semaphore = _SEMAPHORES.get(STAGE_RESOURCES[phase])
+    if semaphore is None:
+        yield
+    else:
+        with semaphore:
+            yield
+
+
+class ProposalStatus(object):
+    """
+    Where a proposal's pipeline stopped: its final marker, or the text
+    of an exception that kept the pipeline from running at all.
+    """
+
+    def __init__(
+        self,
+        proposal_id: int,
+        marker_info: Optional[MarkerInfo],
+        error_text: Optional[str] = None,
+    ) -> None:
+        self.proposal_id = proposal_id
+        self.marker_info = marker_info
+        self.error_text = error_text
+
+    def is_complete(self) -> bool:
+        return (
+            self.marker_info is not None
+            and self.marker_info.phase == "VALIDATEBUNDLE"
+            and self.marker_info.state == "SUCCESS"
+        )
+
+    def __str__(self) -> str:
+        bundle_segment = f"hst_{self.proposal_id:05}"
+        if self.error_text is not None:
+            return f"{bundle_segment}: ERROR {self.error_text.splitlines()[-1]}"
+        if self.marker_info is None:
+            return f"{bundle_segment}: NOT STARTED"
+        if self.is_complete():
+            return f"{bundle_segment}: COMPLETE"
+        return f"{bundle_segment}: {self.marker_info.phase} {self.marker_info.state}"
+
+
+def _run_proposal(args: Tuple[Directories, int, bool]) -> ProposalStatus:
+    dirs, proposal_id, resume = args
+    try:
+        state_machine = StateMachine(dirs, proposal_id, _resource_guard)
+        if resume:
+            state_machine.resume()
+        else:
+            state_machine.run()
+        return ProposalStatus(proposal_id, state_machine.marker_file.get_marker())
+    except Exception:
+        marker_file = BasicMarkerFile(dirs.working_dir(proposal_id))
+        try:
+            marker_info = marker_file.get_marker()
+        except OSError:
+            marker_info = None
+        return ProposalStatus(proposal_id, marker_info, traceback.format_exc())
+
+
+def run_proposals(
+    dirs: Directories,
+    proposal_ids: List[int],
+    width: int,
+    resource_limits: Optional[Dict[str, int]] = None,
+    resume: bool = True,
+) -> List[ProposalStatus]:
+    """
+    Run the pipeline for each proposal in a pool of width processes,
+    returning the statuses in the order of proposal_ids.  If resume is
+    set, each proposal restarts where its marker file says it stopped;
+    otherwise each starts from the beginning.
+    """
+    limits = default_resource_limits()
+    if resource_limits is not None:
+        limits.update(resource_limits)
+    semaphores = {
+        resource: multiprocessing.BoundedSemaphore(limit)
+        for resource, limit in limits.items()
+    }
+    statuses: Dict[int, ProposalStatus] = {}
+    with multiprocessing.Pool(width, _init_worker, (semaphores,)) as pool:
+        args = [(dirs, proposal_id, resume) for proposal_id in proposal_ids]
+        for status in pool.imap_unordered(_run_proposal, args):
+            print("****", status)
+            statuses[status.proposal_id] = status
+    return [statuses[proposal_id] for proposal_id in proposal_ids]
+
+
+def status_report(statuses: List[ProposalStatus]) -> str:
+    complete = [status for status in statuses if status.is_complete()]
+    lines = [str(status) for status in statuses]
+    lines.append(f"{len(complete)} of {len(statuses)} proposals complete.")
+    return "\n".join(lines) + "\n"
@@ -1,5 +1,6 @@
 import abc
-from typing import Optional
+from contextlib import contextmanager
+from typing import Callable, ContextManager, Iterator, Optional
 
 from pdart.pipeline.Stage import Stage
 from pdart.pipeline.Directories import Directories
@@ -19,8 +20,24 @@ from pdart.pipeline.UpdateArchive import UpdateArchive
 from pdart.pipeline.ValidateBundle import ValidateBundle
 
 
+@contextmanager
+def _unguarded(phase: str) -> Iterator[None]:
+    yield
+
+
 class StateMachine(object):
-    def __init__(self, dirs: Directories, proposal_id: int) -> None:
+    def __init__(
+        self,
+        dirs: Directories,
+        proposal_id: int,
+        stage_guard: Callable[[str], ContextManager[None]] = _unguarded,
+    ) -> None:
+        """
+        stage_guard is called with each stage's name and the stage is
+        run inside the returned context.  It lets a scheduler limit
+        how many stages of a kind run at once across proposals.
+        """
+        self.stage_guard = stage_guard
         self.marker_file = BasicMarkerFile(dirs.working_dir(proposal_id))
         self.stages = [
             ("RESETPIPELINE", ResetPipeline(dirs, proposal_id)),
@@ -50,11 +67,41 @@ class StateMachine(object):
         except IndexError:
             return None
 
+    def stage_name(self, stage: Stage) -> str:
+        for name, st in self.stages:
+            if st is stage:
+                return name
+        assert False, f"unknown stage {stage}"
+
+    def resume_stage(self) -> Optional[Stage]:
+        """
+        Return the stage to restart from, judging by the marker file
+        left by the last run, or None if the pipeline already ran to
+        completion.  A stage that failed or was interrupted is rerun.
+        """
+        marker_info = self.marker_file.get_marker()
+        if marker_info is None:
+            return self.stages[0][1]
+        if marker_info.state == "SUCCESS":
+            return self.next_stage(marker_info.phase)
+        for name, stage in self.stages:
+            if name == marker_info.phase:
+                # MarkedStages won't run over a FAILURE marker.
+                self.marker_file.clear_marker()
+                return stage
+        assert False, f"unknown phase {marker_info.phase}"
+
     def run(self) -> None:
         self.marker_file.clear_marker()
-        stage: Optional[Stage] = self.stages[0][1]
+        self._run_from(self.stages[0][1])
+
+    def resume(self) -> None:
+        self._run_from(self.resume_stage())
+
+    def _run_from(self, stage: Optional[Stage]) -> None:
         while stage is not None:
-            stage()
+            with self.stage_guard(self.stage_name(stage)):
+                stage()
             marker_info = self.marker_file.get_marker()
             assert marker_info is not None
             if marker_info.state == "SUCCESS":
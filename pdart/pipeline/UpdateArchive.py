@@ -1,13 +1,40 @@
 import os
 import os.path
 import shutil
+from typing import Dict
 
+import fs.path
+
+from pdart.db.BundleDB import (
+    BundleDB,
+    _BUNDLE_DB_NAME,
+    create_bundle_db_from_os_filepath,
+)
 from pdart.fs.multiversioned.Multiversioned import Multiversioned, std_is_new
+from pdart.fs.multiversioned.VersionView import vv_lid_path
+from pdart.pds4.LIDVID import LIDVID
 from pdart.pipeline.RecordChanges import CHANGES_DICT
 from pdart.pipeline.Stage import MarkedStage
 from pdart.pipeline.Utils import make_osfs, make_sv_deltas, make_version_view
 
 
+# Number of threads used to add the products of a collection to the
+# archive.  Adding them is mostly copying files, so it's I/O bound.
+_THREADS: int = 8
+
+
+def _file_md5s(db: BundleDB) -> Dict[str, str]:
+    """
+    The MD5 hashes of the files in the bundle that the database
+    already has, by their filepaths in the single-version filesystem.
+    """
+    md5s = dict()
+    for lidvid, basename, md5_hash in db.get_file_md5s():
+        dirpath = fs.path.abspath(vv_lid_path(LIDVID(lidvid).lid()))
+        md5s[fs.path.join(dirpath, basename)] = md5_hash
+    return md5s
+
+
 class UpdateArchive(MarkedStage):
     def _run(self) -> None:
         working_dir: str = self.working_dir()
@@ -16,6 +43,9 @@ class UpdateArchive(MarkedStage):
         archive_browse_deltas_dir: str = self.archive_browse_deltas_dir()
         archive_label_deltas_dir: str = self.archive_label_deltas_dir()
 
+        db_filepath = os.path.join(working_dir, _BUNDLE_DB_NAME)
+        db = create_bundle_db_from_os_filepath(db_filepath)
+
         with make_osfs(archive_dir) as archive_osfs, make_version_view(
             archive_osfs, self._bundle_segment
         ) as version_view, make_sv_deltas(
@@ -29,8 +59,14 @@ class UpdateArchive(MarkedStage):
             # TODO I *think* this is a hack and will only work for the
             # initial import...but maybe I accidentally wrote better code
             # than I think and it'll work for all cases.  Investigate.
-            mv = Multiversioned(archive_osfs)
-            mv.update_from_single_version(std_is_new, label_deltas)
+            # The deltas are deleted below, so the archive can take
+            # their files instead of copies.
+            mv = Multiversioned(archive_osfs, link_files=True)
+            # The manifests of the new versions use the hashes in the
+            # database, so the files needn't be read to hash them.
+            mv.update_from_single_version(
+                std_is_new, label_deltas, _file_md5s(db), _THREADS
+            )
 
         shutil.rmtree(archive_primary_deltas_dir + "-deltas-sv")
         shutil.rmtree(archive_browse_deltas_dir + "-deltas-sv")
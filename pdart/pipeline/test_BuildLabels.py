@@ -0,0 +1,92 @@
+import os
+import os.path
+import shutil
+import tempfile
+import unittest
+
+import fs.path
+from fs.tempfs import TempFS
+
+from pdart.db.BundleDB import create_bundle_db_from_os_filepath
+from pdart.db.FitsFileDB import populate_database_from_fits_file
+from pdart.fs.cowfs.COWFS import COWFS
+from pdart.labels.FitsProductLabel import make_fits_product_label
+from pdart.labels.LabelError import LabelError
+from pdart.labels.Utils import path_to_testfile
+from pdart.pipeline.BuildLabels import (
+    _create_fits_product_labels,
+    _fits_product_label_filepath,
+    _fits_product_label_jobs,
+)
+
+
+class Test_BuildLabels(unittest.TestCase):
+    def setUp(self) -> None:
+        self.working_dir = tempfile.mkdtemp(None, "test_buildlabels_")
+        self.db = create_bundle_db_from_os_filepath(
+            os.path.join(self.working_dir, "bundle$database.db")
+        )
+        self.db.create_tables()
+
+    def tearDown(self) -> None:
+        self.db.close()
+        shutil.rmtree(self.working_dir)
+
+    def test_create_fits_product_labels(self) -> None:
+        bundle_lidvid = "urn:nasa:pds:hst_13012::1.0"
+        self.db.create_bundle(bundle_lidvid)
+        mast_dir = os.path.join(self.working_dir, "mastDownload")
+        os.mkdir(mast_dir)
+
+        jobs = []
+        for suffix in ["raw", "spt"]:
+            collection_lidvid = f"urn:nasa:pds:hst_13012:data_acs_{suffix}::1.0"
+            self.db.create_other_collection(collection_lidvid, bundle_lidvid)
+            product_lidvid = f"urn:nasa:pds:hst_13012:data_acs_{suffix}:jbz504eoq::1.0"
+            self.db.create_fits_product(product_lidvid, collection_lidvid)
+            basename = f"jbz504eoq_{suffix}.fits"
+            os_filepath = os.path.join(mast_dir, basename)
+            shutil.copyfile(path_to_testfile(basename), os_filepath)
+            populate_database_from_fits_file(self.db, os_filepath, product_lidvid)
+            jobs.append((product_lidvid, basename))
+
+        label_deltas = COWFS(TempFS())
+        for product_lidvid, basename in jobs:
+            label_filepath = _fits_product_label_filepath(product_lidvid, basename)
+            label_deltas.makedirs(fs.path.dirname(label_filepath))
+
+        fits_label_jobs = _fits_product_label_jobs(self.db)
+        self.assertEqual(
+            {
+                f"urn:nasa:pds:hst_13012:data_acs_{suffix}::1.0": [job]
+                for suffix, job in zip(["raw", "spt"], jobs)
+            },
+            fits_label_jobs,
+        )
+        done = _create_fits_product_labels(
+            self.working_dir, self.db, label_deltas, fits_label_jobs
+        )
+
+        # The labels must be the same as when made serially, and
+        # labels that can't be made serially must be left undone.
+        made_serially = 0
+        for product_lidvid, basename in jobs:
+            label_filepath = _fits_product_label_filepath(product_lidvid, basename)
+            try:
+                label = make_fits_product_label(
+                    self.working_dir, self.db, product_lidvid, basename, False
+                )
+            except LabelError:
+                self.assertNotIn((product_lidvid, basename), done)
+                self.assertFalse(label_deltas.exists(label_filepath))
+                continue
+            self.assertIn((product_lidvid, basename), done)
+            self.assertEqual(label, label_deltas.getbytes(label_filepath))
+            self.assertTrue(self.db.product_label_exists(product_lidvid))
+            made_serially += 1
+
+        # The pool must have made them all, not left them to the
+        # serial walk.
+        if made_serially == 0:
+            self.skipTest("no FITS product labels can be made here")
+        self.assertEqual(made_serially, len(done))
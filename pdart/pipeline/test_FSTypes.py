@@ -24,6 +24,15 @@ class Test_FSTypes(unittest.TestCase):
         m.makedirs("/hst_12345/v$1.0")
         self.assertEqual(MULTIVERSIONED_FS_TYPE, categorize_filesystem(m))
 
+        m = MemoryFS()
+        m.makedirs("/hst_12345/data_acs_raw/j6gp01lzq/v$1.0")
+        self.assertEqual(MULTIVERSIONED_FS_TYPE, categorize_filesystem(m))
+
         m = MemoryFS()
         m.makedir("/hst_12345")
         self.assertEqual(UNKNOWN_FS_TYPE, categorize_filesystem(m))
+
+        # Version directories can't be deeper than under a product.
+        m = MemoryFS()
+        m.makedirs("/hst_12345/data_acs_raw/j6gp01lzq/dir/v$1.0")
+        self.assertEqual(UNKNOWN_FS_TYPE, categorize_filesystem(m))
@@ -0,0 +1,143 @@
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+import zipfile
+from typing import List
+
+from fs.memoryfs import MemoryFS
+
+from pdart.pipeline.MakeDeliverable import (
+    _deliverable_dirpath,
+    build_deliverable,
+    write_deliverable_archive,
+)
+
+
+def _make_version_view() -> MemoryFS:
+    version_view = MemoryFS()
+    version_view.makedirs("/hst_12345$/data_acs_raw$/j6gp01lzq$")
+    version_view.makedirs("/hst_12345$/data_acs_raw$/j6gp01m0q$")
+    version_view.writetext("/hst_12345$/bundle.xml", "bundle")
+    version_view.writetext(
+        "/hst_12345$/data_acs_raw$/j6gp01lzq$/j6gp01lzq_raw.fits", "lzq"
+    )
+    version_view.writetext(
+        "/hst_12345$/data_acs_raw$/j6gp01m0q$/j6gp01m0q_raw.fits", "m0q"
+    )
+    return version_view
+
+
+_ARCHIVE_NAMES: List[str] = [
+    "hst_12345",
+    "hst_12345/bundle.xml",
+    "hst_12345/data_acs_raw",
+    "hst_12345/data_acs_raw/visit_01",
+    "hst_12345/data_acs_raw/visit_01/j6gp01lzq_raw.fits",
+    "hst_12345/data_acs_raw/visit_01/j6gp01m0q_raw.fits",
+]
+
+
+class Test_MakeDeliverable(unittest.TestCase):
+    def test_deliverable_dirpath(self) -> None:
+        self.assertEqual("/", _deliverable_dirpath("/"))
+        self.assertEqual("/hst_12345", _deliverable_dirpath("/hst_12345$"))
+        self.assertEqual(
+            "/hst_12345/data_acs_raw", _deliverable_dirpath("/hst_12345$/data_acs_raw$")
+        )
+        self.assertEqual(
+            "/hst_12345/data_acs_raw/visit_01",
+            _deliverable_dirpath("/hst_12345$/data_acs_raw$/j6gp01lzq$"),
+        )
+        self.assertEqual(
+            "/hst_12345/document/phase2",
+            _deliverable_dirpath("/hst_12345$/document$/phase2$"),
+        )
+
+    def test_build_deliverable(self) -> None:
+        version_view = _make_version_view()
+
+        deliverable_dir = tempfile.mkdtemp()
+        try:
+            build_deliverable(version_view, deliverable_dir)
+            found = {
+                os.path.relpath(os.path.join(dirpath, filename), deliverable_dir)
+                for dirpath, _, filenames in os.walk(deliverable_dir)
+                for filename in filenames
+            }
+            self.assertEqual(
+                {
+                    "hst_12345/bundle.xml",
+                    "hst_12345/data_acs_raw/visit_01/j6gp01lzq_raw.fits",
+                    "hst_12345/data_acs_raw/visit_01/j6gp01m0q_raw.fits",
+                },
+                found,
+            )
+            with open(
+                os.path.join(
+                    deliverable_dir,
+                    "hst_12345/data_acs_raw/visit_01/j6gp01m0q_raw.fits",
+                )
+            ) as f:
+                self.assertEqual("m0q", f.read())
+        finally:
+            shutil.rmtree(deliverable_dir)
+
+    def test_write_deliverable_archive(self) -> None:
+        archive_dir = tempfile.mkdtemp()
+        try:
+            for ext in [".tar", ".zip"]:
+                archive_filepath = os.path.join(archive_dir, "hst_12345" + ext)
+                write_deliverable_archive(_make_version_view(), archive_filepath)
+                with open(archive_filepath, "rb") as f:
+                    archive_bytes = f.read()
+
+                # Writing the same bundle again gives the same bytes.
+                write_deliverable_archive(_make_version_view(), archive_filepath)
+                with open(archive_filepath, "rb") as f:
+                    self.assertEqual(archive_bytes, f.read())
+
+                if ext == ".tar":
+                    with tarfile.open(archive_filepath) as tar:
+                        self.assertEqual(_ARCHIVE_NAMES, tar.getnames())
+                        member = tar.extractfile(
+                            "hst_12345/data_acs_raw/visit_01/j6gp01m0q_raw.fits"
+                        )
+                        assert member
+                        self.assertEqual(b"m0q", member.read())
+                else:
+                    with zipfile.ZipFile(archive_filepath) as zip_file:
+                        self.assertEqual(
+                            [name.rstrip("/") for name in zip_file.namelist()],
+                            _ARCHIVE_NAMES,
+                        )
+                        self.assertEqual(
+                            b"m0q",
+                            zip_file.read(
+                                "hst_12345/data_acs_raw/visit_01/j6gp01m0q_raw.fits"
+                            ),
+                        )
+        finally:
+            shutil.rmtree(archive_dir)
+
+    def test_write_deliverable_zip64(self) -> None:
+        # zipfile only uses ZIP64 for an entry if it knows beforehand
+        # that the entry is too big for plain zip.  Shrink the limit
+        # so that the test files are too big for it.
+        archive_dir = tempfile.mkdtemp()
+        zip64_limit = zipfile.ZIP64_LIMIT
+        zipfile.ZIP64_LIMIT = 2
+        try:
+            archive_filepath = os.path.join(archive_dir, "hst_12345.zip")
+            write_deliverable_archive(_make_version_view(), archive_filepath)
+        finally:
+            zipfile.ZIP64_LIMIT = zip64_limit
+        try:
+            with zipfile.ZipFile(archive_filepath) as zip_file:
+                self.assertEqual(
+                    b"m0q",
+                    zip_file.read("hst_12345/data_acs_raw/visit_01/j6gp01m0q_raw.fits"),
+                )
+        finally:
+            shutil.rmtree(archive_dir)
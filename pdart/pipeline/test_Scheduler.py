@@ -0,0 +1,84 @@
+import multiprocessing
+import shutil
+import tempfile
+import unittest
+
+from pdart.pipeline.Directories import DevDirectories
+from pdart.pipeline.MarkerFile import BasicMarkerFile, MarkerInfo
+from pdart.pipeline.Scheduler import *
+from pdart.pipeline.Scheduler import _init_worker, _resource_guard
+from pdart.pipeline.StateMachine import StateMachine
+
+
+class Test_Scheduler(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tempdir = tempfile.mkdtemp(None, "test_scheduler_")
+        self.dirs = DevDirectories(self.tempdir)
+
+    def tearDown(self) -> None:
+        _init_worker({})
+        shutil.rmtree(self.tempdir)
+
+    def test_stage_resources(self) -> None:
+        state_machine = StateMachine(self.dirs, 1)
+        names = [name for name, _ in state_machine.stages]
+        self.assertEqual(set(names), set(STAGE_RESOURCES.keys()))
+
+    def test_resume_stage(self) -> None:
+        state_machine = StateMachine(self.dirs, 1)
+        marker_file = BasicMarkerFile(self.dirs.working_dir(1))
+        stages = dict(state_machine.stages)
+
+        # No marker: start at the beginning.
+        self.assertIs(stages["RESETPIPELINE"], state_machine.resume_stage())
+
+        # Success: go on to the next stage.
+        marker_file.set_marker_info("BUILDBROWSE", "SUCCESS")
+        self.assertIs(stages["BUILDLABELS"], state_machine.resume_stage())
+
+        # Failure: rerun the stage, with the marker cleared.
+        marker_file.set_marker_info("BUILDLABELS", "FAILURE", "oops")
+        self.assertIs(stages["BUILDLABELS"], state_machine.resume_stage())
+        self.assertIsNone(marker_file.get_marker())
+
+        # Done: nothing left to run.
+        marker_file.set_marker_info("VALIDATEBUNDLE", "SUCCESS")
+        self.assertIsNone(state_machine.resume_stage())
+
+    def test_resource_guard(self) -> None:
+        semaphore = multiprocessing.BoundedSemaphore(1)
+        _init_worker({CPU_RESOURCE: semaphore})
+        with _resource_guard("BUILDLABELS"):
+            self.assertFalse(semaphore.acquire(False))
+        self.assertTrue(semaphore.acquire(False))
+        semaphore.release()
+
+    def test_run_proposals(self) -> None:
+        # Proposal 1 already ran to completion, so resuming does
+        # nothing.
+        StateMachine(self.dirs, 1)
+        marker_file = BasicMarkerFile(self.dirs.working_dir(1))
+        marker_file.set_marker_info("VALIDATEBUNDLE", "SUCCESS")
+        statuses = run_proposals(self.dirs, [1], 1)
+        self.assertEqual(1, len(statuses))
+        self.assertTrue(statuses[0].is_complete())
+        self.assertEqual(
+            "hst_00001: COMPLETE\n1 of 1 proposals complete.\n",
+            status_report(statuses),
+        )
+
+    def test_status_report(self) -> None:
+        statuses = [
+            ProposalStatus(1, MarkerInfo("VALIDATEBUNDLE", "SUCCESS", None)),
+            ProposalStatus(2, MarkerInfo("BUILDLABELS", "FAILURE", "oops")),
+            ProposalStatus(3, None),
+            ProposalStatus(4, None, "Traceback...\nValueError: bad\n"),
+        ]
+        self.assertEqual(
+            "hst_00001: COMPLETE\n"
+            "hst_00002: BUILDLABELS FAILURE\n"
+            "hst_00003: NOT STARTED\n"
+            "hst_00004: ERROR ValueError: bad\n"
+            "1 of 4 proposals complete.\n",
+            status_report(statuses),
+        )
@@ -1,10 +1,32 @@
 """
 Pretty-printing functionality.
 """
+import codecs
+import re
+from typing import Any, Dict, List, Optional, Tuple, Union
+import xml.parsers.expat
+
 from pdart.xml.Schema import run_subprocess, verify_label_or_raise
 
+# If True, pretty_print() runs xmllint --format in a subprocess;
+# otherwise it formats in-process with format_xml(), which gives the
+# same output without launching a process per label.  Labels made
+# with DocTemplate.pretty_bytes() are formatted by xmllint too when
+# it's set.
+_USE_XMLLINT: bool = False
+
 
 def pretty_print(str: bytes) -> bytes:
+    """Reformat XML as xmllint --format does."""
+    if _USE_XMLLINT:
+        return xmllint_pretty_print(str)
+    try:
+        return format_xml(str)
+    except _Unsupported:
+        return xmllint_pretty_print(str)
+
+
+def xmllint_pretty_print(str: bytes) -> bytes:
     """Reformat XML using xmllint --format."""
     (exit_code, stderr, stdout) = run_subprocess(["xmllint", "--format", "-"], str)
     if exit_code == 0:
@@ -22,3 +44,488 @@ def pretty_and_verify(label: bytes, verify: bool) -> bytes:
     if verify:
         verify_label_or_raise(label)
     return label
+
+
+############################################################
+
+# The rest of this module reimplements xmllint --format: libxml2
+# parses, dropping whitespace it guesses is only there for
+# indentation, then writes out the tree with two-space indentation,
+# except inside elements that contain text, which are written as
+# they are.  The details (which whitespace is dropped, how characters
+# are escaped) follow libxml2 so that the output is byte-for-byte the
+# same.
+
+
+class _Unsupported(Exception):
+    """
+    Raised on XML that format_xml() doesn't handle (like DOCTYPEs);
+    pretty_print() passes it to xmllint instead.
+    """
+
+    pass
+
+
+_BLANKS = " \t\n\r"
+
+# libxml2 caps indentation at 30 levels of two spaces.
+_MAX_INDENT_LEVEL = 30
+
+
+class _Text(object):
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+
+class _CData(object):
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+
+class _Comment(object):
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+
+class _PI(object):
+    # data is None if nothing, not even whitespace, follows the target.
+    def __init__(self, target: str, data: Optional[str]) -> None:
+        self.target = target
+        self.data = data
+
+
+class _Element(object):
+    def __init__(self, name: str, attrs: List[str], space: int) -> None:
+        self.name = name
+        self.attrs = attrs
+        self.children: List[_Node] = []
+        # libxml2's xml:space state: 1 to keep all whitespace, -2
+        # once text has been kept, else 0 or -1.
+        self.space = space
+
+
+_Node = Union[_Text, _CData, _Comment, _PI, _Element]
+
+# kinds of character data
+_CHARS = 0
+_REFERENCE = 1
+_CR = 2  # a line end written as a carriage return
+_CRLF = 3  # a line end written as a carriage return and line feed
+
+
+class _TreeBuilder(object):
+    def __init__(self, source: bytes) -> None:
+        self.source = source
+        self.version = "1.0"
+        self.encoding: Optional[str] = None
+        self.standalone = -1
+        self.top: List[_Node] = []
+        self.stack: List[_Element] = []
+        # Character data since the last markup, as (text, kind) pairs:
+        # libxml2 treats text differently on either side of a
+        # character or entity reference or a carriage return.
+        self.pending: List[Tuple[str, int]] = []
+        self.in_cdata = False
+
+        parser = xml.parsers.expat.ParserCreate()
+        parser.ordered_attributes = True
+        parser.XmlDeclHandler = self.xml_decl
+        parser.StartDoctypeDeclHandler = self.unsupported
+        parser.StartElementHandler = self.start_element
+        parser.EndElementHandler = self.end_element
+        parser.CharacterDataHandler = self.character_data
+        parser.CommentHandler = self.comment
+        parser.ProcessingInstructionHandler = self.parsed_processing_instruction
+        parser.StartCdataSectionHandler = self.start_cdata
+        parser.EndCdataSectionHandler = self.end_cdata
+        self.parser = parser
+
+    def parse(self) -> None:
+        self.parser.Parse(self.source, True)
+
+    def unsupported(self, *args: Any) -> None:
+        raise _Unsupported()
+
+    def xml_decl(self, version: str, encoding: Optional[str], standalone: int) -> None:
+        self.version = version
+        self.encoding = encoding
+        self.standalone = standalone
+
+    def append(self, node: _Node) -> None:
+        if self.stack:
+            self.stack[-1].children.append(node)
+        else:
+            self.top.append(node)
+
+    def character_data(self, data: str) -> None:
+        if self.in_cdata:
+            cdata = self.stack[-1].children[-1]
+            assert isinstance(cdata, _CData)
+            cdata.text += data
+        else:
+            # expat reports each line end on its own.
+            index = self.parser.CurrentByteIndex
+            source = self.source[index : index + 2]
+            if source[:1] == b"&":
+                kind = _REFERENCE
+            elif source == b"\r\n":
+                kind = _CRLF
+            elif source[:1] == b"\r":
+                kind = _CR
+            else:
+                kind = _CHARS
+            self.characters(data, kind)
+
+    def characters(self, data: str, kind: int) -> None:
+        self.pending.append((data, kind))
+
+    def flush_text(self, closing: bool) -> None:
+        """
+        Add the pending character data to the current element,
+        dropping runs of whitespace the way libxml2 does when the
+        next markup is reached.  closing is True if that markup is an
+        end tag.
+        """
+        pending = self.pending
+        if not pending:
+            return
+        self.pending = []
+        if not self.stack:
+            # only whitespace outside the root element
+            return
+        element = self.stack[-1]
+
+        # Split into the chunks libxml2 sees: references, and runs of
+        # text between them.  libxml2 reads runs of ASCII text a fast
+        # way which also ends a chunk at each carriage return, until a
+        # lone carriage return, a non-ASCII character or a carriage
+        # return right after a line end sends it the slow way for the
+        # rest of the run.  Each chunk is (text, is_reference,
+        # ends_at_cr).
+        chunks: List[Tuple[str, bool, bool]] = []
+        new_chunk = True
+        fast = True
+        after_crlf = False
+        for text, kind in pending:
+            if kind == _REFERENCE:
+                chunks.append((text, True, False))
+                new_chunk = True
+                fast = True
+                after_crlf = False
+                continue
+            if after_crlf and (kind == _CR or kind == _CRLF):
+                fast = False
+            after_crlf = fast and kind == _CRLF
+            if fast and (kind == _CR or kind == _CRLF):
+                if not new_chunk:
+                    chunks[-1] = (chunks[-1][0], False, True)
+                new_chunk = True
+                fast = kind == _CRLF
+            elif fast and not text.isascii():
+                fast = False
+            if new_chunk:
+                chunks.append((text, False, False))
+                new_chunk = False
+            else:
+                chunks[-1] = (chunks[-1][0] + text, False, False)
+
+        for i, (text, is_reference, ends_at_cr) in enumerate(chunks):
+            if not is_reference:
+                if text.strip(_BLANKS) == "":
+                    at_markup = i + 1 == len(chunks)
+                    if (at_markup or ends_at_cr) and self.are_blanks(
+                        element, at_markup and closing
+                    ):
+                        continue
+                if element.space == -1 and (text[0] in _BLANKS or not text.isascii()):
+                    element.space = -2
+            children = element.children
+            if children and isinstance(children[-1], _Text):
+                children[-1].text += text
+            else:
+                children.append(_Text(text))
+
+    @staticmethod
+    def are_blanks(element: _Element, closing: bool) -> bool:
+        """
+        libxml2's guess whether whitespace followed by markup or a
+        carriage return is only for indentation.  closing is True if
+        it is followed by an end tag.
+        """
+        if element.space == 1 or element.space == -2:
+            return False
+        children = element.children
+        if not children:
+            return not closing
+        if isinstance(children[-1], _Text):
+            return False
+        if isinstance(children[0], _Text):
+            return False
+        return True
+
+    def start_element(self, name: str, attrs: List[str]) -> None:
+        self.flush_text(False)
+        if not self.stack or self.stack[-1].space == -2:
+            space = -1
+        else:
+            space = self.stack[-1].space
+        for i in range(0, len(attrs), 2):
+            if attrs[i] == "xml:space":
+                if attrs[i + 1] == "preserve":
+                    space = 1
+                elif attrs[i + 1] == "default":
+                    space = 0
+        element = _Element(name, attrs, space)
+        self.append(element)
+        self.stack.append(element)
+
+    def end_element(self, name: str) -> None:
+        self.flush_text(True)
+        self.stack.pop()
+
+    def comment(self, data: str) -> None:
+        self.flush_text(False)
+        self.append(_Comment(data))
+
+    def parsed_processing_instruction(self, target: str, data: str) -> None:
+        if data:
+            self.processing_instruction(target, data)
+        else:
+            # libxml2 writes "<?x ?>" as it is, but expat reports it
+            # just like "<?x?>".
+            index = self.parser.CurrentByteIndex
+            end = self.source.index(b"?>", index)
+            has_data = self.source[end - 1 : end] in [b" ", b"\t", b"\r", b"\n"]
+            self.processing_instruction(target, data if has_data else None)
+
+    def processing_instruction(self, target: str, data: Optional[str]) -> None:
+        self.flush_text(False)
+        self.append(_PI(target, data))
+
+    def start_cdata(self) -> None:
+        self.flush_text(False)
+        # libxml2 merges adjacent CDATA sections.
+        children = self.stack[-1].children
+        if not children or not isinstance(children[-1], _CData):
+            children.append(_CData(""))
+        self.in_cdata = True
+
+    def end_cdata(self) -> None:
+        self.in_cdata = False
+
+
+class _Writer(object):
+    def __init__(self, encoding: Optional[str]) -> None:
+        self.out: List[str] = []
+        if encoding is None:
+            # Without a declared encoding, libxml2 writes ASCII,
+            # escaping everything else in hex.
+            self.non_ascii_format = "&#x%X;"
+            self.cr_reference = "&#xD;"
+        else:
+            self.non_ascii_format = ""
+            self.cr_reference = "&#13;"
+        self.text_escapes: Dict[int, str] = {
+            ord("<"): "&lt;",
+            ord(">"): "&gt;",
+            ord("&"): "&amp;",
+            ord("\r"): self.cr_reference,
+        }
+        self.attr_escapes: Dict[int, str] = {
+            ord("<"): "&lt;",
+            ord(">"): "&gt;",
+            ord("&"): "&amp;",
+            ord('"'): "&quot;",
+            ord("\n"): "&#10;",
+            ord("\r"): "&#13;",
+            ord("\t"): "&#9;",
+        }
+
+    def escape(self, text: str, escapes: Dict[int, str]) -> str:
+        text = text.translate(escapes)
+        if self.non_ascii_format and not text.isascii():
+            text = "".join(
+                c if ord(c) < 0x80 else self.non_ascii_format % ord(c) for c in text
+            )
+        return text
+
+    def write_node(self, node: _Node, level: int, format: bool) -> None:
+        out = self.out
+        if isinstance(node, _Element):
+            self.write_element(node, level, format)
+        elif isinstance(node, _Text):
+            out.append(self.escape(node.text, self.text_escapes))
+        elif isinstance(node, _CData):
+            out.append(f"<![CDATA[{node.text}]]>")
+        elif isinstance(node, _Comment):
+            out.append(f"<!--{node.text}-->")
+        elif isinstance(node, _PI):
+            if node.data is not None:
+                out.append(f"<?{node.target} {node.data}?>")
+            else:
+                out.append(f"<?{node.target}?>")
+        else:
+            assert False, f"unexpected node {node}"
+
+    def write_element(self, element: _Element, level: int, format: bool) -> None:
+        out = self.out
+        out.append("<")
+        out.append(element.name)
+        # libxml2 writes namespace declarations before the other
+        # attributes.
+        attrs = element.attrs
+        names = range(0, len(attrs), 2)
+        for is_namespace in [True, False]:
+            for i in names:
+                name = attrs[i]
+                if (name == "xmlns" or name.startswith("xmlns:")) == is_namespace:
+                    value = self.escape(attrs[i + 1], self.attr_escapes)
+                    out.append(f' {name}="{value}"')
+        children = element.children
+        if not children:
+            out.append("/>")
+            return
+        out.append(">")
+        if format:
+            for child in children:
+                if isinstance(child, (_Text, _CData)):
+                    format = False
+                    break
+        if format:
+            out.append("\n")
+            child_indent = "  " * min(level + 1, _MAX_INDENT_LEVEL)
+            for child in children:
+                out.append(child_indent)
+                self.write_node(child, level + 1, True)
+                out.append("\n")
+            out.append("  " * min(level, _MAX_INDENT_LEVEL))
+        else:
+            for child in children:
+                self.write_node(child, level + 1, False)
+        out.append(f"</{element.name}>")
+
+
+def format_xml(source: bytes) -> bytes:
+    """
+    Reformat XML in-process exactly as xmllint --format does.
+    """
+    builder = _TreeBuilder(source)
+    try:
+        builder.parse()
+    except xml.parsers.expat.ExpatError as e:
+        raise Exception("pretty_print failed") from e
+
+    encoding = builder.encoding
+    if encoding is not None:
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            raise _Unsupported()
+
+    return _write_document(builder)
+
+
+def _write_document(builder: _TreeBuilder) -> bytes:
+    encoding = builder.encoding
+    writer = _Writer(encoding)
+    out = writer.out
+    out.append(f'<?xml version="{builder.version}"')
+    if encoding is not None:
+        out.append(f' encoding="{encoding}"')
+    if builder.standalone != -1:
+        out.append(' standalone="yes"' if builder.standalone else ' standalone="no"')
+    out.append("?>\n")
+    for node in builder.top:
+        writer.write_node(node, 0, True)
+        out.append("\n")
+
+    result = "".join(out)
+    if encoding is None:
+        # Only names, comments and processing instructions can still
+        # hold non-ASCII characters; libxml2 writes them as UTF-8.
+        return result.encode("utf-8")
+    else:
+        # libxml2 writes characters the encoding can't handle as
+        # decimal references.
+        return result.encode(encoding, "xmlcharrefreplace")
+
+
+# Characters that can't appear in XML 1.0.
+_ILLEGAL_CHARS = re.compile("[^\t\n\r\x20-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]")
+
+# minidom writes these as references.
+_MINIDOM_REFERENCES = '&<>"'
+
+# The references and line ends in minidom's text.
+_MINIDOM_PIECES = re.compile('([&<>"]|\r\n?)')
+
+
+def _parsed(data: str) -> str:
+    """
+    What the parser makes of the data: it normalizes line ends and
+    rejects characters XML doesn't allow.
+    """
+    if _ILLEGAL_CHARS.search(data):
+        raise Exception("pretty_print failed")
+    return data.replace("\r\n", "\n").replace("\r", "\n")
+
+
+class PrettyPrintBuilder(object):
+    """
+    Makes the pretty-printed text of an XML document given as a series
+    of calls instead of as text.  The result is what
+    pretty_print(doc.toxml().encode()) gives for a minidom Document
+    with the same contents, without building the DOM or parsing.
+    """
+
+    def __init__(self) -> None:
+        # minidom writes '<?xml version="1.0" ?>' and nothing else.
+        self.builder = _TreeBuilder(b"")
+        # Adjacent text is parsed together: "\r" then "\n" is one line
+        # end.
+        self.pending_text: List[str] = []
+
+    def flush_text(self) -> None:
+        data = "".join(self.pending_text)
+        self.pending_text = []
+        if _ILLEGAL_CHARS.search(data):
+            raise Exception("pretty_print failed")
+        # It matters which characters minidom escapes and how line
+        # ends are written: see _TreeBuilder.flush_text().
+        for piece in _MINIDOM_PIECES.split(data):
+            if not piece:
+                pass
+            elif piece in _MINIDOM_REFERENCES:
+                self.builder.characters(piece, _REFERENCE)
+            elif piece == "\r\n":
+                self.builder.characters("\n", _CRLF)
+            elif piece == "\r":
+                self.builder.characters("\n", _CR)
+            else:
+                self.builder.characters(piece, _CHARS)
+
+    def start_element(self, name: str, attrs: List[Tuple[str, str]]) -> None:
+        self.flush_text()
+        flat_attrs: List[str] = []
+        for attr_name, value in attrs:
+            # The parser turns whitespace in attribute values into
+            # spaces.
+            value = _parsed(value).replace("\n", " ").replace("\t", " ")
+            flat_attrs.extend([attr_name, value])
+        self.builder.start_element(name, flat_attrs)
+
+    def end_element(self, name: str) -> None:
+        self.flush_text()
+        self.builder.end_element(name)
+
+    def text(self, data: str) -> None:
+        self.pending_text.append(data)
+
+    def processing_instruction(self, target: str, data: str) -> None:
+        self.flush_text()
+        # minidom always writes a space after the target.
+        self.builder.processing_instruction(target, _parsed(data).lstrip(_BLANKS))
+
+    def pretty_bytes(self) -> bytes:
+        self.flush_text()
+        return _write_document(self.builder)
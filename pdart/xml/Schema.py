@@ -3,15 +3,17 @@ Functionality to validate XML against various schemas using external
 programs.
 
 :func:`verify_label_or_raise` is the main function used for validating
-PDS4 labels.
+PDS4 labels.  Running Java for each label is slow, so within
+:func:`validation_server`, labels can instead be sent to a single
+long-running :class:`ValidationServer`.
 """
 import os
 import os.path
 import subprocess
 import tempfile
 import xml.dom.minidom
-from contextlib import closing
-from typing import List, Optional, Sequence, Tuple, Union
+from contextlib import closing, contextmanager
+from typing import IO, Iterator, List, Optional, Sequence, Tuple, Union
 
 from pdart.xml.Pds4Version import (
     DISP_SHORT_VERSION,
@@ -191,6 +193,14 @@ def schematron_failures(
     they exist.
     """
     svrl = probatron_with_svrl_result(filepath or "", stdin, schema)
+    return _svrl_failures_text(svrl)
+
+
+def _svrl_failures_text(svrl: xml.dom.minidom.Document) -> Optional[str]:
+    """
+    Given an SVRL document, return None if there are no failures;
+    return a string containing the failures if they exist.
+    """
     failures = svrl_failures(svrl)
     if len(failures) > 0:
         # should I have a pretty option here for human-readability?
@@ -208,20 +218,46 @@ def verify_label_or_raise_fp(filepath: str) -> None:
     verify_label_or_raise(label)
 
 
-def verify_label_or_raise(label: bytes) -> None:
+def _xml_schema_failures_message(failures: bytes) -> str:
+    return f"XML schema validation errors: {str(failures)}"
+
+
+def _schematron_failures_message(failures: str) -> str:
+    return f"Schematron validation errors: {failures}"
+
+
+def label_failures(labels: List[bytes]) -> List[Optional[str]]:
     """
-    Given the text of a PDS4 label, run XML Schema *and* Schematron
-    validations on it.  Raise an exception on failures.
+    Given the texts of PDS4 labels, run XML Schema *and* Schematron
+    validations on them.  Returns, for each label, None if it is
+    valid, or a message describing its failures.  Within
+    validation_server(), the labels are validated as one batch by the
+    server; otherwise each runs two Java programs.
     """
-    try:
+    if _VALIDATION_SERVER is not None:
+        return _VALIDATION_SERVER.label_failures(labels)
+
+    def failures(label: bytes) -> Optional[str]:
         failures_from_xml_schema = xml_schema_failures(None, label)
         if failures_from_xml_schema is not None:
-            raise Exception(
-                f"XML schema validation errors: {str(failures_from_xml_schema)}"
-            )
+            return _xml_schema_failures_message(failures_from_xml_schema)
         failures_from_schematron = schematron_failures(None, label)
         if failures_from_schematron is not None:
-            raise Exception(f"Schematron validation errors: {failures_from_schematron}")
+            return _schematron_failures_message(failures_from_schematron)
+        return None
+
+    return [failures(label) for label in labels]
+
+
+def verify_label_or_raise(label: bytes) -> None:
+    """
+    Given the text of a PDS4 label, run XML Schema *and* Schematron
+    validations on it.  Raise an exception on failures.
+    """
+    try:
+        failures = label_failures([label])[0]
+        if failures is not None:
+            raise Exception(failures)
     except Exception:
         # Debugging functionality: write the label to disk.
         PRINT_AND_SAVE_LABEL = True
@@ -234,3 +270,133 @@ def verify_label_or_raise(label: bytes) -> None:
             with open(fp, "wb") as f:
                 f.write(label)
         raise
+
+
+############################################################
+
+# The server is built from java/org/seti/pdart/ValidationServer.java
+# by "make ValidationServer.jar".  It needs probatron.jar too.
+VALIDATION_SERVER_JAR: str = "ValidationServer.jar"
+VALIDATION_SERVER_CLASSPATH: str = f"{VALIDATION_SERVER_JAR}:probatron.jar"
+
+# Use the ValidationServer within validation_server().  If not set,
+# labels are validated by running Java for each one.
+_USE_VALIDATION_SERVER: bool = True
+
+
+class ValidationServer(object):
+    """
+    A Java process that compiles the XML and Schematron schemas once,
+    then validates labels sent to it until closed.  This saves
+    starting two JVMs for each label.
+
+    Labels are sent in batches: a line with the number of labels,
+    then for each label a line with its length in bytes, then its
+    bytes.  For each label, the server answers with a line "STATUS
+    LENGTH" followed by LENGTH bytes, where STATUS is XSD (with the
+    XML Schema validator's message), SVRL (with the Schematron
+    report), or ERROR (with a Java stack trace).
+    """
+
+    def __init__(
+        self,
+        xml_schemas: List[str] = [PDS_XML_SCHEMA, DISP_XML_SCHEMA, HST_XML_SCHEMA],
+        schematron_schema: str = PDS_SCHEMATRON_SCHEMA,
+    ) -> None:
+        for filename in xml_schemas + [schematron_schema]:
+            assert os.path.isfile(filename), f"schema {filename} required"
+        assert os.path.isfile(
+            VALIDATION_SERVER_JAR
+        ), f"{VALIDATION_SERVER_JAR} required; run make {VALIDATION_SERVER_JAR}"
+        args = ["java", "-cp", VALIDATION_SERVER_CLASSPATH]
+        args.append("org.seti.pdart.ValidationServer")
+        args.extend(xml_schemas)
+        args.extend(["--", schematron_schema])
+        self.process = subprocess.Popen(
+            args, stdin=subprocess.PIPE, stdout=subprocess.PIPE
+        )
+
+    def _stdin(self) -> IO[bytes]:
+        stdin = self.process.stdin
+        assert stdin is not None, "validation server is closed"
+        return stdin
+
+    def _stdout(self) -> IO[bytes]:
+        stdout = self.process.stdout
+        assert stdout is not None, "validation server is closed"
+        return stdout
+
+    def label_failures(self, labels: List[bytes]) -> List[Optional[str]]:
+        """
+        Validate the labels against the XML and Schematron schemas.
+        Returns, for each label, None if it is valid, or a message
+        describing its failures.
+        """
+        if not labels:
+            return []
+        # The server reads the whole batch before answering, so
+        # writing all of it first can't deadlock.
+        stdin = self._stdin()
+        stdin.write(b"%d\n" % len(labels))
+        for label in labels:
+            stdin.write(b"%d\n" % len(label))
+            stdin.write(label)
+        stdin.flush()
+
+        stdout = self._stdout()
+        result: List[Optional[str]] = []
+        for _ in labels:
+            header = stdout.readline().split()
+            if len(header) != 2:
+                raise Exception("validation server stopped")
+            status, length = header[0], int(header[1])
+            body = stdout.read(length)
+            if len(body) != length:
+                raise Exception("validation server stopped")
+            if status == b"XSD":
+                result.append(_xml_schema_failures_message(body))
+            elif status == b"SVRL":
+                failures = _svrl_failures_text(xml.dom.minidom.parseString(body))
+                if failures is None:
+                    result.append(None)
+                else:
+                    result.append(_schematron_failures_message(failures))
+            else:
+                raise Exception(f"validation server error: {body.decode()}")
+        return result
+
+    def close(self) -> None:
+        """Stop the server."""
+        if self.process.stdin is not None:
+            # An empty line or end of input tells the server to stop.
+            self.process.stdin.close()
+            self.process.stdin = None
+        self.process.wait()
+        if self.process.stdout is not None:
+            self.process.stdout.close()
+            self.process.stdout = None
+
+
+# Set within validation_server().
+_VALIDATION_SERVER: Optional[ValidationServer] = None
+
+
+@contextmanager
+def validation_server() -> Iterator[None]:
+    """
+    Within this context, validate labels with a ValidationServer
+    instead of running Java for each one.  Nested uses share the
+    outermost server.  If _USE_VALIDATION_SERVER isn't set, it does
+    nothing.
+    """
+    global _VALIDATION_SERVER
+    if not _USE_VALIDATION_SERVER or _VALIDATION_SERVER is not None:
+        yield
+        return
+    server = ValidationServer()
+    _VALIDATION_SERVER = server
+    try:
+        yield
+    finally:
+        _VALIDATION_SERVER = None
+        server.close()
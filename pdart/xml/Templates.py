@@ -67,21 +67,30 @@ builder functions. A bit convoluted, but it works.
 You *could* build from the top down, but the logic wouldn't be any
 better; maybe a little worse.)
 
+Each template is parsed only once, when it's interpreted, into a tree
+recording its elements, text and holes; builder functions just walk
+that tree.  BenchmarkTemplates.py times this for a FITS product label.
+
 I document some types below using Haskell notation: *a -> b* is a
 function from *a* to *b* and *[c]* is a list of *c* s.
 """
+import abc
+import functools
+import weakref
 import xml.dom
 import xml.sax
 import xml.sax.handler
-from typing import Any, Callable, Dict, List, Union, cast
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union, cast
 from xml.dom.minidom import Document, Text
 
+import pdart.xml.Pretty
+from pdart.xml.Pretty import PrettyPrintBuilder
+
 TemplateDict = Dict[str, Any]
 Node = Any  # should be Text
 Frag = List[Text]
 NodeBuilder = Callable[[Document], Node]
 FragBuilder = Callable[[Document], Frag]
-DocTemplate = Callable[[TemplateDict], Document]
 NodeBuilderTemplate = Callable[[TemplateDict], NodeBuilder]
 
 
@@ -97,6 +106,264 @@ def interpret_text(txt: str) -> NodeBuilder:
     return builder
 
 
+# xml.dom.Node.TEXT_NODE, which mypy's stubs lack.
+_TEXT_NODE: int = getattr(xml.dom.Node, "TEXT_NODE")
+
+# What a part of a compiled template builds: XML nodes, or strings
+# to become text.
+_Piece = Union[str, Node]
+
+
+class _TemplateNode(metaclass=abc.ABCMeta):
+    """
+    A node of a compiled template.  Templates are parsed once, into a
+    tree of these, and each use of the template just walks the tree.
+    """
+
+    @abc.abstractmethod
+    def build(self, doc: Document, dictionary: TemplateDict) -> List[_Piece]:
+        """
+        Return what this part of the template stands for, given the
+        document to build in and the contents of the holes.
+        """
+        pass
+
+
+def _append_pieces(doc: Document, elmt: Node, pieces: List[_Piece]) -> None:
+    """
+    Append the pieces to the element as its children, merging
+    adjacent text into one text node and dropping empty text, as
+    Node.normalize() would do.
+    """
+    text: List[str] = []
+    for piece in pieces:
+        if isinstance(piece, str):
+            text.append(piece)
+        elif piece.nodeType == _TEXT_NODE:
+            text.append(piece.data)
+        else:
+            if text:
+                data = "".join(text)
+                if data:
+                    elmt.appendChild(doc.createTextNode(data))
+                text = []
+            elmt.appendChild(piece)
+    if text:
+        data = "".join(text)
+        if data:
+            elmt.appendChild(doc.createTextNode(data))
+
+
+# Nodes returned by template builders.  They're built normalized, so
+# they needn't be normalized again when they fill other templates'
+# holes (as long as nobody changes them in between).
+_BUILT_NODES: "weakref.WeakSet[Node]" = weakref.WeakSet()
+
+
+def _normalize(node: Node) -> None:
+    if node not in _BUILT_NODES:
+        node.normalize()
+
+
+def _piece_to_node(doc: Document, piece: _Piece) -> Node:
+    # Nodes are already normalized: elements from the template as
+    # they're built and the contents of holes as they're filled.
+    if isinstance(piece, str):
+        return doc.createTextNode(piece)
+    else:
+        return piece
+
+
+class _TemplateElement(_TemplateNode):
+    def __init__(self, name: str, attrs: List[Tuple[str, str]]) -> None:
+        self.name = name
+        self.attrs = attrs
+        self.children: List[_TemplateNode] = []
+
+    def build(self, doc: Document, dictionary: TemplateDict) -> List[_Piece]:
+        elmt = doc.createElement(self.name)
+        for name, value in self.attrs:
+            elmt.setAttribute(name, value)
+        pieces: List[_Piece] = []
+        for child in self.children:
+            pieces.extend(child.build(doc, dictionary))
+        _append_pieces(doc, elmt, pieces)
+        return [elmt]
+
+
+class _TemplateText(_TemplateNode):
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+    def build(self, doc: Document, dictionary: TemplateDict) -> List[_Piece]:
+        return [self.text]
+
+
+class _TemplateProcessingInstruction(_TemplateNode):
+    def __init__(self, target: str, data: str) -> None:
+        self.target = target
+        self.data = data
+
+    def build(self, doc: Document, dictionary: TemplateDict) -> List[_Piece]:
+        return [doc.createProcessingInstruction(self.target, self.data)]
+
+
+class _TemplateNodeHole(_TemplateNode):
+    def __init__(self, param_name: str) -> None:
+        self.param_name = param_name
+
+    def build(self, doc: Document, dictionary: TemplateDict) -> List[_Piece]:
+        param_name = self.param_name
+        param = dictionary[param_name]
+        if type(param) in [str]:
+            return [param]
+        elif type(param) in [int, float]:
+            return [str(param)]
+        else:
+            assert _is_function(
+                param
+            ), f"{param_name} is type {type(param)}; should be function"
+            elmt = param(doc)
+            assert isinstance(elmt, xml.dom.Node), param_name
+            _normalize(elmt)
+            return [elmt]
+
+
+class _TemplateFragmentHole(_TemplateNode):
+    def __init__(self, param_name: str) -> None:
+        self.param_name = param_name
+
+    def build(self, doc: Document, dictionary: TemplateDict) -> List[_Piece]:
+        param_name = self.param_name
+        param = dictionary[param_name]
+        assert _is_function(
+            param
+        ), f"{param_name} is type {type(param)}; should be function"
+        elmts = param(doc)
+        assert isinstance(elmts, list), param_name
+        for elmt in elmts:
+            assert isinstance(elmt, xml.dom.Node), param_name
+            _normalize(elmt)
+        return elmts
+
+
+class _TemplateCompiler(xml.sax.handler.ContentHandler):
+    """
+    Parse a template into a list of _TemplateNodes: the top-level
+    nodes of the template.
+    """
+
+    def __init__(self, keep_processing_instructions: bool) -> None:
+        xml.sax.handler.ContentHandler.__init__(self)
+        self.keep_processing_instructions = keep_processing_instructions
+        self.top: List[_TemplateNode] = []
+        # The open elements; None for an open hole.
+        self.stack: List[Optional[_TemplateElement]] = []
+        self.text: List[str] = []
+
+    def append(self, node: _TemplateNode) -> None:
+        if self.stack:
+            parent = self.stack[-1]
+            assert parent is not None, "<NODE/> and <FRAGMENT/> must be empty"
+            parent.children.append(node)
+        else:
+            self.top.append(node)
+
+    def flush_text(self) -> None:
+        if self.text:
+            self.append(_TemplateText("".join(self.text)))
+            self.text = []
+
+    def startElement(self, name: str, attrs: Any) -> None:
+        self.flush_text()
+        if name == "NODE":
+            self.append(_TemplateNodeHole(attrs["name"]))
+            self.stack.append(None)
+        elif name == "FRAGMENT":
+            self.append(_TemplateFragmentHole(attrs["name"]))
+            self.stack.append(None)
+        else:
+            elmt = _TemplateElement(
+                name, [(attr_name, attrs[attr_name]) for attr_name in attrs.getNames()]
+            )
+            self.append(elmt)
+            self.stack.append(elmt)
+
+    def endElement(self, name: str) -> None:
+        self.flush_text()
+        self.stack.pop()
+
+    def characters(self, content: str) -> None:
+        self.text.append(content)
+
+    def ignorableWhitespace(self, content: str) -> None:
+        pass
+
+    def processingInstruction(self, target: str, data: str) -> None:
+        if self.keep_processing_instructions:
+            self.flush_text()
+            self.append(_TemplateProcessingInstruction(target, data))
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_template(
+    template: str, keep_processing_instructions: bool
+) -> List[_TemplateNode]:
+    """
+    Parse the template into a tree of _TemplateNodes, returning its
+    top-level nodes.  Results are cached, so templates built each time
+    a function runs are parsed only once too.
+    """
+    compiler = _TemplateCompiler(keep_processing_instructions)
+    try:
+        xml.sax.parseString(template, compiler)
+    except Exception:
+        print("malformed template:", template)
+        raise
+    return compiler.top
+
+
+class DocTemplate(object):
+    """
+    A builder function that takes a dictionary and returns an XML
+    document: see :func:`interpret_document_template`.  It can also
+    return the document's pretty-printed text directly.
+    """
+
+    def __init__(self, template: str) -> None:
+        self.top = _compile_template(template, True)
+
+    def __call__(self, dictionary: TemplateDict) -> Document:
+        doc = xml.dom.getDOMImplementation().createDocument(None, None, None)
+        self._build(doc, dictionary)
+        return doc
+
+    def pretty_bytes(self, dictionary: TemplateDict) -> bytes:
+        """
+        Return what pretty_print(self(dictionary).toxml().encode())
+        would, but without building a DOM and then printing and
+        reparsing it.  The holes are filled in the same way, but
+        with lightweight stand-ins for the DOM nodes.
+
+        If pdart.xml.Pretty._USE_XMLLINT is set, it does build the DOM
+        and pretty_print() it, so that the labels are formatted by
+        xmllint.
+        """
+        if pdart.xml.Pretty._USE_XMLLINT:
+            return pdart.xml.Pretty.pretty_print(self(dictionary).toxml().encode())
+        doc = _LiteDocument()
+        self._build(cast(Document, doc), dictionary)
+        printer = PrettyPrintBuilder()
+        for node in doc.childNodes:
+            cast(_LiteNode, node).pretty_print(printer)
+        return printer.pretty_bytes()
+
+    def _build(self, doc: Document, dictionary: TemplateDict) -> None:
+        for template_node in self.top:
+            for piece in template_node.build(doc, dictionary):
+                doc.appendChild(_piece_to_node(doc, piece))
+
+
 def interpret_document_template(template: str) -> DocTemplate:
     """
     Return a builder function that takes a dictionary and returns an
@@ -105,86 +372,11 @@ def interpret_document_template(template: str) -> DocTemplate:
     attribute in the dictionary.  ``<NODE />`` elements must evaluate
     to be XML nodes; ``<FRAGMENT />`` elements must evaluate to be an
     XML fragment (a list of XML nodes).
-    """
-
-    def builder(dictionary: TemplateDict) -> Document:
-        doc = xml.dom.getDOMImplementation().createDocument(None, None, None)
-        stack: List[Union[Node, List[Node]]] = [doc]
-
-        class Builder(xml.sax.handler.ContentHandler):
-            def startElement(self, name: str, attrs: Any) -> None:
-                if name == "NODE":
-                    param_name = attrs["name"]
-                    param = dictionary[param_name]
-                    if type(param) in [str]:
-                        elmt = doc.createTextNode(param)
-                        assert isinstance(elmt, xml.dom.Node), param_name
-                        stack.append(elmt)
-                    elif type(param) in [int, float]:
-                        elmt = doc.createTextNode(str(param))
-                        assert isinstance(elmt, xml.dom.Node), param_name
-                        stack.append(elmt)
-                    else:
-                        assert _is_function(
-                            param
-                        ), f"{param_name} is type {type(param)}; should be function"
-                        elmt = param(doc)
-                        if isinstance(elmt, list):
-                            for e in elmt:
-                                assert isinstance(e, xml.dom.Node), param_name
-                        else:
-                            assert isinstance(elmt, xml.dom.Node), param_name
-                        stack.append(elmt)
-                elif name == "FRAGMENT":
-                    param_name = attrs["name"]
-                    param = dictionary[param_name]
-                    assert _is_function(
-                        param
-                    ), "{param_name} is type {type(param)}; should be function"
-                    elmts = param(doc)
-                    assert isinstance(elmts, list), param_name
-                    for elmt in elmts:
-                        assert isinstance(elmt, xml.dom.Node), param_name
-                    stack.append(elmts)
-                else:
-                    elmt = doc.createElement(name)
-                    for name in attrs.getNames():
-                        elmt.setAttribute(name, attrs[name])
-                    stack.append(elmt)
-
-            def endElement(self, name: str) -> None:
-                if name == "FRAGMENT":
-                    elmts = stack.pop()
-                    assert isinstance(elmts, list)
-                    elmt_list: List[xml.dom.Node] = elmts
-                    for elmt in elmts:
-                        assert isinstance(elmt, xml.dom.Node)
-                        elmt.normalize()
-                        cast(xml.dom.Node, stack[-1]).appendChild(elmt)
-                else:
-                    elmt = stack.pop()
-                    assert isinstance(elmt, xml.dom.Node)
-                    node: xml.dom.Node = elmt
-                    node.normalize()
-                    cast(xml.dom.Node, stack[-1]).appendChild(node)
-
-            def characters(self, content: str) -> None:
-                node = doc.createTextNode(content)
-                assert isinstance(stack[-1], xml.dom.Node)
-                stack[-1].appendChild(node)
-
-            def ignorableWhitespace(self, content: str) -> None:
-                pass
-
-            def processingInstruction(self, target: str, data: str) -> None:
-                pi = doc.createProcessingInstruction(target, data)
-                assert isinstance(stack[-1], xml.dom.Node)
-                stack[-1].appendChild(pi)
-
-        xml.sax.parseString(template, Builder())
-        return doc
 
-    return builder
+    The template is parsed once, here; the builder function only
+    fills in a copy.
+    """
+    return DocTemplate(template)
 
 
 def interpret_template(template: str) -> NodeBuilderTemplate:
@@ -196,78 +388,18 @@ def interpret_template(template: str) -> NodeBuilderTemplate:
 
     The returned builder function takes a document and returns XML.
     """
+    top = _compile_template(template, False)
+    assert len(top) == 1, f"template must have one root: {template}"
+    root = top[0]
 
     def parameterizer(dictionary: TemplateDict) -> NodeBuilder:
         def builder(document: Document) -> Node:
-            doc = document
-            stack: List[Union[Node, List[Node]]] = []
-
-            class Builder(xml.sax.handler.ContentHandler):
-                def startElement(self, name: str, attrs: Any) -> None:
-                    if name == "NODE":
-                        param_name = attrs["name"]
-                        param = dictionary[param_name]
-                        if type(param) in [str]:
-                            elmt = doc.createTextNode(param)
-                        elif type(param) in [int, float]:
-                            elmt = doc.createTextNode(str(param))
-                        else:
-                            assert _is_function(param), (
-                                f"{param_name} is type {type(param)}; "
-                                f"should be function"
-                            )
-                            elmt = param(doc)
-                        assert isinstance(elmt, xml.dom.Node)
-                        stack.append(elmt)
-                    elif name == "FRAGMENT":
-                        param_name = attrs["name"]
-                        param = dictionary[param_name]
-                        assert _is_function(param), (
-                            f"{param_name} is type {type(param)}; "
-                            f"should be function"
-                        )
-                        elmts = param(doc)
-                        assert isinstance(elmts, list)
-                        elmt_list: List[Node] = elmts
-                        for elmt in elmt_list:
-                            assert isinstance(elmt, xml.dom.Node)
-                        stack.append(elmt_list)
-                    else:
-                        elmt = doc.createElement(name)
-                        for name in attrs.getNames():
-                            elmt.setAttribute(name, attrs[name])
-                        assert isinstance(elmt, xml.dom.Node)
-                        stack.append(elmt)
-
-                def endElement(self, name: str) -> None:
-                    if name == "FRAGMENT":
-                        elmts = stack.pop()
-                        assert isinstance(elmts, list)
-                        elmt_list: List[xml.dom.Node] = elmts
-                        for elmt in elmt_list:
-                            elmt.normalize()
-                            if stack:
-                                cast(xml.dom.Node, stack[-1]).appendChild(elmt)
-                            else:
-                                stack.append(elmt)
-                    else:
-                        elmt = cast(xml.dom.Node, stack.pop())
-                        elmt.normalize()
-                        if stack:
-                            cast(xml.dom.Node, stack[-1]).appendChild(elmt)
-                        else:
-                            stack.append(elmt)
-
-                def characters(self, content: str) -> None:
-                    node = doc.createTextNode(content)
-                    cast(xml.dom.Node, stack[-1]).appendChild(node)
-
-            try:
-                xml.sax.parseString(template, Builder())
-            except Exception:
-                print("malformed template:", template)
-                raise
-            return stack[-1]
+            nodes = [
+                _piece_to_node(document, piece)
+                for piece in root.build(document, dictionary)
+            ]
+            _BUILT_NODES.add(nodes[-1])
+            return nodes[-1]
 
         return builder
 
@@ -303,6 +435,105 @@ def combine_fragments_into_fragment(doc_funcs: List[FragBuilder]) -> FragBuilder
     return func
 
 
+############################################################
+
+# A lightweight stand-in for the parts of xml.dom.minidom that
+# builder functions use, for DocTemplate.pretty_bytes().  The nodes
+# subclass xml.dom.Node so the builders' checks accept them.
+
+_ELEMENT_NODE: int = getattr(xml.dom.Node, "ELEMENT_NODE")
+_PROCESSING_INSTRUCTION_NODE: int = getattr(xml.dom.Node, "PROCESSING_INSTRUCTION_NODE")
+
+
+class _LiteNode(xml.dom.Node, metaclass=abc.ABCMeta):
+    def normalize(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    def pretty_print(self, printer: PrettyPrintBuilder) -> None:
+        pass
+
+
+class _LiteText(_LiteNode):
+    nodeType = _TEXT_NODE
+
+    def __init__(self, data: str) -> None:
+        self.data = data
+
+    def pretty_print(self, printer: PrettyPrintBuilder) -> None:
+        printer.text(self.data)
+
+
+class _LiteProcessingInstruction(_LiteNode):
+    nodeType = _PROCESSING_INSTRUCTION_NODE
+
+    def __init__(self, target: str, data: str) -> None:
+        self.target = target
+        self.data = data
+
+    def pretty_print(self, printer: PrettyPrintBuilder) -> None:
+        printer.processing_instruction(self.target, self.data)
+
+
+class _LiteElement(_LiteNode):
+    nodeType = _ELEMENT_NODE
+
+    def __init__(self, tagName: str) -> None:
+        self.tagName = tagName
+        self.attributes: Dict[str, str] = {}
+        self.childNodes: List[xml.dom.Node] = []
+
+    def setAttribute(self, name: str, value: str) -> None:
+        self.attributes[name] = value
+
+    def appendChild(self, node: xml.dom.Node) -> xml.dom.Node:
+        self.childNodes.append(node)
+        return node
+
+    def normalize(self) -> None:
+        """As minidom's: merge adjacent text and drop empty text."""
+        children: List[xml.dom.Node] = []
+        for child in self.childNodes:
+            if isinstance(child, _LiteText):
+                if not child.data:
+                    continue
+                if children and isinstance(children[-1], _LiteText):
+                    children[-1] = _LiteText(children[-1].data + child.data)
+                    continue
+            else:
+                child.normalize()
+            children.append(child)
+        self.childNodes = children
+
+    def pretty_print(self, printer: PrettyPrintBuilder) -> None:
+        printer.start_element(self.tagName, list(self.attributes.items()))
+        for child in self.childNodes:
+            cast(_LiteNode, child).pretty_print(printer)
+        printer.end_element(self.tagName)
+
+
+class _LiteDocument(object):
+    def __init__(self) -> None:
+        self.childNodes: List[xml.dom.Node] = []
+
+    def appendChild(self, node: xml.dom.Node) -> xml.dom.Node:
+        self.childNodes.append(node)
+        return node
+
+    def createElement(self, tagName: str) -> _LiteElement:
+        return _LiteElement(tagName)
+
+    def createTextNode(self, data: str) -> _LiteText:
+        return _LiteText(data)
+
+    def createProcessingInstruction(
+        self, target: str, data: str
+    ) -> _LiteProcessingInstruction:
+        return _LiteProcessingInstruction(target, data)
+
+
+############################################################
+
 _DOC: Document = xml.dom.getDOMImplementation().createDocument(None, None, None)
 """
 A constant document used as a throw-away argument to builder functions
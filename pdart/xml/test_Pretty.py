@@ -1,4 +1,9 @@
-from pdart.xml.Pretty import pretty_print
+import glob
+import os.path
+import shutil
+import unittest
+
+from pdart.xml.Pretty import format_xml, pretty_print, xmllint_pretty_print
 
 _PP: bytes = b"""<?xml version="1.0"?>
 <foobar>
@@ -10,3 +15,48 @@ _PP: bytes = b"""<?xml version="1.0"?>
 def test_pretty_print() -> None:
     """Mostly a smoketest to force parsing of Pretty."""
     assert pretty_print(b"<foobar><baz></baz></foobar>") == _PP
+
+
+class Test_Pretty(unittest.TestCase):
+    def test_format_xml(self) -> None:
+        self.assertEqual(_PP, format_xml(b"<foobar><baz></baz></foobar>"))
+
+        # whitespace-only text is dropped, but elements with text are
+        # written as they are
+        self.assertEqual(
+            b'<?xml version="1.0" encoding="UTF-8"?>\n'
+            b"<a>\n  <b>x <c/></b>\n  <d/>\n</a>\n",
+            format_xml(
+                b'<?xml version="1.0" encoding="UTF-8"?>'
+                b"<a>\n      <b>x <c/></b>   <d></d></a>"
+            ),
+        )
+
+        # xml:space="preserve" keeps whitespace
+        self.assertEqual(
+            b'<?xml version="1.0"?>\n<a xml:space="preserve"> <b/> </a>\n',
+            format_xml(b'<a xml:space="preserve"> <b/> </a>'),
+        )
+
+        # namespace declarations come first; escaping follows libxml2
+        self.assertEqual(
+            b'<?xml version="1.0"?>\n'
+            b'<a xmlns="urn:x" x="&lt;&quot;&#10;">&amp;&gt;&#xE9;</a>\n',
+            format_xml('<a x="&lt;&quot;&#10;" xmlns="urn:x">&amp;>é</a>'.encode()),
+        )
+
+        with self.assertRaises(Exception):
+            format_xml(b"<a><b></a>")
+
+    @unittest.skipIf(shutil.which("xmllint") is None, "needs xmllint")
+    def test_format_xml_matches_xmllint(self) -> None:
+        labels_dir = os.path.join(os.path.dirname(__file__), "..", "labels")
+        for filepath in sorted(glob.glob(os.path.join(labels_dir, "*.golden.xml"))):
+            with open(filepath, "rb") as f:
+                label = f.read()
+            # and once more with all the formatting squeezed out
+            squeezed = label.replace(b"\n", b"").replace(b"  ", b"")
+            for source in [label, squeezed]:
+                self.assertEqual(
+                    xmllint_pretty_print(source), format_xml(source), filepath
+                )
@@ -1,13 +1,16 @@
 import unittest
 
+import pdart.xml.Schema
 from pdart.xml.Schema import (
     PDS_SCHEMATRON_SCHEMA,
+    label_failures,
     probatron,
     probatron_with_stdin,
     probatron_with_svrl_result,
     run_subprocess,
     schematron_failures,
     svrl_failures,
+    validation_server,
     xml_schema_failures,
 )
 from pdart.xml.Utils import path_to_testfile
@@ -76,3 +79,38 @@ class TestXmlSchema(unittest.TestCase):
         self.assertIsNone(schematron_failures(path_to_testfile("bundle.xml")))
         sch_failures = schematron_failures(path_to_testfile("bad_bundle.xml"))
         self.assertNotEqual([], sch_failures)
+
+    def test_validation_server(self) -> None:
+        labels = []
+        for filepath in [
+            path_to_testfile("bundle.xml"),
+            # labels made by the pipeline
+            "pdart/labels/test_BundleLabel.golden.xml",
+            "pdart/labels/test_FitsProductLabel.golden.xml",
+            path_to_testfile("bad_bundle.xml"),
+        ]:
+            with open(filepath, "rb") as f:
+                labels.append(f.read())
+        labels.append(b"<library><book/><book/></library>")
+
+        # The server must give the same results as running the
+        # validators for each label.
+        use_validation_server = pdart.xml.Schema._USE_VALIDATION_SERVER
+        pdart.xml.Schema._USE_VALIDATION_SERVER = False
+        try:
+            with validation_server():
+                self.assertIsNone(pdart.xml.Schema._VALIDATION_SERVER)
+                failures = label_failures(labels)
+        finally:
+            pdart.xml.Schema._USE_VALIDATION_SERVER = use_validation_server
+        self.assertEqual([None, None, None], failures[:3])
+        self.assertIsNotNone(failures[3])
+        self.assertIsNotNone(failures[4])
+
+        self.assertTrue(pdart.xml.Schema._USE_VALIDATION_SERVER)
+        with validation_server():
+            self.assertIsNotNone(pdart.xml.Schema._VALIDATION_SERVER)
+            self.assertEqual(failures, label_failures(labels))
+            # and again, to be sure the server keeps going
+            self.assertEqual(failures[3:], label_failures(labels[3:]))
+        self.assertIsNone(pdart.xml.Schema._VALIDATION_SERVER)
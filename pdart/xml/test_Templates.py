@@ -1,7 +1,12 @@
 import unittest
 import xml.dom
+import xml.dom.minidom
+from typing import List
 
+import pdart.xml.Pretty
+from pdart.xml.Pretty import pretty_print, xmllint_pretty_print
 from pdart.xml.Templates import (
+    combine_nodes_into_fragment,
     interpret_document_template,
     interpret_template,
     interpret_text,
@@ -37,3 +42,99 @@ class TestTemplates(unittest.TestCase):
         self.assertEqual(
             '<?xml version="1.0" ?><doc><foo>BAR</foo></doc>', body.toxml()
         )
+
+    def test_template_text(self) -> None:
+        doc = xml.dom.getDOMImplementation().createDocument(None, None, None)
+        make_template = interpret_template(
+            '<foo a="1">x<NODE name="bar"/>y<NODE name="baz"/></foo>'
+        )
+
+        # Text from the template and the holes is merged into one text
+        # node, and empty text is dropped.
+        foo = make_template({"bar": 2, "baz": ""})(doc)
+        self.assertEqual('<foo a="1">x2y</foo>', foo.toxml())
+        self.assertEqual(1, len(foo.childNodes))
+
+        # The template can be used repeatedly.
+        foo = make_template({"bar": interpret_text("BAR"), "baz": 1.5})(doc)
+        self.assertEqual('<foo a="1">xBARy1.5</foo>', foo.toxml())
+        self.assertEqual(1, len(foo.childNodes))
+
+    def test_interpret_fragment(self) -> None:
+        make_body = interpret_document_template(
+            '<doc><FRAGMENT name="foos"/><FRAGMENT name="none"/></doc>'
+        )
+        make_foo = interpret_template('<foo><NODE name="bar"/></foo>')
+        foos = combine_nodes_into_fragment(
+            [make_foo({"bar": "1"}), make_foo({"bar": "2"})]
+        )
+        body = make_body({"foos": foos, "none": combine_nodes_into_fragment([])})
+        self.assertEqual(
+            '<?xml version="1.0" ?><doc><foo>1</foo><foo>2</foo></doc>', body.toxml()
+        )
+
+    def test_malformed_template(self) -> None:
+        # Templates are parsed when they're interpreted.
+        with self.assertRaises(Exception):
+            interpret_template("<foo><bar></foo>")
+        with self.assertRaises(AssertionError):
+            interpret_template('<foo><NODE name="bar">x</NODE></foo>')
+
+    def test_pretty_bytes(self) -> None:
+        make_label = interpret_document_template(
+            """<?xml version="1.0"?>
+<?xml-model href="x.sch"?>
+<label b="2" a="&amp;&#10;">
+    <title>   <NODE name="title"/></title>
+    <FRAGMENT name="items"/>
+    <empty><NODE name="empty"/></empty>
+</label>"""
+        )
+        make_item = interpret_template('<item x="&quot;"><NODE name="value"/></item>')
+
+        def make_raw(doc: xml.dom.minidom.Document) -> xml.dom.minidom.Node:
+            raw = doc.createElement("raw")
+            raw.setAttribute("z", "tab\there")
+            raw.appendChild(doc.createTextNode("\r\n"))
+            raw.appendChild(doc.createTextNode(""))
+            raw.appendChild(doc.createTextNode("  <&> é"))
+            return raw
+
+        dictionary = {
+            "title": "A & B",
+            "items": combine_nodes_into_fragment(
+                [make_item({"value": 1}), make_item({"value": ""}), make_raw]
+            ),
+            "empty": "",
+        }
+        # The same bytes as building and then formatting the DOM.
+        self.assertEqual(
+            pretty_print(make_label(dictionary).toxml().encode()),
+            make_label.pretty_bytes(dictionary),
+        )
+
+    def test_pretty_bytes_with_xmllint(self) -> None:
+        make_label = interpret_document_template(
+            '<?xml version="1.0"?><label><title><NODE name="title"/></title></label>'
+        )
+        dictionary = {"title": "A & B"}
+
+        # Both formatters give the same bytes, so note which one ran.
+        formatted: List[bytes] = []
+
+        def recording_xmllint_pretty_print(str: bytes) -> bytes:
+            formatted.append(str)
+            return xmllint_pretty_print(str)
+
+        use_xmllint = pdart.xml.Pretty._USE_XMLLINT
+        pdart.xml.Pretty._USE_XMLLINT = True
+        pdart.xml.Pretty.xmllint_pretty_print = recording_xmllint_pretty_print
+        try:
+            self.assertEqual(
+                pretty_print(make_label(dictionary).toxml().encode()),
+                make_label.pretty_bytes(dictionary),
+            )
+        finally:
+            pdart.xml.Pretty._USE_XMLLINT = use_xmllint
+            pdart.xml.Pretty.xmllint_pretty_print = xmllint_pretty_print
+        self.assertEqual(2, len(formatted))